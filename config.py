@@ -14,6 +14,8 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "SUA_API_KEY_AQUI_SE_NAO_USAR_VAR_A
 # Adicione avisos ou validações da chave API se necessário
 if not OPENAI_API_KEY or OPENAI_API_KEY == "SUA_API_KEY_AQUI_SE_NAO_USAR_VAR_AMBIENTE":
     print("AVISO URGENTE: Chave da API OpenAI não configurada! O script pode falhar.")
+# Servidor compatível com a API OpenAI (ex.: stub local para testes); None = api.openai.com
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 
 # --- Caminhos ---
 BASE_DIR = Path(__file__).resolve().parent
@@ -23,6 +25,7 @@ ASSETS_DIR = BASE_DIR / "assets"
 FONT_DIR = ASSETS_DIR / "fonts"
 IMG_DIR = ASSETS_DIR / "img"
 TEMP_DIR = OUTPUT_DIR / "temp"
+CACHE_DIR = OUTPUT_DIR / "cache" # Caches compartilhados entre episódios
 
 # Cria diretórios necessários (executa apenas uma vez na importação)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -31,14 +34,28 @@ ASSETS_DIR.mkdir(parents=True, exist_ok=True)
 FONT_DIR.mkdir(parents=True, exist_ok=True)
 IMG_DIR.mkdir(parents=True, exist_ok=True)
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 # --- Estrutura de Arquivos de Saída ---
 ARTIFACT_SCRIPT = "script.txt"
 ARTIFACT_NARRATION = "narration.mp3"
 ARTIFACT_BACKGROUND = "background.mp4"
+ARTIFACT_INTRO = "intro.mp4" # Segmento da intro pré-renderizada (INTRO_CACHE_ENABLED)
 ARTIFACT_TIMESTAMPS_RAW = "timestamps_raw.json" # Timestamps brutos do Whisper
 ARTIFACT_PUNCTUATED_DATA = "timestamps_punctuated.json" # Timestamps após adicionar pontuação
 ARTIFACT_FINAL_VIDEO = "final.mp4"
+ARTIFACT_SPRITE_STORE = "narration_sprites.bin" # Sprites de texto mapeados em memória (temporário)
+# Cache de artefatos: narração, timestamps e fundo guardados sob o hash das suas entradas (roteiro,
+# modelo/voz do TTS, durações, parâmetros do efeito, config). Editar o roteiro ou mudar a duração gera
+# outra chave em vez de reaproveitar um arquivo velho de output/SCP-XXX/. O conteúdo é verificado
+# (sha256) a cada uso e as entradas menos usadas são removidas acima de ARTIFACT_CACHE_MAX_BYTES.
+# Os caches internos (PCM dos trechos do TTS, segmentos da intro, tiles do fundo) ficam no mesmo
+# diretório e sob o mesmo limite.
+# False = reaproveita qualquer arquivo existente em output/SCP-XXX/ (comportamento antigo; os caches
+# internos continuam ativos)
+ARTIFACT_CACHE_ENABLED = True
+ARTIFACT_CACHE_DIR = CACHE_DIR / "artifacts"
+ARTIFACT_CACHE_MAX_BYTES = 10 * 1024 ** 3 # 10 GB
 
 # --- Arquivo do Logo ---
 SCP_LOGO_FILE = Path(__file__).resolve().parent / "assets" / "svg" / "scp_logo.webp"
@@ -55,6 +72,22 @@ VIDEO_SIZE = (VIDEO_WIDTH, VIDEO_HEIGHT)
 # Duração máxima do vídeo final (Intro + Conteúdo)
 MAX_VIDEO_DURATION_SECONDS = 180 # Ajuste conforme necessário (ex: 60 para shorts)
 
+# --- Configurações do Fundo Glitch ---
+BG_GLITCH_SEED = 1337 # Semente do efeito (mesma semente = mesmos frames)
+BG_GLITCH_BLOCK_FRAMES = 64 # Frames por bloco de plano vetorizado
+BG_GLITCH_NOISE_BANK_SIZE = 6 # Quadros de ruído pré-calculados e reutilizados
+# Modo do fundo: 'render' (gera background.mp4 com a duração exata do episódio),
+# 'tile' (renderiza um loop de BG_TILE_SECONDS uma única vez e o repete)
+# ou 'procedural' (frames gerados em memória durante a montagem, sem background.mp4)
+BG_GLITCH_MODE = 'render'
+BG_TILE_SECONDS = 12 # Duração do tile em loop (modo 'tile'; guardado no cache de artefatos)
+# Codificador do background.mp4: 'x264' (yuv420p), 'x264_intra' (só keyframes, decodificação rápida),
+# 'mjpeg' (intra) ou 'cv2_mp4v' (VideoWriter do OpenCV, comportamento antigo)
+BG_ENCODER = 'x264'
+BG_ENCODER_THREADS = None # Threads do ffmpeg para o fundo (None = automático)
+BG_PARALLEL_WORKERS = 0 # 0 = segmentos renderizados no processo atual; >= 1 em N processos (mesmo arquivo)
+BG_PARALLEL_SEGMENT_SECONDS = 10 # Tamanho fixo dos segmentos (não depende do nº de workers)
+
 # --- Configurações de Logo ---
 USE_LOGO_IN_INTRO = True
 USE_LOGO_WATERMARK = True
@@ -69,9 +102,36 @@ LOGO_OPACITY_WATERMARK = 0.6
 # --- Configurações de TTS ---
 TTS_MODEL = "tts-1" # Ou "tts-1-hd" para maior qualidade (e custo)
 TTS_VOICE = "onyx" # Escolha a voz: alloy, echo, fable, onyx, nova, shimmer
+# Narração sintetizada por parágrafo (trechos maiores que o limite são quebrados em frases),
+# com chamadas em paralelo e PCM de cada trecho no cache de artefatos (chave = texto, modelo, voz): editar um
+# parágrafo só sintetiza de novo aquele parágrafo. False = uma única chamada com o roteiro todo
+TTS_CHUNKED = True
+TTS_CHUNK_MAX_CHARS = 4000 # Limite da API: 4096 caracteres por chamada
+TTS_MAX_CONCURRENCY = 4 # Chamadas simultâneas à API de TTS
+TTS_MP3_BITRATE = "192k" # Bitrate do narration.mp3 montado a partir dos trechos
 
 # --- Configurações de STT ---
 STT_MODEL = "whisper-1"
+# Transcrição em trechos: narrações mais longas que STT_CHUNK_MAX_SECONDS são cortadas no meio de
+# silêncios (perto de STT_CHUNK_TARGET_SECONDS) e os trechos são transcritos em paralelo, com os
+# timestamps devolvidos à linha do tempo global. Narrações curtas continuam em uma única chamada
+STT_CHUNKED = True
+STT_CHUNK_TARGET_SECONDS = 120
+STT_CHUNK_MAX_SECONDS = 180
+STT_CHUNK_OVERLAP_SECONDS = 1.0 # Áudio extra em cada lado do corte (palavras da emenda)
+STT_SILENCE_THRESHOLD_DB = -35.0 # Silêncio = energia abaixo do pico da narração menos este valor
+STT_SILENCE_MIN_SECONDS = 0.25
+STT_MAX_CONCURRENCY = 4 # Chamadas simultâneas à API de transcrição
+# Origem dos timestamps das palavras: 'whisper' (API de transcrição) ou 'local' (alinhador local:
+# o texto já é o roteiro e os tempos vêm das pausas/energia da narração; offline, em milissegundos,
+# com precisão menor que a do Whisper dentro de trechos falados sem pausa)
+TIMESTAMP_SOURCE = 'whisper'
+LOCAL_ALIGNER_SILENCE_THRESHOLD_DB = -35.0 # Pausa = energia abaixo do pico da narração menos este valor
+LOCAL_ALIGNER_PAUSE_MIN_SECONDS = 0.15 # Menor pausa tratada como fronteira entre palavras
+# Alinhamento roteiro x Whisper para transferir a pontuação: 'fast' (mesmo resultado do
+# SequenceMatcher, com o maior trecho comum de cada etapa achado por hash de janelas; escala
+# para roteiros longos) ou 'difflib' (SequenceMatcher no texto inteiro, quadrático)
+PUNCTUATION_ALIGNMENT = 'fast'
 
 # --- Configurações da Intro ---
 INTRO_DURATION = 5 # Duração fixa da intro em segundos
@@ -85,6 +145,9 @@ INTRO_TEXT_BG_COLOR = (0, 0, 0)
 INTRO_TEXT_BG_OPACITY = 0.6
 INTRO_TEXT_PADDING = 25
 INTRO_TYPING_EFFECT_SPEED = 0.30 # Segundos por caractere (menor = mais rápido)
+# Intro pré-renderizada: codificada uma vez (chave = textos, fontes, tempos, fundo, logo e
+# encode) e emendada ao conteúdo sem reencodar. Guardada no cache de artefatos
+INTRO_CACHE_ENABLED = True
 
 # --- Configurações do Texto da Narração (Principal) ---
 NARRATION_TEXT_FONT_SIZE = 70
@@ -99,8 +162,39 @@ NARRATION_TEXT_BG_ENABLED = False # Fundo para legibilidade
 NARRATION_TEXT_BG_COLOR = (0, 0, 0) # Cor do fundo
 NARRATION_TEXT_BG_OPACITY = 0.7 # Opacidade do fundo (0.0 a 1.0)
 NARRATION_TEXT_PADDING = 15 # Padding interno do fundo
+# Revelação do texto acumulado: 'sentence' (cada frase é quebrada e rasterizada uma vez e as
+# palavras aparecem por recorte das linhas) ou 'word' (a frase acumulada é rasterizada de novo
+# a cada palavra). Com fundo no texto (NARRATION_TEXT_BG_ENABLED) usa sempre 'word'.
+NARRATION_TEXT_REVEAL_MODE = 'sentence'
+# Textos (narração e intro) compostos a partir de um atlas de glifos rasterizados uma vez por
+# fonte/tamanho, em vez de desenhar cada linha com o Pillow (resultado idêntico)
+TEXT_GLYPH_ATLAS = True
+# Máscaras dos textos gravadas em um único arquivo mapeado em memória (índice de offsets) em vez
+# de arrays na RAM: o compositor lê as páginas sob demanda e o SO descarta as frias. Útil para
+# roteiros longos/compilações; o arquivo é removido ao fim da geração
+NARRATION_SPRITE_STORE = False
 
 # --- Configurações de Renderização (MoviePy) ---
+# Compositor do vídeo final: 'numpy' (blend inteiro só no bounding box de cada texto/logo,
+# em buffers pré-alocados), 'indexed' (índice de intervalos: cada frame só toca as
+# camadas visíveis) ou 'moviepy' (CompositeVideoClip padrão, testa todas as camadas)
+COMPOSITOR_MODE = 'numpy'
+
+# Modo de render: 'streaming' (composição, blend e encode em threads sobrepostas, com
+# um número fixo de frames em trânsito), 'single' (write_videofile em um processo) ou
+# 'chunked' (chunks alinhados a keyframes renderizados em processos paralelos e
+# concatenados sem reencodar)
+RENDER_MODE = 'streaming'
+RENDER_STREAM_WORKERS = 2 # Threads de blend das camadas de texto/logo
+RENDER_STREAM_QUEUE_FRAMES = 8 # Frames em trânsito (limita a memória do render)
+RENDER_CHUNK_WORKERS = os.cpu_count() or 4
+RENDER_KEYINT_SECONDS = 2 # Intervalo de keyframes (as fronteiras dos chunks caem nele)
+
+# Instrumentação do render final: cronometra cada frame (fundo, cada camada, áudio e
+# encode) e grava p50/p95/máximo em <vídeo>_render_profile.json ao lado do vídeo final.
+# Tem custo pequeno por chamada; deixe desligado em produção.
+RENDER_PROFILE = False
+
 # Configurações normais (não dev mode)
 VIDEO_CODEC_NORMAL = "libx264"
 AUDIO_CODEC_NORMAL = "aac"
@@ -126,6 +220,73 @@ VIDEO_CRF = VIDEO_CRF_DEV if DEV_MODE else VIDEO_CRF_NORMAL
 BG_MUSIC_FILE = Path(__file__).resolve().parent / "assets" / "bg-sound" / "bg-sound.wav"
 USE_BG_MUSIC = True
 BG_MUSIC_VOLUME = 0.08 # Volume BEM baixo para ser ambiente (0.0 a 1.0)
+# Mixer do áudio final: 'numpy' (decodifica uma vez, mixa em um buffer PCM e grava a
+# trilha já codificada) ou 'moviepy' (CompositeAudioClip com cópias em loop da música)
+AUDIO_MIXER = 'numpy'
+BG_MUSIC_DUCKING = False # Abaixa a música enquanto há narração (sidechain, só no mixer 'numpy')
+BG_MUSIC_DUCKING_DEPTH = 0.5 # Fração do volume da música removida sob a narração
+BG_MUSIC_DUCKING_THRESHOLD = 0.05 # Nível (RMS) da narração considerado fala
+BG_MUSIC_DUCKING_SMOOTH = 0.3 # Suavização do ganho em segundos
+
+# --- Modo Proxy (prévia rápida da linha do tempo inteira) ---
+# Renderiza o vídeo COMPLETO (sem o corte do DEV_MODE) em resolução e FPS reduzidos, com
+# fontes, margens e posições escaladas. Ative aqui ou com --proxy na linha de comando.
+PROXY_MODE = False
+PROXY_SCALE = 0.5 # Fração de VIDEO_SIZE (ex: 0.5 ou 0.25)
+PROXY_FPS = 15
+PROXY_VIDEO_PRESET = "ultrafast"
+PROXY_VIDEO_CRF = "30"
+ARTIFACT_FINAL_VIDEO_PROXY = "final_proxy.mp4"
+# Escala das medidas em pixels do layout (fontes, margens, posições fixas); 1.0 = produção
+LAYOUT_SCALE = 1.0
+_PROXY_APPLIED = False
+
+def apply_proxy_mode(scale: float | None = None, fps: int | None = None) -> None:
+    """
+    Ajusta as configurações carregadas para o modo proxy: tamanho, FPS, medidas do
+    layout, encoder e nomes dos artefatos que dependem da resolução. Idempotente.
+    """
+    global PROXY_MODE, PROXY_SCALE, PROXY_FPS, LAYOUT_SCALE
+    global VIDEO_WIDTH, VIDEO_HEIGHT, VIDEO_FPS, VIDEO_SIZE, VIDEO_PRESET, VIDEO_CRF
+    global INTRO_FONT_SIZE_NUMBER, INTRO_FONT_SIZE_NAME, INTRO_FONT_SIZE_CLASS, INTRO_TEXT_PADDING
+    global NARRATION_TEXT_FONT_SIZE, NARRATION_TEXT_PADDING, LOGO_MARGIN_INTRO, LOGO_MARGIN_WATERMARK
+    global ARTIFACT_BACKGROUND, ARTIFACT_FINAL_VIDEO, _PROXY_APPLIED
+    if _PROXY_APPLIED:
+        return
+    _PROXY_APPLIED = True
+    PROXY_MODE = True
+    PROXY_SCALE = scale or PROXY_SCALE
+    PROXY_FPS = fps or PROXY_FPS
+    LAYOUT_SCALE = PROXY_SCALE
+
+    def scaled(value: int) -> int:
+        return max(1, round(value * LAYOUT_SCALE))
+
+    # Dimensões pares (exigência do yuv420p)
+    VIDEO_WIDTH = max(2, round(VIDEO_WIDTH * PROXY_SCALE / 2) * 2)
+    VIDEO_HEIGHT = max(2, round(VIDEO_HEIGHT * PROXY_SCALE / 2) * 2)
+    VIDEO_SIZE = (VIDEO_WIDTH, VIDEO_HEIGHT)
+    VIDEO_FPS = min(VIDEO_FPS, PROXY_FPS)
+    VIDEO_PRESET = PROXY_VIDEO_PRESET
+    VIDEO_CRF = PROXY_VIDEO_CRF
+
+    INTRO_FONT_SIZE_NUMBER = scaled(INTRO_FONT_SIZE_NUMBER)
+    INTRO_FONT_SIZE_NAME = scaled(INTRO_FONT_SIZE_NAME)
+    INTRO_FONT_SIZE_CLASS = scaled(INTRO_FONT_SIZE_CLASS)
+    INTRO_TEXT_PADDING = scaled(INTRO_TEXT_PADDING)
+    NARRATION_TEXT_FONT_SIZE = scaled(NARRATION_TEXT_FONT_SIZE)
+    NARRATION_TEXT_PADDING = scaled(NARRATION_TEXT_PADDING)
+    LOGO_MARGIN_INTRO = scaled(LOGO_MARGIN_INTRO)
+    LOGO_MARGIN_WATERMARK = scaled(LOGO_MARGIN_WATERMARK)
+
+    # Artefatos que dependem da resolução/FPS não se misturam com os de produção
+    ARTIFACT_BACKGROUND = f"background_proxy_{VIDEO_WIDTH}x{VIDEO_HEIGHT}_{VIDEO_FPS}fps.mp4"
+    ARTIFACT_FINAL_VIDEO = ARTIFACT_FINAL_VIDEO_PROXY
+    print(f"Modo PROXY: {VIDEO_WIDTH}x{VIDEO_HEIGHT} @ {VIDEO_FPS}fps (escala {PROXY_SCALE}), "
+          f"preset {VIDEO_PRESET} (CRF: {VIDEO_CRF}).")
+
+if PROXY_MODE:
+    apply_proxy_mode()
 
 # --- Impressão de Configurações Chave ---
 print("-" * 30)
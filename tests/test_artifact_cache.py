@@ -0,0 +1,67 @@
+import itertools
+
+import pytest
+
+from video_pipeline import artifact_cache
+from video_pipeline.artifact_cache import ArtifactCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio que avança 1s a cada leitura (ordem de acesso sem empates)."""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(artifact_cache.time, 'time', lambda: float(next(ticks)))
+
+
+def make_file(path, size, fill=b'x'):
+    path.write_bytes(fill * size)
+    return path
+
+
+def store(cache, tmp_path, name, size):
+    key = ArtifactCache.key('test', {'name': name})
+    cache.store(key, 'test', make_file(tmp_path / f"{name}.bin", size))
+    return key
+
+
+def test_store_and_fetch(tmp_path, clock):
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=1000)
+    key = store(cache, tmp_path, 'a', 10)
+    dest = tmp_path / "out" / "a.bin"
+    assert cache.fetch(key, dest)
+    assert dest.read_bytes() == b'x' * 10
+    assert not cache.fetch(ArtifactCache.key('test', {'name': 'missing'}), tmp_path / "missing.bin")
+    assert not (tmp_path / "missing.bin").exists()
+
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=300)
+    key_a = store(cache, tmp_path, 'a', 100)
+    key_b = store(cache, tmp_path, 'b', 100)
+    key_c = store(cache, tmp_path, 'c', 100)
+    assert cache.lookup(key_a) is not None # 'a' passa a ser o mais recente; 'b' é o mais antigo
+
+    key_d = store(cache, tmp_path, 'd', 100)
+    assert cache.lookup(key_b) is None
+    assert all(cache.lookup(key) is not None for key in (key_a, key_c, key_d))
+    assert cache.total_bytes() == 300
+
+
+def test_evict_keeps_new_entry_larger_than_limit(tmp_path, clock):
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=150)
+    key_a = store(cache, tmp_path, 'a', 100)
+    key_big = store(cache, tmp_path, 'big', 500)
+    assert cache.lookup(key_a) is None
+    assert cache.lookup(key_big) is not None # keep= nunca despeja o recém-guardado
+
+
+def test_corrupted_object_is_dropped(tmp_path, clock):
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=1000)
+    key = store(cache, tmp_path, 'a', 10)
+    (tmp_path / "a.bin").unlink() # Remove o hardlink da origem antes de corromper o objeto
+    object_path = cache.lookup(key)
+    object_path.write_bytes(b'y' * 10) # Mesmo tamanho, conteúdo diferente
+
+    assert not cache.fetch(key, tmp_path / "out.bin")
+    assert not object_path.exists()
+    assert cache.entries() == []
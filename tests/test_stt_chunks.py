@@ -0,0 +1,176 @@
+import json
+import threading
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import config
+from video_pipeline import subtitle_generator
+from video_pipeline.audio_analysis import find_silences, plan_silence_chunks
+
+FPS = subtitle_generator.STT_CHUNK_SAMPLE_RATE
+BLOCK = 0.005 # Resolução do "ouvido" do cliente falso (5 ms)
+
+
+def tone_frequency(word_id):
+    return 300.0 + 14.0 * word_id
+
+
+def make_narration(seed=1, n_words=120):
+    """
+    Narração sintética: cada palavra 'w<id>' é um tom de frequência própria.
+    Pausas longas (0,7 s) a cada 9 palavras, exceto num bloco do meio só com
+    pausas curtas (0,12 s), que obriga o planejador a fazer um corte seco.
+    """
+    rng = np.random.default_rng(seed)
+    truth, t = [], 0.5
+    for i in range(n_words):
+        duration = rng.uniform(0.2, 0.4)
+        truth.append({'word': f'w{i % 40}', 'start': t, 'end': t + duration})
+        long_pause = i % 9 == 8 and not 40 <= i < 80
+        t += duration + (0.7 if long_pause else 0.12)
+    mono = np.zeros(int((t + 0.5) * FPS), np.float32)
+    for word in truth:
+        s0, s1 = int(round(word['start'] * FPS)), int(round(word['end'] * FPS))
+        freq = tone_frequency(int(word['word'][1:]))
+        mono[s0:s1] = 0.3 * np.sin(2 * np.pi * freq * np.arange(s1 - s0) / FPS)
+    return mono, truth
+
+
+def hear_words(path):
+    """Transcrição do cliente falso: trechos com som viram palavras, o tom dá o texto."""
+    with wave.open(str(path), 'rb') as wav_file:
+        fps = wav_file.getframerate()
+        samples = np.frombuffer(wav_file.readframes(wav_file.getnframes()), '<i2').astype(np.float32) / 32767
+    block = int(fps * BLOCK)
+    loud = np.abs(samples[:len(samples) // block * block].reshape(-1, block)).max(axis=1) > 0.01
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], loud.astype(np.int8), [0]))))
+    words = []
+    for b0, b1 in zip(edges[::2], edges[1::2]):
+        chunk = samples[b0 * block:b1 * block]
+        spectrum = np.abs(np.fft.rfft(chunk, n=8 * len(chunk)))
+        freq = np.argmax(spectrum) * fps / (8 * len(chunk))
+        words.append({'word': f' w{int(round((freq - 300.0) / 14.0))}',
+                      'start': b0 * BLOCK, 'end': b1 * BLOCK})
+    return SimpleNamespace(words=words)
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def create(model, file, response_format, timestamp_granularities):
+        with lock:
+            calls.append(file.name)
+        assert response_format == "verbose_json" and timestamp_granularities == ["word"]
+        return hear_words(file.name)
+
+    client = SimpleNamespace(audio=SimpleNamespace(transcriptions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(subtitle_generator, 'client', client)
+    return calls
+
+
+@pytest.fixture
+def stt_config(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'TEMP_DIR', tmp_path / "temp")
+    monkeypatch.setattr(config, 'STT_CHUNKED', True)
+    monkeypatch.setattr(config, 'STT_CHUNK_TARGET_SECONDS', 4)
+    monkeypatch.setattr(config, 'STT_CHUNK_MAX_SECONDS', 6)
+    monkeypatch.setattr(config, 'STT_CHUNK_OVERLAP_SECONDS', 1.0)
+    monkeypatch.setattr(config, 'STT_SILENCE_THRESHOLD_DB', -35.0)
+    monkeypatch.setattr(config, 'STT_SILENCE_MIN_SECONDS', 0.25)
+
+
+@pytest.fixture
+def narration(monkeypatch, tmp_path):
+    """Narração sintética servida no lugar do decode do ffmpeg."""
+    mono, truth = make_narration()
+    audio_path = tmp_path / "narration.mp3"
+    audio_path.write_bytes(b'')
+    monkeypatch.setattr(subtitle_generator, 'decode_audio', lambda path, fps, channels: mono[:, None])
+    return audio_path, mono, truth
+
+
+def assert_same_words(words, truth, tolerance=0.02):
+    assert [w['word'].strip() for w in words] == [w['word'] for w in truth]
+    for word, expected in zip(words, truth):
+        assert abs(word['start'] - expected['start']) < tolerance
+        assert abs(word['end'] - expected['end']) < tolerance
+
+
+def test_find_silences_marks_only_long_pauses():
+    mono, truth = make_narration()
+    silences = find_silences(mono, FPS, -35.0, 0.25)
+    gaps = [(a['end'], b['start']) for a, b in zip(truth, truth[1:])]
+    long_gaps = [gap for gap in gaps if gap[1] - gap[0] > 0.5]
+    assert len(silences) == len(long_gaps) + 2 # Mais o silêncio do início e do fim
+    for (start, end), (gap_start, gap_end) in zip(silences[1:-1], long_gaps):
+        assert abs(start - gap_start) <= 0.02 and abs(end - gap_end) <= 0.02
+
+
+def test_plan_silence_chunks_cuts_in_silences_or_at_max():
+    silences = [(3.0, 3.6), (9.0, 9.4), (9.8, 10.2)]
+    chunks = plan_silence_chunks(20.0, silences, target_seconds=4, max_seconds=6)
+    # Meio do silêncio perto do alvo; sem silêncio na janela, corte seco em start + max
+    assert chunks == [pytest.approx(c) for c in [(0.0, 3.3), (3.3, 9.2), (9.2, 15.2), (15.2, 20.0)]]
+    assert plan_silence_chunks(5.0, silences, 4, 6) == [(0.0, 5.0)]
+
+
+def test_chunked_transcription_matches_truth(fake_client, stt_config, narration):
+    audio_path, mono, truth = narration
+    _, fps, chunks = subtitle_generator.plan_transcription_chunks(audio_path)
+    silences = find_silences(mono, fps, -35.0, 0.25)
+    cuts = [end for _, end in chunks[:-1]]
+    in_silence = [any(start <= cut <= end for start, end in silences) for cut in cuts]
+    assert any(in_silence) and not all(in_silence) # Cortes em silêncio e ao menos um corte seco
+
+    words = subtitle_generator.transcribe_chunks(audio_path, mono, fps, chunks)
+    assert len(fake_client) == len(chunks)
+    assert_same_words(words, truth)
+    assert list(config.TEMP_DIR.iterdir()) == [] # WAVs dos trechos apagados
+
+
+def test_seam_dedup_and_midpoint_ownership(monkeypatch, stt_config):
+    """
+    Emenda em 10 s: cada trecho "ouve" as palavras com tempos um pouco diferentes.
+    'seam' é mantida pelos dois trechos (meios 9,95 e 10,125) e a emenda a
+    deduplica; 'overlap' aparece igual nos dois e só o dono do meio a mantém;
+    'no no' repetido sem sobreposição continua com duas palavras.
+    """
+    heard = {
+        0.0: [{'word': 'before', 'start': 9.0, 'end': 9.5},
+              {'word': 'seam', 'start': 9.8, 'end': 10.1},
+              {'word': 'overlap', 'start': 10.3, 'end': 10.6}],
+        9.0: [{'word': 'before', 'start': 9.0, 'end': 9.5},
+              {'word': 'Seam,', 'start': 9.95, 'end': 10.3},
+              {'word': 'overlap', 'start': 10.3, 'end': 10.6},
+              {'word': 'no', 'start': 12.0, 'end': 12.2},
+              {'word': 'no', 'start': 12.3, 'end': 12.5}],
+    }
+
+    def transcribe_chunk(mono, fps, start, end, chunk_path):
+        return [dict(word) for word in heard[start]]
+
+    monkeypatch.setattr(subtitle_generator, 'transcribe_chunk', transcribe_chunk)
+    mono = np.zeros(13 * FPS, np.float32)
+    words = subtitle_generator.transcribe_chunks(config.TEMP_DIR / "narration.mp3", mono, FPS,
+                                                 [(0.0, 10.0), (10.0, 13.0)])
+    assert [(w['word'], w['start']) for w in words] == [
+        ('before', 9.0), ('seam', 9.8), ('overlap', 10.3), ('no', 12.0), ('no', 12.3)]
+
+
+def test_raw_timestamps_shape(fake_client, stt_config, narration, tmp_path):
+    audio_path, _, truth = narration
+    words = subtitle_generator.get_word_timestamps(audio_path)
+    assert len(fake_client) > 1 # Caminho em trechos
+    assert all(set(word) == {'word', 'start', 'end'} for word in words)
+    assert all(isinstance(word['word'], str) and isinstance(word['start'], float)
+               and isinstance(word['end'], float) for word in words)
+    assert_same_words(words, truth)
+
+    raw_path = tmp_path / config.ARTIFACT_TIMESTAMPS_RAW
+    raw_path.write_text(json.dumps(words, ensure_ascii=False, indent=2), encoding='utf-8')
+    assert json.loads(raw_path.read_text(encoding='utf-8')) == words
@@ -0,0 +1,102 @@
+import re
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import config
+from video_pipeline import tts_generator
+from video_pipeline.artifact_cache import shared_cache
+from video_pipeline.tts_generator import split_tts_chunks
+
+
+def make_script(seed=3, n_paragraphs=12):
+    """Roteiro com parágrafos curtos, longos, frases enormes e espaços irregulares."""
+    rng = np.random.default_rng(seed)
+    paragraphs = []
+    for p in range(n_paragraphs):
+        sentences = []
+        for s in range(int(rng.integers(1, 25))):
+            n_words = int(rng.integers(3, 60 if s % 7 else 400))
+            words = [f"p{p}s{s}w{w}" + ("," if w % 11 == 10 else "") for w in range(n_words)]
+            sentences.append(' '.join(words) + rng.choice(['.', '!', '?']))
+        paragraphs.append('  '.join(sentences).replace(' ', '\n', 1))
+    return '\n\n\n'.join(paragraphs[:6]) + '\n \n' + '\n\n'.join(paragraphs[6:])
+
+
+@pytest.mark.parametrize('max_chars', [80, 500, 4000])
+def test_split_respects_limit_and_paragraphs(max_chars):
+    script = make_script()
+    paragraphs = [' '.join(p.split()) for p in re.split(r'\n\s*\n', script) if p.strip()]
+    chunks = split_tts_chunks(script, max_chars)
+
+    assert all(0 < len(chunk) <= max_chars for chunk in chunks)
+    assert ' '.join(chunks).split() == script.split() # Nenhuma palavra perdida ou reordenada
+
+    # Cada parágrafo é exatamente a junção de trechos consecutivos (nenhum trecho atravessa parágrafos)
+    position = 0
+    for paragraph in paragraphs:
+        joined = ''
+        while joined != paragraph:
+            assert position < len(chunks) and len(joined) < len(paragraph)
+            joined = f"{joined} {chunks[position]}" if joined else chunks[position]
+            position += 1
+    assert position == len(chunks)
+
+
+def test_split_keeps_short_paragraphs_whole():
+    assert split_tts_chunks("Um parágrafo.\n\n  \n\nOutro   parágrafo,\ncom quebra.", 4000) == [
+        "Um parágrafo.", "Outro parágrafo, com quebra."]
+    assert split_tts_chunks(" \n\n ", 4000) == []
+
+
+@pytest.fixture
+def fake_speech(monkeypatch, tmp_path):
+    """Cliente de TTS falso: PCM determinístico por texto; registra cada chamada."""
+    calls = []
+    lock = threading.Lock()
+
+    def create(model, voice, input, response_format):
+        assert response_format == "pcm"
+        with lock:
+            calls.append(input)
+        return SimpleNamespace(content=input.encode('utf-8') * 40 + b'\x01') # Byte ímpar descartado
+
+    client = SimpleNamespace(audio=SimpleNamespace(speech=SimpleNamespace(create=create)))
+    monkeypatch.setattr(tts_generator, 'client', client)
+    monkeypatch.setattr(config, 'ARTIFACT_CACHE_DIR', tmp_path / "cache")
+    monkeypatch.setattr(config, 'TEMP_DIR', tmp_path / "temp")
+    config.TEMP_DIR.mkdir()
+    monkeypatch.setattr(config, 'TTS_CHUNKED', True)
+    monkeypatch.setattr(config, 'TTS_CHUNK_MAX_CHARS', 500)
+    return calls
+
+
+def test_synthesize_chunk_uses_cache(fake_speech, tmp_path):
+    cache = shared_cache()
+    first, second = tmp_path / "a.pcm", tmp_path / "b.pcm"
+    assert not tts_generator.synthesize_chunk("Olá.", "tts-1", "onyx", cache, first)
+    assert tts_generator.synthesize_chunk("Olá.", "tts-1", "onyx", cache, second)
+    assert fake_speech == ["Olá."]
+    assert second.read_bytes() == first.read_bytes() == "Olá.".encode('utf-8') * 40
+    assert not tts_generator.synthesize_chunk("Olá.", "tts-1", "echo", cache, tmp_path / "c.pcm")
+    assert len(fake_speech) == 2 # Outra voz, outra chave
+
+
+def test_rerun_only_synthesizes_edited_paragraph(fake_speech, tmp_path):
+    script = make_script()
+    n_chunks = len(split_tts_chunks(script, config.TTS_CHUNK_MAX_CHARS))
+    output = tmp_path / "out" / "narration.mp3"
+    assert tts_generator.generate_narration(script, output) == str(output)
+    assert len(fake_speech) == n_chunks and output.stat().st_size > 0
+
+    fake_speech.clear()
+    output.unlink()
+    assert tts_generator.generate_narration(script, output) == str(output)
+    assert fake_speech == [] # Roteiro igual: tudo do cache
+
+    paragraphs = script.split('\n\n')
+    paragraphs[1] = "Parágrafo reescrito. Só ele volta para a API."
+    assert tts_generator.generate_narration('\n\n'.join(paragraphs), output) == str(output)
+    assert fake_speech == ["Parágrafo reescrito. Só ele volta para a API."]
@@ -0,0 +1,173 @@
+# video_pipeline/artifact_cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import config
+
+
+def file_digest(path: Path) -> str:
+    """sha256 do conteúdo de um arquivo."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Cache de artefatos endereçado pelo conteúdo das entradas.
+
+    Cada artefato (narração, timestamps, fundo...) é guardado sob o sha256 das
+    entradas que o definem (texto do roteiro, modelo/voz do TTS, duração,
+    parâmetros do efeito, config relevante), então mudar qualquer entrada gera
+    outra chave em vez de reaproveitar um arquivo velho. Um manifesto por
+    entrada guarda tamanho e sha256 do conteúdo, verificados a cada consulta
+    (entrada corrompida é descartada), e o último acesso, usado para despejar
+    as entradas menos usadas quando o total passa de `max_bytes`.
+
+    Os arquivos entram e saem do cache por hardlink (cópia se o sistema de
+    arquivos não permitir): o destino é sempre removido antes, então um
+    artefato regenerado nunca sobrescreve o objeto do cache.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.objects_dir = self.root / "objects"
+        self.manifests_dir = self.root / "manifests"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(kind: str, inputs: Dict[str, Any]) -> str:
+        """Chave de um artefato: sha256 do tipo e das entradas (JSON canônico)."""
+        payload = json.dumps({'kind': kind, 'inputs': inputs}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _manifest_path(self, key: str) -> Path:
+        return self.manifests_dir / f"{key}.json"
+
+    def _read_manifest(self, key: str) -> Dict[str, Any] | None:
+        try:
+            with open(self._manifest_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, key: str, manifest: Dict[str, Any]) -> None:
+        path = self._manifest_path(key)
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _link_or_copy(src: Path, dest: Path) -> None:
+        """Publica `src` em `dest` (hardlink ou cópia em arquivo temporário + rename)."""
+        tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.unlink(missing_ok=True)
+        try:
+            os.link(src, tmp_path)
+        except OSError:
+            shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dest)
+
+    def remove(self, key: str) -> None:
+        manifest = self._read_manifest(key)
+        if manifest is not None:
+            (self.root / manifest['object']).unlink(missing_ok=True)
+        self._manifest_path(key).unlink(missing_ok=True)
+
+    def lookup(self, key: str) -> Path | None:
+        """Objeto da chave, se existir e o conteúdo conferir com o manifesto."""
+        manifest = self._read_manifest(key)
+        if manifest is None:
+            return None
+        object_path = self.root / manifest['object']
+        try:
+            valid = object_path.stat().st_size == manifest['size'] and file_digest(object_path) == manifest['sha256']
+        except OSError:
+            valid = False
+        if not valid:
+            print(f"AVISO: Artefato '{manifest.get('kind')}' no cache não confere com o manifesto. Descartando.")
+            self.remove(key)
+            return None
+        manifest['last_access'] = time.time()
+        self._write_manifest(key, manifest)
+        return object_path
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        """Copia (hardlink) o artefato da chave para `dest`. False se não estiver no cache."""
+        object_path = self.lookup(key)
+        if object_path is None:
+            return False
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        self._link_or_copy(object_path, dest)
+        return True
+
+    def store(self, key: str, kind: str, src: Path, inputs: Dict[str, Any] | None = None) -> str:
+        """Guarda `src` sob a chave, despeja entradas antigas se preciso e retorna o sha256 do conteúdo."""
+        src = Path(src)
+        sha256 = file_digest(src)
+        object_rel = Path("objects") / key[:2] / f"{key}{src.suffix}"
+        object_path = self.root / object_rel
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        self._link_or_copy(src, object_path)
+        now = time.time()
+        self._write_manifest(key, {
+            'kind': kind,
+            'object': object_rel.as_posix(),
+            'size': object_path.stat().st_size,
+            'sha256': sha256,
+            'created': now,
+            'last_access': now,
+            'inputs': inputs,
+        })
+        self.evict(keep=key)
+        return sha256
+
+    def entries(self) -> List[Dict[str, Any]]:
+        entries = []
+        for path in self.manifests_dir.glob("*.json"):
+            manifest = self._read_manifest(path.stem)
+            if manifest is not None:
+                manifest['key'] = path.stem
+                entries.append(manifest)
+        return entries
+
+    def total_bytes(self) -> int:
+        return sum(entry['size'] for entry in self.entries())
+
+    def evict(self, keep: str | None = None) -> int:
+        """Remove as entradas usadas há mais tempo até o total caber em max_bytes. Retorna os bytes liberados."""
+        entries = sorted(self.entries(), key=lambda entry: entry['last_access'])
+        total = sum(entry['size'] for entry in entries)
+        freed = 0
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry['key'] == keep:
+                continue # Nunca despeja o artefato recém-guardado
+            self.remove(entry['key'])
+            total -= entry['size']
+            freed += entry['size']
+            print(f"Cache de artefatos: removido '{entry['kind']}' ({entry['size'] / 1e6:.1f} MB, LRU).")
+        return freed
+
+
+def shared_cache() -> ArtifactCache:
+    """
+    Cache do projeto em ARTIFACT_CACHE_DIR, limitado a ARTIFACT_CACHE_MAX_BYTES:
+    artefatos dos episódios e também os caches internos (trechos do TTS,
+    segmentos da intro, tiles do fundo), todos sob o mesmo limite LRU.
+    """
+    return ArtifactCache(getattr(config, 'ARTIFACT_CACHE_DIR', config.CACHE_DIR / "artifacts"),
+                         getattr(config, 'ARTIFACT_CACHE_MAX_BYTES', 10 * 1024 ** 3))
@@ -0,0 +1,67 @@
+# video_pipeline/audio_analysis.py
+from typing import List, Tuple
+
+import numpy as np
+
+ANALYSIS_FRAME_SECONDS = 0.02 # Resolução do envelope de energia (20 ms)
+
+
+def to_mono(samples: np.ndarray) -> np.ndarray:
+    """Média dos canais (N, C) -> (N,) float32."""
+    if samples.ndim == 1:
+        return samples.astype(np.float32, copy=False)
+    return samples.mean(axis=1, dtype=np.float32)
+
+
+def frame_energy_db(mono: np.ndarray, fps: int, frame_seconds: float = ANALYSIS_FRAME_SECONDS) -> np.ndarray:
+    """RMS em dBFS por bloco de `frame_seconds` (último bloco completado com zeros)."""
+    block = max(1, int(round(fps * frame_seconds)))
+    n_full = len(mono) // block
+    frames = mono[:n_full * block].reshape(n_full, block)
+    power = np.einsum('ij,ij->i', frames, frames, dtype=np.float64) # Soma dos quadrados sem cópia
+    if len(mono) > n_full * block:
+        tail = mono[n_full * block:].astype(np.float64)
+        power = np.append(power, np.dot(tail, tail))
+    rms = np.sqrt(power / block)
+    return 20.0 * np.log10(np.maximum(rms, 1e-6))
+
+
+def find_silences(mono: np.ndarray, fps: int, threshold_db: float = -35.0,
+                  min_seconds: float = 0.25, energy: np.ndarray | None = None) -> List[Tuple[float, float]]:
+    """
+    Intervalos (início, fim) em segundos com energia abaixo de `threshold_db`
+    em relação ao bloco mais alto do áudio, com pelo menos `min_seconds`.
+    `energy` reaproveita um frame_energy_db já calculado.
+    """
+    if len(mono) == 0:
+        return []
+    if energy is None:
+        energy = frame_energy_db(mono, fps)
+    quiet = energy < energy.max() + threshold_db
+    # Bordas das sequências de blocos silenciosos
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], quiet.astype(np.int8), [0]))))
+    duration = len(mono) / fps
+    starts = edges[::2] * ANALYSIS_FRAME_SECONDS
+    ends = np.minimum(duration, edges[1::2] * ANALYSIS_FRAME_SECONDS)
+    keep = ends - starts >= min_seconds
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
+
+
+def plan_silence_chunks(duration: float, silences: List[Tuple[float, float]],
+                        target_seconds: float, max_seconds: float) -> List[Tuple[float, float]]:
+    """
+    Divide [0, duration] em trechos de até `max_seconds`, cortando no meio do
+    silêncio mais próximo de `target_seconds` após o início de cada trecho.
+    Sem silêncio na janela, corta em `max_seconds` (corte seco).
+    """
+    centers = [(start + end) / 2 for start, end in silences]
+    chunks = []
+    start = 0.0
+    while duration - start > max_seconds:
+        lo, hi = start + target_seconds / 2, start + max_seconds
+        candidates = [c for c in centers if lo <= c <= hi]
+        cut = min(candidates, key=lambda c: abs(c - start - target_seconds)) if candidates else hi
+        chunks.append((start, cut))
+        start = cut
+    chunks.append((start, duration))
+    return chunks
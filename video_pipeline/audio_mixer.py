@@ -0,0 +1,108 @@
+# video_pipeline/audio_mixer.py
+import subprocess
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from video_pipeline.ffmpeg_utils import get_ffmpeg_binary, run_ffmpeg
+
+AUDIO_FPS = 44100
+DUCKING_BLOCK_SECONDS = 0.01 # Resolução do envelope da narração (10 ms)
+
+
+def decode_audio(path: Path, fps: int = AUDIO_FPS, channels: int = 2) -> np.ndarray:
+    """Decodifica um arquivo de áudio uma única vez (pipe do ffmpeg) para PCM float32 (N, channels)."""
+    cmd = [get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-i", str(path),
+           "-vn", "-f", "f32le", "-acodec", "pcm_f32le", "-ac", str(channels), "-ar", str(fps), "-"]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"Falha ao decodificar áudio {path} (código {result.returncode}): {stderr}")
+    return np.frombuffer(result.stdout, dtype='<f4').reshape(-1, channels).copy()
+
+
+def tile_to_length(samples: np.ndarray, length: int) -> np.ndarray:
+    """Repete (loop) ou corta as amostras até `length` amostras."""
+    if len(samples) == 0 or length <= 0:
+        return np.zeros((max(0, length), 2), dtype=np.float32)
+    return samples[np.arange(length) % len(samples)]
+
+
+def ducking_gain(voice: np.ndarray, fps: int, depth: float, threshold: float,
+                 smooth_seconds: float) -> np.ndarray:
+    """
+    Ganho de sidechain (1.0 = sem redução) calculado do envelope da narração:
+    RMS em blocos de 10 ms, suavizado por média móvel e interpolado por amostra.
+    """
+    block = max(1, int(fps * DUCKING_BLOCK_SECONDS))
+    n_blocks = -(-len(voice) // block)
+    padded = np.zeros((n_blocks * block,), dtype=np.float32)
+    padded[:len(voice)] = np.abs(voice).max(axis=1)
+    rms = np.sqrt(np.mean(padded.reshape(n_blocks, block) ** 2, axis=1))
+
+    # Narração presente -> reduz a música em `depth` (com transição suave)
+    amount = np.clip(rms / max(threshold, 1e-6), 0.0, 1.0)
+    window = max(1, int(smooth_seconds / DUCKING_BLOCK_SECONDS))
+    if window > 1:
+        kernel = np.ones(window, dtype=np.float32) / window
+        amount = np.convolve(amount, kernel, mode='same')
+    gain_blocks = 1.0 - depth * np.clip(amount, 0.0, 1.0)
+
+    block_centers = (np.arange(n_blocks) + 0.5) * block
+    return np.interp(np.arange(len(voice)), block_centers, gain_blocks).astype(np.float32)
+
+
+def mix_final_audio(narration_path: Path, narration_start: float, narration_duration: float,
+                    final_duration: float, music_path: Path | None = None, music_volume: float = 1.0,
+                    ducking: bool = False, ducking_depth: float = 0.5, ducking_threshold: float = 0.05,
+                    ducking_smooth: float = 0.3, fps: int = AUDIO_FPS) -> np.ndarray:
+    """
+    Mixa narração e música de fundo em um único buffer PCM (N, 2) float32.
+
+    A música tem o volume aplicado e é repetida/cortada para a duração final; a
+    narração é cortada (ou completada com silêncio) para `narration_duration` e
+    posicionada em `narration_start`. Opcionalmente a música é abaixada
+    (ducking) enquanto há narração.
+    """
+    total = int(round(final_duration * fps))
+    mix = np.zeros((total, 2), dtype=np.float32)
+
+    voice_track = np.zeros((total, 2), dtype=np.float32)
+    narration = decode_audio(narration_path, fps)[:int(round(narration_duration * fps))]
+    start = min(total, int(round(narration_start * fps)))
+    end = min(total, start + len(narration))
+    voice_track[start:end] = narration[:end - start]
+
+    if music_path is not None:
+        music = tile_to_length(decode_audio(music_path, fps), total)
+        music *= music_volume
+        if ducking:
+            music *= ducking_gain(voice_track, fps, ducking_depth, ducking_threshold, ducking_smooth)[:, None]
+        mix += music
+
+    mix += voice_track
+    np.clip(mix, -1.0, 1.0, out=mix)
+    return mix
+
+
+def write_wav(samples: np.ndarray, path: Path, fps: int = AUDIO_FPS) -> None:
+    """Grava amostras float (N, 2) em um WAV PCM 16 bits."""
+    pcm = np.rint(np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(str(path), 'wb') as wav_file:
+        wav_file.setnchannels(pcm.shape[1])
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(fps)
+        wav_file.writeframes(pcm.tobytes())
+
+
+def write_audio_track(samples: np.ndarray, output_path: Path, audio_codec: str = "aac",
+                      fps: int = AUDIO_FPS) -> Path:
+    """Grava o mix uma única vez, já no codec final (ex: AAC em .m4a), pronto para mux."""
+    wav_path = output_path.with_suffix(".wav")
+    write_wav(samples, wav_path, fps)
+    try:
+        run_ffmpeg(["-i", wav_path, "-c:a", audio_codec, output_path], description="codificação do áudio")
+    finally:
+        wav_path.unlink(missing_ok=True)
+    return output_path
@@ -0,0 +1,465 @@
+# video_pipeline/compositor.py
+from bisect import bisect_right
+from typing import List
+
+import numpy as np
+from moviepy.editor import CompositeVideoClip, ImageClip, VideoClip
+from PIL import Image, ImageDraw
+
+
+class ActiveLayerIndex:
+    """
+    Índice de intervalos das camadas de uma composição.
+
+    Uma varredura ordenada pelos inícios/fins das camadas divide a linha do tempo
+    em intervalos elementares e guarda, para cada um, as camadas visíveis (na
+    ordem de empilhamento). Consultar o tempo t custa uma busca binária,
+    independente de quantas camadas existem.
+    """
+
+    def __init__(self, clips: List):
+        events = {} # tempo -> (camadas que entram, camadas que saem)
+        for idx, clip in enumerate(clips):
+            events.setdefault(clip.start, ([], []))[0].append(idx)
+            if clip.end is not None:
+                events.setdefault(clip.end, ([], []))[1].append(idx)
+
+        self.boundaries = sorted(events)
+        self.segments = []
+        active = set()
+        for boundary in self.boundaries:
+            entering, leaving = events[boundary]
+            active.difference_update(leaving)
+            # Camadas com duração zero (start == end) nunca ficam visíveis
+            active.update(i for i in entering if clips[i].end is None or clips[i].end > boundary)
+            self.segments.append(tuple(sorted(active)))
+
+    def active(self, t: float) -> tuple:
+        """Índices das camadas visíveis em t (start <= t < end), em ordem de empilhamento."""
+        k = bisect_right(self.boundaries, t) - 1
+        return self.segments[k] if k >= 0 else ()
+
+    def max_active(self) -> int:
+        """Maior número de camadas visíveis ao mesmo tempo."""
+        return max((len(seg) for seg in self.segments), default=0)
+
+
+class IndexedCompositeVideoClip(CompositeVideoClip):
+    """
+    CompositeVideoClip que consulta um ActiveLayerIndex em vez de testar o
+    início/fim de todas as camadas a cada frame. O resultado é idêntico ao
+    CompositeVideoClip; só a seleção das camadas ativas muda.
+    """
+
+    def __init__(self, clips, size=None, bg_color=None, use_bgclip=False, ismask=False):
+        CompositeVideoClip.__init__(self, clips, size=size, bg_color=bg_color,
+                                    use_bgclip=use_bgclip, ismask=ismask)
+        self.layer_index = ActiveLayerIndex(self.clips)
+
+    def playing_clips(self, t=0):
+        if isinstance(t, np.ndarray):
+            return CompositeVideoClip.playing_clips(self, t)
+        return [self.clips[i] for i in self.layer_index.active(t)]
+
+
+def resolve_position(clip, clip_size: tuple, frame_size: tuple, t: float = 0) -> tuple:
+    """Posição (x, y) em pixels de um clipe, com as mesmas regras do blit do MoviePy."""
+    wf, hf = frame_size
+    wi, hi = clip_size
+    pos = clip.pos(t)
+    if isinstance(pos, str):
+        pos = {'center': ['center', 'center'], 'left': ['left', 'center'],
+               'right': ['right', 'center'], 'top': ['center', 'top'],
+               'bottom': ['center', 'bottom']}[pos]
+    else:
+        pos = list(pos)
+    if getattr(clip, 'relative_pos', False):
+        for i, dim in enumerate([wf, hf]):
+            if not isinstance(pos[i], str):
+                pos[i] = dim * pos[i]
+    if isinstance(pos[0], str):
+        pos[0] = {'left': 0, 'center': (wf - wi) / 2, 'right': wf - wi}[pos[0]]
+    if isinstance(pos[1], str):
+        pos[1] = {'top': 0, 'center': (hf - hi) / 2, 'bottom': hf - hi}[pos[1]]
+    return int(pos[0]), int(pos[1])
+
+
+class StaticSprite:
+    """
+    Camada estática (imagem + máscara fixas) pronta para blend inteiro:
+    cor pré-multiplicada pelo alfa (uint16) e alfa inverso, recortados à
+    área visível (bounding box da máscara dentro do frame).
+
+    Os buffers ficam em um único atributo (`state`), criado no prepare e
+    descartado no release. O blend lê o atributo uma vez só: um blend em
+    outra thread que perde a corrida com o release monta um estado
+    temporário em vez de ler buffers já liberados.
+    """
+
+    def __init__(self, clip, frame_size: tuple, label: str = 'overlay'):
+        self.clip = clip
+        self.label = label
+        self.start, self.end = clip.start, clip.end
+        self.frame_size = frame_size
+        self.state = None # (box, premult, inv_alpha); box None = invisível
+
+    @staticmethod
+    def supports(clip) -> bool:
+        """Clipes de imagem fixa, com máscara fixa e posição constante."""
+        if not isinstance(clip, ImageClip):
+            return False
+        if clip.mask is not None and not isinstance(clip.mask, ImageClip):
+            return False
+        end_t = (clip.duration or 0) / 2
+        return clip.pos(0) == clip.pos(end_t)
+
+    def build(self) -> tuple:
+        """Converte a imagem do clipe para o formato pré-multiplicado: (box, premult, inv_alpha)."""
+        img = self.clip.get_frame(0)
+        if img.dtype != np.uint8:
+            img = np.clip(img, 0, 255).astype(np.uint8)
+        h, w = img.shape[:2]
+        if self.clip.mask is not None:
+            mask = self.clip.mask.get_frame(0)
+            alpha = np.clip(np.rint(mask * 255), 0, 255).astype(np.uint8)
+            if alpha.shape != (h, w): # Mesmo ajuste do blit_on do MoviePy
+                alpha = alpha[:h, :w]
+        else:
+            alpha = np.full((h, w), 255, dtype=np.uint8)
+
+        x, y = resolve_position(self.clip, (w, h), self.frame_size)
+        wf, hf = self.frame_size
+        # Recorta ao frame e ao bounding box dos pixels visíveis
+        sx0, sy0 = max(0, -x), max(0, -y)
+        sx1, sy1 = min(w, wf - x), min(h, hf - y)
+        if sx0 >= sx1 or sy0 >= sy1:
+            return None, None, None
+        visible = alpha[sy0:sy1, sx0:sx1]
+        rows = np.flatnonzero(visible.any(axis=1))
+        cols = np.flatnonzero(visible.any(axis=0))
+        if rows.size == 0:
+            return None, None, None
+        sy0, sy1 = sy0 + rows[0], sy0 + rows[-1] + 1
+        sx0, sx1 = sx0 + cols[0], sx0 + cols[-1] + 1
+
+        a = alpha[sy0:sy1, sx0:sx1, None].astype(np.uint16)
+        premult = img[sy0:sy1, sx0:sx1].astype(np.uint16) * a
+        return (x + sx0, y + sy0, x + sx1, y + sy1), premult, 255 - a
+
+    def prepare(self) -> tuple:
+        """Cria o estado da camada (feito uma única vez enquanto ela está em uso)."""
+        state = self.state
+        if state is None:
+            state = self.state = self.build()
+        return state
+
+    def release(self) -> None:
+        """Libera os buffers pré-multiplicados (recriados se a camada voltar a ser usada)."""
+        self.state = None
+
+    def blend(self, frame: np.ndarray, acc: np.ndarray, tmp: np.ndarray) -> None:
+        state = self.state
+        self.blend_state(frame, acc, tmp, state if state is not None else self.build())
+
+    @staticmethod
+    def blend_state(frame: np.ndarray, acc: np.ndarray, tmp: np.ndarray, state: tuple) -> None:
+        """Alpha blend inteiro (uint16) apenas dentro do bounding box da camada."""
+        box, premult, inv_alpha = state
+        if box is None:
+            return
+        x0, y0, x1, y1 = box
+        h, w = y1 - y0, x1 - x0
+        dst = frame[y0:y1, x0:x1]
+        acc = acc[:h, :w]
+        tmp = tmp[:h, :w]
+        # acc = dst * (255 - a) + cor * a  (<= 255 * 255, cabe em uint16)
+        np.multiply(dst, inv_alpha, out=acc)
+        acc += premult
+        # Divisão por 255 com arredondamento: (x + 128 + ((x + 128) >> 8)) >> 8
+        acc += 128
+        np.right_shift(acc, 8, out=tmp)
+        acc += tmp
+        np.right_shift(acc, 8, out=acc)
+        np.copyto(dst, acc, casting='unsafe')
+
+
+class SpritePanel:
+    """Painel de fundo de um MaskSpriteClip: retângulo arredondado de cor e alfa únicos."""
+
+    def __init__(self, box: tuple, radius: int, color: tuple, alpha: int):
+        self.box = box # (x0, y0, x1, y1) dentro da imagem do clipe
+        self.radius = radius
+        self.color = tuple(color[:3])
+        self.alpha = alpha
+
+    def draw(self, img: Image.Image) -> None:
+        ImageDraw.Draw(img).rounded_rectangle(self.box, radius=self.radius, fill=(*self.color, self.alpha))
+
+
+def crop_to_ink(coverage: np.ndarray) -> tuple:
+    """Recorta a máscara aos pixels com tinta; retorna a máscara recortada e o seu canto (x, y)."""
+    rows = np.flatnonzero(coverage.any(axis=1))
+    cols = np.flatnonzero(coverage.any(axis=0))
+    if rows.size == 0:
+        return coverage[:0, :0], (0, 0)
+    return coverage[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1], (int(cols[0]), int(rows[0]))
+
+
+class MaskSpriteClip(VideoClip):
+    """
+    Clipe de texto de cor única guardado só como máscara de cobertura uint8
+    (recortada aos pixels com tinta), cor e painel opcional. A cor só é
+    aplicada no blend (MaskSprite); para o blit do MoviePy, o frame e a
+    máscara são reconstruídos sob demanda, idênticos à imagem RGBA do Pillow.
+
+    O tamanho e a posição do clipe são os da imagem inteira (como um ImageClip
+    da mesma imagem); `ink_offset` é o canto da máscara recortada dentro dela.
+    Com `size` dado, `coverage` já vem recortada (ex: view de um SpriteStore,
+    que assim não é lida na criação do clipe). `on_release` é chamado quando
+    a camada deixa de ser usada pelo compositor.
+    """
+
+    def __init__(self, coverage: np.ndarray, color: tuple, panel: SpritePanel | None = None,
+                 size: tuple | None = None, ink_offset: tuple = (0, 0)):
+        VideoClip.__init__(self)
+        if size is None:
+            h, w = coverage.shape
+            self.size = (w, h)
+            self.coverage, self.ink_offset = crop_to_ink(coverage)
+        else:
+            self.size = tuple(size)
+            self.coverage, self.ink_offset = coverage, tuple(ink_offset)
+        self.color = tuple(color[:3])
+        self.panel = panel
+        self.on_release = None
+        self.make_frame = lambda t: self.render_rgba()[:, :, :3]
+        # make_frame atribuído depois: o construtor do VideoClip renderizaria o frame 0 para achar o tamanho
+        self.mask = VideoClip(ismask=True)
+        self.mask.make_frame = lambda t: self.render_rgba()[:, :, 3] / 255.0
+        self.mask.size = self.size
+
+    def render_rgba(self) -> np.ndarray:
+        """Imagem RGBA completa (painel + texto colorido), como o Pillow a desenharia."""
+        img = Image.new('RGBA', self.size, (0, 0, 0, 0))
+        if self.panel is not None:
+            self.panel.draw(img)
+        if self.coverage.size:
+            x, y = self.ink_offset
+            h, w = self.coverage.shape
+            img.paste(self.color, (x, y, x + w, y + h), Image.fromarray(np.ascontiguousarray(self.coverage)))
+        return np.array(img)
+
+
+def _crop_to_frame(mask: np.ndarray, x: int, y: int, frame_size: tuple):
+    """Recorta a máscara posicionada em (x, y) ao frame e ao bounding box dos pixels > 0."""
+    h, w = mask.shape
+    wf, hf = frame_size
+    sx0, sy0 = max(0, -x), max(0, -y)
+    sx1, sy1 = min(w, wf - x), min(h, hf - y)
+    if sx0 >= sx1 or sy0 >= sy1:
+        return None, None
+    visible = mask[sy0:sy1, sx0:sx1]
+    rows = np.flatnonzero(visible.any(axis=1))
+    cols = np.flatnonzero(visible.any(axis=0))
+    if rows.size == 0:
+        return None, None
+    sy0, sy1 = sy0 + rows[0], sy0 + rows[-1] + 1
+    sx0, sx1 = sx0 + cols[0], sx0 + cols[-1] + 1
+    return mask[sy0:sy1, sx0:sx1], (x + sx0, y + sy0, x + sx1, y + sy1)
+
+
+class MaskSprite(StaticSprite):
+    """
+    Camada de um MaskSpriteClip: o blend lê só a máscara de cobertura uint8
+    (1 byte por pixel, em vez da cor pré-multiplicada e do alfa inverso em
+    uint16) e aplica a cor na hora.
+
+    Com painel, o texto é colorido sobre ele como o Pillow faz (a mistura não
+    equivale a dois blends seguidos), então a imagem RGBA é montada no
+    prepare e misturada como um StaticSprite enquanto a camada está ativa.
+    """
+
+    def __init__(self, clip, frame_size: tuple, label: str = 'overlay'):
+        StaticSprite.__init__(self, clip, frame_size, label)
+        self.color = np.array(clip.color, dtype=np.uint16)
+
+    @staticmethod
+    def supports(clip) -> bool:
+        if not isinstance(clip, MaskSpriteClip):
+            return False
+        end_t = (clip.duration or 0) / 2
+        return clip.pos(0) == clip.pos(end_t)
+
+    def build(self) -> tuple:
+        """Com painel: estado de StaticSprite; sem painel: (box, cobertura uint8 recortada ao frame, None)."""
+        clip = self.clip
+        if clip.panel is not None:
+            return StaticSprite.build(self)
+        x, y = resolve_position(clip, clip.size, self.frame_size)
+        ink_x, ink_y = clip.ink_offset
+        alpha, box = _crop_to_frame(clip.coverage, x + ink_x, y + ink_y, self.frame_size)
+        return box, alpha, None
+
+    def release(self) -> None:
+        StaticSprite.release(self)
+        if self.clip.on_release is not None:
+            self.clip.on_release()
+
+    @staticmethod
+    def blend_mask(frame: np.ndarray, acc: np.ndarray, tmp: np.ndarray, box: tuple,
+                   alpha: np.ndarray, color: np.ndarray) -> None:
+        """Alpha blend inteiro de uma cor única com a máscara `alpha` (uint8) dentro de `box`."""
+        x0, y0, x1, y1 = box
+        h, w = y1 - y0, x1 - x0
+        # Linhas achatadas (h, w*3): o alfa é repetido por canal e todas as operações
+        # ficam contíguas (broadcast de (h, w, 1) contra 3 canais é bem mais lento)
+        dst = frame[y0:y1, x0:x1].reshape(h, w * 3)
+        acc = acc[:h, :w].reshape(h, w * 3)
+        tmp = tmp[:h, :w].reshape(h, w * 3)
+        a = np.repeat(alpha, 3, axis=1)
+        # acc = dst * (255 - a) + cor * a
+        np.subtract(255, a, out=tmp)
+        np.multiply(dst, tmp, out=acc)
+        np.multiply(a, np.tile(color, w), out=tmp)
+        acc += tmp
+        # Divisão por 255 com arredondamento (mesma do StaticSprite)
+        acc += 128
+        np.right_shift(acc, 8, out=tmp)
+        acc += tmp
+        np.right_shift(acc, 8, out=acc)
+        np.copyto(dst, acc, casting='unsafe')
+
+    def blend(self, frame: np.ndarray, acc: np.ndarray, tmp: np.ndarray) -> None:
+        state = self.state
+        if state is None:
+            state = self.build()
+        if self.clip.panel is not None:
+            self.blend_state(frame, acc, tmp, state)
+        elif state[0] is not None:
+            self.blend_mask(frame, acc, tmp, state[0], state[1], self.color)
+
+
+class LayerStackClip(VideoClip):
+    """
+    Compositor dedicado à pilha de camadas fixa do pipeline: fundo (primeira
+    camada, opaca e do tamanho do frame), intro, logo e textos.
+
+    - Camadas estáticas (ImageClip de texto/logo) são misturadas com aritmética
+      inteira pré-multiplicada apenas dentro do seu bounding box, em buffers
+      pré-alocados, sem converter o frame inteiro para float. Textos de cor
+      única (MaskSpriteClip) são misturados direto da máscara uint8.
+    - Camadas dinâmicas (ex: intro) usam o blit do MoviePy; se forem opacas e
+      cobrirem o frame inteiro, o fundo e as camadas abaixo nem são buscados.
+    - As camadas visíveis em cada t vêm de um ActiveLayerIndex.
+    - Camadas estáticas cujo fim já passou têm os buffers liberados (varredura
+      em ordem de término a cada frame), em qualquer modo de render.
+
+    O array retornado por get_frame é reutilizado no frame seguinte.
+    """
+
+    def __init__(self, clips: List, size: tuple, fps: float | None = None):
+        VideoClip.__init__(self)
+        self.size = tuple(size)
+        self.base = clips[0]
+        self.clips = list(clips[1:])
+        self.layer_index = ActiveLayerIndex(self.clips)
+        self.fps = fps or max((c.fps for c in clips if getattr(c, 'fps', None)), default=None)
+        ends = [c.end for c in clips]
+        if None not in ends:
+            self.duration = max(ends)
+            self.end = self.duration
+
+        self.layers = []
+        for clip in self.clips:
+            if MaskSprite.supports(clip):
+                self.layers.append(MaskSprite(clip, self.size))
+            elif StaticSprite.supports(clip):
+                self.layers.append(StaticSprite(clip, self.size))
+            else:
+                self.layers.append(None) # Camada dinâmica (blit do MoviePy)
+        self._opaque = [layer is None and self._covers_frame(clip) for layer, clip in zip(self.layers, self.clips)]
+        # Camadas estáticas em ordem de término, liberadas quando t passa do seu fim
+        self._releases = sorted((layer for layer in self.layers if layer is not None and layer.end is not None),
+                                key=lambda layer: layer.end)
+        self._release_ends = [layer.end for layer in self._releases]
+        self._next_release = 0
+        self._release_t = float('-inf')
+
+        w, h = self.size
+        self._frame = np.empty((h, w, 3), dtype=np.uint8)
+        self._acc = np.empty((h, w, 3), dtype=np.uint16)
+        self._tmp = np.empty((h, w, 3), dtype=np.uint16)
+        self.make_frame = lambda t: self.render_frame(t, self._frame)
+
+    def _covers_frame(self, clip) -> bool:
+        """Camada dinâmica opaca do tamanho do frame, posicionada em (0, 0)."""
+        if clip.mask is not None or tuple(clip.size) != self.size:
+            return False
+        try:
+            return resolve_position(clip, clip.size, self.size) == (0, 0)
+        except Exception:
+            return False
+
+    def static_sprites(self) -> int:
+        return sum(1 for layer in self.layers if layer is not None)
+
+    def release_expired(self, t: float) -> None:
+        """Libera as camadas estáticas com end <= t (a varredura recomeça se t voltar no tempo)."""
+        if t < self._release_t:
+            self._next_release = bisect_right(self._release_ends, t)
+        self._release_t = t
+        while self._next_release < len(self._releases) and self._release_ends[self._next_release] <= t:
+            self._releases[self._next_release].release()
+            self._next_release += 1
+
+    def render_frame(self, t: float, out: np.ndarray) -> np.ndarray:
+        """Compõe o frame do tempo t no buffer `out`."""
+        self.blend_sprites(self.render_dynamic(t, out), out, self._acc, self._tmp)
+        return out
+
+    def render_dynamic(self, t: float, out: np.ndarray) -> List[StaticSprite]:
+        """
+        Parte sequencial da composição: fundo, camadas dinâmicas e as camadas
+        estáticas abaixo delas. Retorna as camadas estáticas do topo (já
+        preparadas), que podem ser misturadas depois, em outra thread, com
+        blend_sprites. Libera antes as camadas estáticas que já terminaram.
+        """
+        self.release_expired(t)
+        active = self.layer_index.active(t)
+        # Começa pela camada opaca de tela cheia mais alta (se houver)
+        first = 0
+        for pos in range(len(active) - 1, -1, -1):
+            if self._opaque[active[pos]]:
+                first = pos
+                break
+        else:
+            np.copyto(out, self.base.get_frame(t), casting='unsafe')
+
+        # Camadas estáticas acima da última dinâmica ficam para o blend
+        last_dynamic = first - 1
+        for pos in range(first, len(active)):
+            if self.layers[active[pos]] is None:
+                last_dynamic = pos
+
+        for pos in range(first, last_dynamic + 1):
+            idx = active[pos]
+            clip, layer = self.clips[idx], self.layers[idx]
+            if layer is not None:
+                layer.prepare()
+                layer.blend(out, self._acc, self._tmp)
+            elif self._opaque[idx] and pos == first:
+                np.copyto(out, clip.get_frame(t - clip.start), casting='unsafe')
+            else:
+                np.copyto(out, clip.blit_on(out, t), casting='unsafe')
+
+        sprites = [self.layers[idx] for idx in active[last_dynamic + 1:]]
+        for sprite in sprites:
+            sprite.prepare()
+        return sprites
+
+    @staticmethod
+    def blend_sprites(sprites: List[StaticSprite], out: np.ndarray, acc: np.ndarray, tmp: np.ndarray) -> np.ndarray:
+        """Mistura camadas estáticas já preparadas em `out` (buffers auxiliares próprios por thread)."""
+        for sprite in sprites:
+            sprite.blend(out, acc, tmp)
+        return out
@@ -0,0 +1,48 @@
+# video_pipeline/ffmpeg_utils.py
+import subprocess
+from pathlib import Path
+from typing import List
+
+from moviepy.config import get_setting
+
+
+def get_ffmpeg_binary() -> str:
+    """Retorna o binário do ffmpeg usado pelo MoviePy (imageio-ffmpeg ou FFMPEG_BINARY)."""
+    return get_setting("FFMPEG_BINARY")
+
+
+def run_ffmpeg(args: List[str], description: str = "ffmpeg") -> None:
+    """Executa o ffmpeg com os argumentos dados e lança RuntimeError em caso de falha."""
+    cmd = [get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y", *[str(a) for a in args]]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"Falha no {description} (código {result.returncode}): {stderr}")
+
+
+def loop_stream_copy(source_path: Path, output_path: Path, duration: float) -> None:
+    """Repete `source_path` até `duration` segundos, sem reencodar (stream copy)."""
+    run_ffmpeg(["-stream_loop", "-1", "-i", source_path, "-t", f"{duration:.3f}",
+                "-c", "copy", "-an", output_path],
+               description="loop do tile de fundo")
+
+
+def concat_stream_copy(paths: List[Path], output_path: Path) -> None:
+    """Junta vídeos com os mesmos parâmetros de codificação usando o concat demuxer (sem reencodar)."""
+    list_path = output_path.with_name(f"{output_path.stem}_concat.txt")
+    try:
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in paths:
+                escaped = str(Path(path).resolve()).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path],
+                   description="concat de segmentos")
+    finally:
+        list_path.unlink(missing_ok=True)
+
+
+def mux_audio(video_path: Path, audio_path: Path, output_path: Path, audio_codec: str = "aac") -> None:
+    """Junta uma trilha de vídeo (copiada sem reencodar) com uma trilha de áudio."""
+    run_ffmpeg(["-i", video_path, "-i", audio_path, "-map", "0:v:0", "-map", "1:a:0",
+                "-c:v", "copy", "-c:a", audio_codec, "-shortest", output_path],
+               description="mux de áudio")
@@ -6,7 +6,10 @@ import sys
 from PIL import Image, ImageOps
 import cv2
 from moviepy.editor import VideoClip
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
 import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
 # Adiciona o diretório pai ao sys.path para poder importar config
 project_root = Path(__file__).resolve().parent.parent
@@ -24,7 +27,158 @@ except ImportError:
         VIDEO_SIZE = (VIDEO_WIDTH, VIDEO_HEIGHT)
     config = DummyConfig()
 
-def criar_video_glitch(img_path, output_path, duration=10, fps=30):
+from video_pipeline.glitch_engine import (GlitchEngine, DEFAULT_INTENSITY_FREQ,
+                                          effect_signature, loop_intensity_freq)
+from video_pipeline.ffmpeg_utils import loop_stream_copy, concat_stream_copy
+from video_pipeline.artifact_cache import ArtifactCache, shared_cache
+
+def carregar_imagem_base(img_path, size: tuple | None = None) -> np.ndarray:
+    """Carrega a imagem base em RGB, já redimensionada para o tamanho do vídeo."""
+    # Carrega a imagem usando OpenCV para evitar problemas com o Pillow
+    img = cv2.imread(str(img_path))
+    if img is None:
+        raise ValueError(f"Não foi possível carregar a imagem: {img_path}")
+    
+    # Converte BGR para RGB (OpenCV usa BGR por padrão)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    
+    # Redimensiona para o tamanho de vídeo configurado
+    size = size or (config.VIDEO_WIDTH, config.VIDEO_HEIGHT)
+    return cv2.resize(img, tuple(size), interpolation=cv2.INTER_LANCZOS4)
+
+def parametros_engine(intensity_freq: float = DEFAULT_INTENSITY_FREQ) -> dict:
+    """Parâmetros do motor de glitch lidos do config (dict simples, serializável entre processos)."""
+    return {
+        'size': (config.VIDEO_WIDTH, config.VIDEO_HEIGHT),
+        'seed': getattr(config, 'BG_GLITCH_SEED', 0),
+        'block_frames': getattr(config, 'BG_GLITCH_BLOCK_FRAMES', 64),
+        'noise_bank_size': getattr(config, 'BG_GLITCH_NOISE_BANK_SIZE', 6),
+        'intensity_freq': intensity_freq,
+        'encoder': getattr(config, 'BG_ENCODER', DEFAULT_BG_ENCODER),
+    }
+
+def criar_engine(img: np.ndarray, fps: float, params: dict | None = None) -> GlitchEngine:
+    """Cria o motor de glitch com os parâmetros do config (ou os `params` dados)."""
+    params = params or parametros_engine()
+    return GlitchEngine(
+        img, fps,
+        seed=params['seed'],
+        block_frames=params['block_frames'],
+        noise_bank_size=params['noise_bank_size'],
+        intensity_freq=params['intensity_freq']
+    )
+
+DEFAULT_BG_ENCODER = 'x264' # Mesmo padrão do config.BG_ENCODER (usado também sem config.py)
+
+# Codificadores do fundo via pipe para o ffmpeg: nome -> (codec, preset, parâmetros extras)
+# 'x264_intra' só tem keyframes (decodificação barata e busca instantânea no composer)
+BG_ENCODERS = {
+    'x264': ('libx264', 'veryfast', ['-crf', '18', '-pix_fmt', 'yuv420p']),
+    'x264_intra': ('libx264', 'ultrafast', ['-crf', '18', '-g', '1', '-tune', 'fastdecode', '-pix_fmt', 'yuv420p']),
+    'mjpeg': ('mjpeg', 'medium', ['-q:v', '3', '-pix_fmt', 'yuvj420p']),
+}
+
+def _abrir_escritor(output_path: str, size: tuple, fps: float, encoder: str):
+    """
+    Abre o escritor do fundo. 'cv2_mp4v' mantém o VideoWriter do OpenCV (exige BGR);
+    os demais enviam frames RGB crus direto para um processo ffmpeg.
+    Retorna (escritor, precisa_bgr).
+    """
+    if encoder == 'cv2_mp4v':
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Codec para MP4
+        return cv2.VideoWriter(output_path, fourcc, fps, tuple(size)), True
+    if encoder not in BG_ENCODERS:
+        raise ValueError(f"Codificador de fundo desconhecido: '{encoder}'. Opções: cv2_mp4v, {', '.join(BG_ENCODERS)}")
+    codec, preset, extra_params = BG_ENCODERS[encoder]
+    writer = FFMPEG_VideoWriter(output_path, tuple(size), fps, codec=codec, preset=preset,
+                                threads=getattr(config, 'BG_ENCODER_THREADS', None),
+                                ffmpeg_params=list(extra_params))
+    return writer, False
+
+def _escrever_frames(engine: GlitchEngine, output_path: str, fps: float,
+                     start_frame: int, stop_frame: int, encoder: str = DEFAULT_BG_ENCODER,
+                     show_progress: bool = True) -> None:
+    """Renderiza os frames [start_frame, stop_frame) do motor em um arquivo de vídeo."""
+    # Configura o escritor de vídeo
+    video_writer, needs_bgr = _abrir_escritor(output_path, (engine.width, engine.height), fps, encoder)
+    frame_bgr = np.empty_like(engine.base) if needs_bgr else None
+    total_frames = stop_frame - start_frame
+    progress_step = max(1, total_frames // 10)
+    start_time = time.time()
+    try:
+        for frame_num, frame in engine.iter_frames(start_frame, stop_frame):
+            if needs_bgr:
+                # Converte RGB para BGR para salvar com OpenCV (sem alocar novo frame)
+                cv2.cvtColor(frame, cv2.COLOR_RGB2BGR, dst=frame_bgr)
+                video_writer.write(frame_bgr)
+            else:
+                video_writer.write_frame(frame)
+            
+            # Mostra progresso a cada 10%
+            done = frame_num - start_frame + 1
+            if show_progress and ((done - 1) % progress_step == 0 or done == total_frames):
+                percent = done / total_frames * 100
+                elapsed = time.time() - start_time
+                frames_per_sec = done / elapsed if elapsed > 0 else 0.0
+                print(f"Progresso: {percent:.1f}% ({done}/{total_frames} frames, {elapsed:.1f}s, {frames_per_sec:.1f} frames/s)")
+    finally:
+        # Libera recursos
+        if needs_bgr:
+            video_writer.release()
+        else:
+            video_writer.close()
+
+def _renderizar_segmento(job: dict) -> str:
+    """Renderiza um segmento da linha do tempo do fundo (em processo separado ou no atual)."""
+    img = carregar_imagem_base(job['img_path'], job['params']['size'])
+    engine = criar_engine(img, job['fps'], job['params'])
+    _escrever_frames(engine, job['output_path'], job['fps'], job['start_frame'], job['stop_frame'],
+                     encoder=job['params']['encoder'], show_progress=False)
+    return job['output_path']
+
+def _renderizar_em_segmentos(img_path, output_path: str, total_frames: int, fps: float,
+                             params: dict, workers: int) -> None:
+    """
+    Divide a linha do tempo em segmentos de tamanho fixo, renderiza cada um (em
+    `workers` processos, ou no processo atual com workers=0) e junta tudo com o
+    concat do ffmpeg (sem reencodar). Os segmentos não dependem do número de
+    workers, então o arquivo é idêntico para qualquer quantidade de processos,
+    inclusive 0 (mesmos limites de GOP).
+    """
+    segment_frames = max(1, round(getattr(config, 'BG_PARALLEL_SEGMENT_SECONDS', 10) * fps))
+    segments_dir = Path(output_path).with_name(f"{Path(output_path).stem}_segments")
+    segments_dir.mkdir(parents=True, exist_ok=True)
+    jobs = []
+    for index, start_frame in enumerate(range(0, total_frames, segment_frames)):
+        jobs.append({
+            'img_path': str(img_path),
+            'output_path': str(segments_dir / f"segment_{index:04d}.mp4"),
+            'fps': fps,
+            'start_frame': start_frame,
+            'stop_frame': min(start_frame + segment_frames, total_frames),
+            'params': params,
+        })
+    try:
+        segment_paths = []
+        if workers >= 1:
+            print(f"Renderizando {len(jobs)} segmentos em {workers} processos...")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for done, segment_path in enumerate(executor.map(_renderizar_segmento, jobs), start=1):
+                    segment_paths.append(Path(segment_path))
+                    print(f"Segmento {done}/{len(jobs)} pronto.")
+        else:
+            print(f"Renderizando {len(jobs)} segmentos no processo atual...")
+            for done, job in enumerate(jobs, start=1):
+                segment_paths.append(Path(_renderizar_segmento(job)))
+                print(f"Segmento {done}/{len(jobs)} pronto.")
+        concat_stream_copy(segment_paths, Path(output_path))
+    finally:
+        for job in jobs:
+            Path(job['output_path']).unlink(missing_ok=True)
+        if segments_dir.exists() and not any(segments_dir.iterdir()):
+            segments_dir.rmdir()
+
+def criar_video_glitch(img_path, output_path, duration=10, fps=30, intensity_freq=DEFAULT_INTENSITY_FREQ, workers=None):
     """Cria um vídeo com efeito glitch a partir de uma imagem base."""
     if os.path.exists(output_path):
         print(f"✔️ Vídeo de fundo já existe: {output_path}")
@@ -32,88 +186,24 @@ def criar_video_glitch(img_path, output_path, duration=10, fps=30):
 
     print(f"⏳ Gerando vídeo glitch a partir de {img_path}...")
     try:
-        # Carrega a imagem usando OpenCV para evitar problemas com o Pillow
-        img = cv2.imread(img_path)
-        if img is None:
-            raise ValueError(f"Não foi possível carregar a imagem: {img_path}")
-        
-        # Converte BGR para RGB (OpenCV usa BGR por padrão)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
-        # Redimensiona para o tamanho de vídeo configurado
-        img = cv2.resize(img, (config.VIDEO_WIDTH, config.VIDEO_HEIGHT), interpolation=cv2.INTER_LANCZOS4)
+        params = parametros_engine(intensity_freq)
         
         # Cria diretório de saída se não existir
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # Configura o escritor de vídeo
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Codec para MP4
-        video_writer = cv2.VideoWriter(
-            output_path, 
-            fourcc, 
-            fps, 
-            (config.VIDEO_WIDTH, config.VIDEO_HEIGHT)
-        )
-        
         # Número total de frames
         total_frames = int(duration * fps)
+        if workers is None:
+            workers = getattr(config, 'BG_PARALLEL_WORKERS', 0)
         
         print(f"Gerando {total_frames} frames com efeito glitch...")
         start_time = time.time()
         
-        # Gera frames com efeito glitch
-        for frame_num in range(total_frames):
-            # Copia o frame base
-            frame = img.copy()
-            
-            # Intensidade do glitch varia com o tempo
-            t = frame_num / fps  # Tempo em segundos
-            num_glitches = int(5 + 3 * np.sin(t * 2))
-            
-            # Aplica efeitos de glitch
-            for _ in range(num_glitches):
-                # Efeito de deslocamento horizontal
-                y = np.random.randint(0, frame.shape[0])
-                h = np.random.randint(5, 30)
-                dx = np.random.randint(-50, 50)
-                
-                if y + h < frame.shape[0]:
-                    slice_to_shift = frame[y:y+h].copy()
-                    # Desloca horizontalmente
-                    slice_to_shift = np.roll(slice_to_shift, dx, axis=1)
-                    frame[y:y+h] = slice_to_shift
-                
-                # Adiciona efeito de cor aleatório ocasionalmente
-                if np.random.random() < 0.2:
-                    channel = np.random.randint(0, 3)
-                    y2 = np.random.randint(0, frame.shape[0])
-                    h2 = np.random.randint(10, 40)
-                    
-                    if y2 + h2 < frame.shape[0]:
-                        # Aumenta a intensidade de um canal de cor
-                        frame[y2:y2+h2, :, channel] = np.clip(
-                            frame[y2:y2+h2, :, channel] * 1.5, 0, 255
-                        ).astype(np.uint8)
-            
-            # Adiciona ruído ocasionalmente
-            if np.random.random() < 0.1:
-                noise = np.random.randint(0, 50, size=frame.shape, dtype=np.uint8)
-                frame = cv2.add(frame, noise)
-            
-            # Converte RGB para BGR para salvar com OpenCV
-            frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-            video_writer.write(frame_bgr)
-            
-            # Mostra progresso a cada 10%
-            if frame_num % (total_frames // 10) == 0 or frame_num == total_frames - 1:
-                percent = (frame_num + 1) / total_frames * 100
-                elapsed = time.time() - start_time
-                print(f"Progresso: {percent:.1f}% ({frame_num+1}/{total_frames} frames, {elapsed:.1f}s)")
-        
-        # Libera recursos
-        video_writer.release()
+        # Mesmo plano de segmentos para qualquer número de workers (0 = no processo atual)
+        _renderizar_em_segmentos(img_path, str(output_path), total_frames, fps, params, max(0, workers))
         
-        print(f"✅ Vídeo gerado: {output_path}")
+        elapsed = time.time() - start_time
+        print(f"✅ Vídeo gerado: {output_path} ({total_frames / elapsed if elapsed > 0 else 0.0:.1f} frames/s)")
         return str(output_path)
     except Exception as e:
         print(f"❌ Erro ao gerar vídeo glitch: {e}")
@@ -121,6 +211,109 @@ def criar_video_glitch(img_path, output_path, duration=10, fps=30):
         traceback.print_exc()
         return None
 
+def encontrar_imagem_fundo() -> str | None:
+    """Procura a imagem de fundo do glitch (cria um fundo preto se não houver nenhuma)."""
+    possible_paths = [
+        # Tenta usar a imagem bg.png na raiz do projeto
+        Path(__file__).resolve().parent.parent / "bg.png",
+        Path(__file__).resolve().parent.parent / "bg.png.png",  # Nome estranho mas visto nos arquivos
+        # Tenta em assets/bg
+        Path(__file__).resolve().parent.parent / "assets" / "bg" / "bg.png",
+        # Imagem padrão do projeto
+        Path(__file__).resolve().parent.parent / "assets" / "img" / "bg.png",
+        # Tenta outras pastas
+        Path(__file__).resolve().parent.parent / "assets" / "bg.png",
+    ]
+    
+    for path in possible_paths:
+        if path.exists():
+            print(f"Usando imagem de fundo: {path}")
+            return str(path)
+    
+    print("❌ Nenhuma imagem de fundo encontrada. Criando fundo preto...")
+    # Cria uma imagem preta como fallback
+    try:
+        black_bg = Path(__file__).resolve().parent.parent / "assets" / "bg.png"
+        black_bg.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Cria imagem preta usando OpenCV em vez de Pillow
+        black_img = np.zeros((config.VIDEO_HEIGHT, config.VIDEO_WIDTH, 3), dtype=np.uint8)
+        cv2.imwrite(str(black_bg), black_img)
+        
+        return str(black_bg)
+    except Exception as e:
+        print(f"❌ Erro ao criar imagem de fundo preta: {e}")
+        return None
+
+def entradas_tile_fundo(img_path, fps: float, tile_seconds: float) -> dict:
+    """Entradas do tile em cache: imagem, resolução, fps, parâmetros do efeito."""
+    with open(img_path, 'rb') as f:
+        image_hash = hashlib.sha256(f.read()).hexdigest()
+    key_data = {
+        'image': image_hash,
+        'size': [config.VIDEO_WIDTH, config.VIDEO_HEIGHT],
+        'fps': fps,
+        'tile_seconds': tile_seconds,
+        'seed': getattr(config, 'BG_GLITCH_SEED', 0),
+        'block_frames': getattr(config, 'BG_GLITCH_BLOCK_FRAMES', 64),
+        'noise_bank_size': getattr(config, 'BG_GLITCH_NOISE_BANK_SIZE', 6),
+        'encoder': getattr(config, 'BG_ENCODER', DEFAULT_BG_ENCODER),
+        'effect': effect_signature(),
+    }
+    return key_data
+
+def entradas_video_fundo(duration: float) -> dict | None:
+    """Entradas que definem o background.mp4 de um episódio (chave do cache de artefatos)."""
+    img_path = encontrar_imagem_fundo()
+    if not img_path:
+        return None
+    with open(img_path, 'rb') as f:
+        image_hash = hashlib.sha256(f.read()).hexdigest()
+    fps = getattr(config, 'VIDEO_FPS', 24)
+    mode = getattr(config, 'BG_GLITCH_MODE', 'render')
+    return {
+        'image': image_hash,
+        'size': [config.VIDEO_WIDTH, config.VIDEO_HEIGHT],
+        'fps': fps,
+        'duration': round(duration, 3),
+        'mode': mode,
+        'tile_seconds': getattr(config, 'BG_TILE_SECONDS', 12) if mode == 'tile' else None,
+        'seed': getattr(config, 'BG_GLITCH_SEED', 0),
+        'block_frames': getattr(config, 'BG_GLITCH_BLOCK_FRAMES', 64),
+        'noise_bank_size': getattr(config, 'BG_GLITCH_NOISE_BANK_SIZE', 6),
+        'encoder': getattr(config, 'BG_ENCODER', DEFAULT_BG_ENCODER),
+        'effect': effect_signature(),
+    }
+
+def obter_tile_fundo(img_path, fps: float) -> str | None:
+    """
+    Retorna o tile de glitch em loop (N segundos) do cache de artefatos compartilhado,
+    renderizando-o apenas na primeira vez para cada combinação de parâmetros.
+    """
+    tile_frames = max(1, round(getattr(config, 'BG_TILE_SECONDS', 12) * fps))
+    tile_seconds = tile_frames / fps # Duração exata em frames inteiros
+    cache = shared_cache()
+    key = ArtifactCache.key('bg_tile', entradas_tile_fundo(img_path, fps, tile_seconds))
+    tile_path = cache.lookup(key)
+    if tile_path is not None:
+        print(f"✔️ Tile de fundo em cache: {tile_path.name}")
+        return str(tile_path)
+
+    print(f"Renderizando tile de fundo em loop ({tile_seconds:.2f}s) para o cache...")
+    # Renderiza em arquivo temporário e só então guarda no cache (evita tile incompleto)
+    tmp_path = Path(getattr(config, 'TEMP_DIR', project_root / "output" / "temp")) / f"bg_tile_{key[:24]}.{os.getpid()}.tmp.mp4"
+    tmp_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        result = criar_video_glitch(img_path, str(tmp_path), duration=tile_seconds, fps=fps,
+                                    intensity_freq=loop_intensity_freq(tile_seconds))
+        if not result:
+            return None
+        cache.store(key, 'bg_tile', tmp_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    tile_path = cache.lookup(key)
+    return str(tile_path) if tile_path is not None else None
+
 def generate_background(output_path: Path, duration: float) -> str | None:
     """Função principal esperada pelo script generate_scp_video.py.
     
@@ -137,43 +330,60 @@ def generate_background(output_path: Path, duration: float) -> str | None:
         return str(output_path)
     
     # Procura por uma imagem de fundo
-    bg_image = None
-    possible_paths = [
-        # Tenta usar a imagem bg.png na raiz do projeto
-        Path(__file__).resolve().parent.parent / "bg.png",
-        Path(__file__).resolve().parent.parent / "bg.png.png",  # Nome estranho mas visto nos arquivos
-        # Tenta em assets/bg
-        Path(__file__).resolve().parent.parent / "assets" / "bg" / "bg.png",
-        # Tenta outras pastas
-        Path(__file__).resolve().parent.parent / "assets" / "bg.png",
-    ]
-    
-    for path in possible_paths:
-        if path.exists():
-            bg_image = str(path)
-            print(f"Usando imagem de fundo: {bg_image}")
-            break
-    
+    bg_image = encontrar_imagem_fundo()
     if not bg_image:
-        print("❌ Nenhuma imagem de fundo encontrada. Criando fundo preto...")
-        # Cria uma imagem preta como fallback
+        return None
+    
+    fps = getattr(config, 'VIDEO_FPS', 24)
+    if getattr(config, 'BG_GLITCH_MODE', 'render') == 'tile':
+        # Serve a duração pedida repetindo o tile em cache (sem reencodar)
+        tile_path = obter_tile_fundo(bg_image, fps)
+        if not tile_path:
+            return None
         try:
-            black_bg = Path(__file__).resolve().parent.parent / "assets" / "bg.png"
-            black_bg.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Cria imagem preta usando OpenCV em vez de Pillow
-            black_img = np.zeros((config.VIDEO_HEIGHT, config.VIDEO_WIDTH, 3), dtype=np.uint8)
-            cv2.imwrite(str(black_bg), black_img)
-            
-            bg_image = str(black_bg)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            loop_stream_copy(Path(tile_path), output_path, duration)
+            print(f"✅ Vídeo de fundo montado a partir do tile: {output_path}")
+            return str(output_path)
         except Exception as e:
-            print(f"❌ Erro ao criar imagem de fundo preta: {e}")
+            print(f"❌ Erro ao repetir tile de fundo: {e}")
             return None
-    
+
     # Gera o vídeo glitch
-    fps = getattr(config, 'VIDEO_FPS', 24)
     return criar_video_glitch(bg_image, str(output_path), duration=duration, fps=fps)
 
+def criar_fundo_procedural(duration: float, fps: float | None = None) -> VideoClip | None:
+    """
+    Expõe o efeito glitch como fonte de frames em memória (sem background.mp4).
+
+    O frame do tempo t é determinístico a partir de (seed, t): pode ser usado
+    direto como camada de fundo do composer, em previews ou em chunks paralelos.
+
+    Args:
+        duration: Duração do clipe em segundos.
+        fps: FPS do efeito (padrão: config.VIDEO_FPS).
+
+    Returns:
+        VideoClip com o fundo glitch ou None em caso de erro.
+    """
+    fps = fps or getattr(config, 'VIDEO_FPS', 24)
+    bg_image = encontrar_imagem_fundo()
+    if not bg_image:
+        return None
+    try:
+        params = parametros_engine()
+        engine = criar_engine(carregar_imagem_base(bg_image, params['size']), fps, params)
+    except Exception as e:
+        print(f"❌ Erro ao preparar fundo procedural: {e}")
+        return None
+
+    def make_frame(t):
+        # Frame novo a cada chamada: quem consome (MoviePy) pode manter a referência
+        return engine.render_frame(int(t * fps + 1e-6))
+
+    print(f"Fundo procedural pronto ({duration:.2f}s @ {fps} fps, seed {params['seed']}).")
+    return VideoClip(make_frame, duration=duration).set_fps(fps)
+
 # Permite executar o script diretamente para testes
 if __name__ == "__main__":
     output_dir = Path(__file__).resolve().parent.parent / "output"
@@ -15,19 +15,25 @@ sys.path.append(str(current_dir))
 import config
 
 # Importações da Pipeline
-from video_pipeline.tts_generator import generate_narration
+from video_pipeline.tts_generator import generate_narration, narration_cache_inputs
 from video_pipeline.subtitle_generator import (
     get_word_timestamps,
     add_punctuation_to_whisper_data,
     create_narration_text_clips
 )
+from video_pipeline.local_aligner import get_local_word_timestamps
 # Importa a função de intro que agora retorna (clip, duration)
-from video_pipeline.intro_generator import create_intro
+from video_pipeline.intro_generator import create_intro, get_cached_intro_segment
+from video_pipeline.sprite_store import SpriteStore
+from video_pipeline.artifact_cache import ArtifactCache, file_digest
 try:
     from gen_bg_glitched import generate_background as generate_glitch_background
+    from gen_bg_glitched import criar_fundo_procedural, entradas_video_fundo
 except ImportError:
     print("AVISO: Falha ao importar 'generate_background' de 'gen_bg_glitched.py'. Geração de fundo falhará.")
     generate_glitch_background = None
+    criar_fundo_procedural = None
+    entradas_video_fundo = None
 # Importa o composer que agora recebe intro_duration
 from video_pipeline.video_composer import assemble_video
 from moviepy.editor import AudioFileClip # Usado para pegar duração
@@ -55,15 +61,43 @@ def extract_scp_info(script_text: str, filename: str) -> tuple[str, str, str]:
     print(f"Informações extraídas: Número={scp_number}, Nome={scp_name}, Classe={scp_class}")
     return scp_number, scp_name, scp_class
 
-def main(script_path: Path):
-    """Função principal para gerar vídeo SCP."""
+def timestamp_cache_inputs(narration_path: Path, script_text: str) -> dict:
+    """Entradas que definem os timestamps pontuados (chave do cache de artefatos)."""
+    source = getattr(config, 'TIMESTAMP_SOURCE', 'whisper')
+    inputs = {
+        'narration': file_digest(narration_path), # Conteúdo real do áudio (o TTS não é determinístico)
+        'script': script_text,
+        'source': source,
+    }
+    if source == 'local':
+        inputs['aligner'] = [getattr(config, 'LOCAL_ALIGNER_SILENCE_THRESHOLD_DB', -35.0),
+                             getattr(config, 'LOCAL_ALIGNER_PAUSE_MIN_SECONDS', 0.15)]
+    else:
+        inputs['stt'] = [config.STT_MODEL, config.OPENAI_BASE_URL, getattr(config, 'STT_CHUNKED', True),
+                         getattr(config, 'STT_CHUNK_TARGET_SECONDS', 120), getattr(config, 'STT_CHUNK_MAX_SECONDS', 180)]
+    return inputs
+
+def main(script_path: Path, proxy: bool = False, proxy_scale: float | None = None):
+    """
+    Função principal para gerar vídeo SCP.
+
+    Com proxy=True (ou config.PROXY_MODE), gera uma prévia da linha do tempo completa
+    em resolução/FPS reduzidos a partir do mesmo fluxo (narração e timestamps são
+    compartilhados com a versão de produção).
+    """
     start_total_time = time.time()
     if not script_path.is_file():
         print(f"Erro: Arquivo de script não encontrado: {script_path}")
         return
 
+    if proxy or config.PROXY_MODE:
+        config.apply_proxy_mode(scale=proxy_scale)
+    # O proxy cobre o vídeo inteiro: ignora o corte de duração do DEV_MODE
+    dev_truncate = config.DEV_MODE and not config.PROXY_MODE
+
     print(f"--- Iniciando Geração para: {script_path.name} ---")
-    if config.DEV_MODE: print("⚠️ MODO DEV ATIVADO")
+    if config.PROXY_MODE: print(f"🔎 MODO PROXY ATIVADO ({config.VIDEO_WIDTH}x{config.VIDEO_HEIGHT} @ {config.VIDEO_FPS}fps)")
+    elif config.DEV_MODE: print("⚠️ MODO DEV ATIVADO")
 
     # 1. Ler Script e Setup Inicial
     print("\n1. Lendo script e configurando paths...")
@@ -84,10 +118,15 @@ def main(script_path: Path):
     punctuated_timestamps_path = scp_output_dir / config.ARTIFACT_PUNCTUATED_DATA
     raw_timestamps_path = scp_output_dir / config.ARTIFACT_TIMESTAMPS_RAW
     final_video_output_path = scp_output_dir / config.ARTIFACT_FINAL_VIDEO
-    if config.DEV_MODE:
+    if dev_truncate:
         final_video_output_path = final_video_output_path.with_stem(final_video_output_path.stem + "_dev")
         print(f"Nome do vídeo final (DEV): {final_video_output_path.name}")
 
+    # Cache de artefatos: narração, timestamps e fundo chaveados pelas suas entradas
+    artifact_cache = None
+    if getattr(config, 'ARTIFACT_CACHE_ENABLED', True):
+        artifact_cache = ArtifactCache(config.ARTIFACT_CACHE_DIR, config.ARTIFACT_CACHE_MAX_BYTES)
+
     # Verifica se já existe
     if final_video_output_path.exists():
         if input(f"Vídeo final '{final_video_output_path.name}' já existe. Gerar novamente? (s/N): ").lower() != 's':
@@ -96,28 +135,37 @@ def main(script_path: Path):
     # --- Variáveis de estado ---
     narration_path_str = None
     background_path_str = None
+    background_clip_obj = None # Fundo procedural em memória (BG_GLITCH_MODE == 'procedural')
     intro_clip_obj = None # Armazenará o CLIPE da intro
+    intro_segment_path = None # Intro pré-renderizada do cache (INTRO_CACHE_ENABLED)
     actual_intro_duration = 0.0 # Armazenará a DURAÇÃO REAL da intro
     actual_narration_duration = 0.0
     content_duration = 0.0 # Duração apenas da parte da narração/conteúdo
     final_video_duration = 0.0 # Duração total final (intro + conteúdo)
     punctuated_timestamps = None
     narration_text_clips = []
+    sprite_store = None # Arquivo mapeado com as máscaras dos textos (NARRATION_SPRITE_STORE)
     # --------------------------
     main_success = False # Flag para indicar sucesso no final
 
     try:
         # 2. Gerar Narração (TTS)
         print("\n2. Processando Narração (TTS)...")
-        # ... (lógica para gerar ou usar narração existente - igual a antes) ...
-        if narration_output_path.exists():
-            print(f"Usando narração existente: {narration_output_path.name}")
+        use_existing = narration_output_path.exists()
+        narration_key = None
+        if artifact_cache is not None:
+            narration_key = ArtifactCache.key('narration', narration_cache_inputs(original_script_content))
+            use_existing = artifact_cache.fetch(narration_key, narration_output_path)
+        if use_existing:
+            print(f"Usando narração existente{' (cache de artefatos)' if narration_key else ''}: {narration_output_path.name}")
             narration_path_str = str(narration_output_path)
         else:
             print("Gerando nova narração...")
+            narration_output_path.unlink(missing_ok=True) # Arquivo de outras entradas (roteiro, voz...)
             narration_path_str = generate_narration(original_script_content, narration_output_path)
             if not narration_path_str: raise RuntimeError("Falha ao gerar narração.")
             print(f"Narração salva em: {narration_output_path.name}")
+            if narration_key: artifact_cache.store(narration_key, 'narration', narration_output_path)
 
         # Pega a duração REAL da narração
         try:
@@ -131,17 +179,23 @@ def main(script_path: Path):
 
         # 3. Criar Intro (agora retorna clipe E duração)
         print("\n3. Criando Introdução...")
-        # Chama a função atualizada e desempacota o resultado
-        intro_clip_obj, actual_intro_duration = create_intro(scp_number, scp_name, scp_class) # Não passa mais o background
-        if not intro_clip_obj or actual_intro_duration <= 0:
-            raise RuntimeError("Falha ao criar clipe de introdução ou duração inválida.")
+        cached_intro = None
+        if getattr(config, 'INTRO_CACHE_ENABLED', False):
+            cached_intro = get_cached_intro_segment(scp_number, scp_name, scp_class, scp_output_dir / config.ARTIFACT_INTRO)
+        if cached_intro is not None:
+            intro_segment_path, actual_intro_duration = cached_intro
+        else:
+            # Chama a função atualizada e desempacota o resultado
+            intro_clip_obj, actual_intro_duration = create_intro(scp_number, scp_name, scp_class) # Não passa mais o background
+            if not intro_clip_obj or actual_intro_duration <= 0:
+                raise RuntimeError("Falha ao criar clipe de introdução ou duração inválida.")
         print(f"Introdução criada com duração: {actual_intro_duration:.2f}s")
 
         # 4. Calcular Durações Finais
         print("\n4. Calculando durações finais...")
         # Duração do conteúdo é a duração da narração, limitada pelo DEV_MODE
         content_duration = actual_narration_duration
-        if config.DEV_MODE:
+        if dev_truncate:
             content_duration = min(actual_narration_duration, config.DEV_MODE_VIDEO_DURATION)
             print(f"⚠️ Modo DEV: Duração do conteúdo limitada a {content_duration:.2f}s")
 
@@ -159,21 +213,39 @@ def main(script_path: Path):
         print("\n5. Processando Background...")
         if generate_glitch_background is None:
              raise RuntimeError("Função generate_glitch_background não importada/disponível.")
-        if background_video_output_path.exists():
-             # Opcional: Validar duração do BG existente
-             print(f"Usando vídeo de fundo existente: {background_video_output_path.name}")
-             background_path_str = str(background_video_output_path)
+        if getattr(config, 'BG_GLITCH_MODE', 'render') == 'procedural':
+             print(f"Usando fundo procedural em memória (duração: {final_video_duration:.2f}s), sem {background_video_output_path.name}.")
+             background_clip_obj = criar_fundo_procedural(final_video_duration)
+             if background_clip_obj is None: raise RuntimeError("Falha ao preparar fundo procedural.")
         else:
-             print(f"Gerando novo vídeo de fundo (duração: {final_video_duration:.2f}s)...")
-             background_path_str = generate_glitch_background(background_video_output_path, final_video_duration) # Gera com duração TOTAL
-             if not background_path_str: raise RuntimeError("Falha ao gerar vídeo de background.")
-             print(f"Vídeo de fundo salvo em: {background_video_output_path.name}")
+             use_existing = background_video_output_path.exists()
+             background_key = None
+             if artifact_cache is not None:
+                 # Chave inclui a duração: um fundo mais curto nunca é reaproveitado
+                 background_inputs = entradas_video_fundo(final_video_duration)
+                 if background_inputs:
+                     background_key = ArtifactCache.key('background', background_inputs)
+                     use_existing = artifact_cache.fetch(background_key, background_video_output_path)
+             if use_existing:
+                 print(f"Usando vídeo de fundo existente{' (cache de artefatos)' if background_key else ''}: {background_video_output_path.name}")
+                 background_path_str = str(background_video_output_path)
+             else:
+                 print(f"Gerando novo vídeo de fundo (duração: {final_video_duration:.2f}s)...")
+                 background_video_output_path.unlink(missing_ok=True) # Fundo de outra duração/parâmetros
+                 background_path_str = generate_glitch_background(background_video_output_path, final_video_duration) # Gera com duração TOTAL
+                 if not background_path_str: raise RuntimeError("Falha ao gerar vídeo de background.")
+                 print(f"Vídeo de fundo salvo em: {background_video_output_path.name}")
+                 if background_key: artifact_cache.store(background_key, 'background', background_video_output_path)
 
 
         # 6. Processar Timestamps (STT + Pontuação)
         print("\n6. Processando Timestamps e Pontuação...")
-        # ... (lógica para carregar/gerar timestamps pontuados - igual a antes) ...
-        if punctuated_timestamps_path.exists():
+        use_existing = punctuated_timestamps_path.exists()
+        timestamps_key = None
+        if artifact_cache is not None:
+            timestamps_key = ArtifactCache.key('timestamps', timestamp_cache_inputs(Path(narration_path_str), original_script_content))
+            use_existing = artifact_cache.fetch(timestamps_key, punctuated_timestamps_path)
+        if use_existing:
             print(f"Tentando carregar timestamps pontuados: {punctuated_timestamps_path.name}")
             try:
                 with open(punctuated_timestamps_path, 'r', encoding='utf-8') as f: punctuated_timestamps = json.load(f)
@@ -182,8 +254,12 @@ def main(script_path: Path):
             except Exception as e: print(f"Erro ao carregar: {e}. Gerando novamente."); punctuated_timestamps = None
 
         if punctuated_timestamps is None:
-            print("Gerando timestamps brutos via Whisper...")
-            raw_timestamps = get_word_timestamps(Path(narration_path_str))
+            if getattr(config, 'TIMESTAMP_SOURCE', 'whisper') == 'local':
+                print("Gerando timestamps brutos pelo alinhador local (sem STT)...")
+                raw_timestamps = get_local_word_timestamps(Path(narration_path_str), original_script_content)
+            else:
+                print("Gerando timestamps brutos via Whisper...")
+                raw_timestamps = get_word_timestamps(Path(narration_path_str))
             if raw_timestamps:
                 print(f"Obtidos {len(raw_timestamps)} timestamps brutos.")
                 try: # Salva brutos para debug
@@ -195,8 +271,10 @@ def main(script_path: Path):
                 if punctuated_timestamps:
                     print(f"Pontuação adicionada ({len(punctuated_timestamps)} timestamps finais).")
                     try: # Salva pontuados para futuro
+                        punctuated_timestamps_path.unlink(missing_ok=True) # Não escreve sobre o objeto do cache
                         with open(punctuated_timestamps_path, 'w', encoding='utf-8') as f: json.dump(punctuated_timestamps, f, ensure_ascii=False, indent=2)
                         print(f"Timestamps pontuados salvos em: {punctuated_timestamps_path.name}")
+                        if timestamps_key: artifact_cache.store(timestamps_key, 'timestamps', punctuated_timestamps_path)
                     except Exception as e: print(f"Erro ao salvar timestamps pontuados: {e}")
                 else:
                     print("Aviso: Falha ao adicionar pontuação. Usando brutos (se disponíveis).")
@@ -225,10 +303,13 @@ def main(script_path: Path):
         if punctuated_timestamps:
             # Passa os timestamps filtrados e a DURAÇÃO TOTAL DO VÍDEO
             # A função interna create_text_image cuidará da limitação de tempo final dos clipes
+            if getattr(config, 'NARRATION_SPRITE_STORE', False):
+                sprite_store = SpriteStore(scp_output_dir / config.ARTIFACT_SPRITE_STORE)
             narration_text_clips = create_narration_text_clips(
                 punctuated_word_timestamps=punctuated_timestamps,
                 video_duration=final_video_duration, # Passa duração TOTAL
-                original_script=original_script_content
+                original_script=original_script_content,
+                sprite_store=sprite_store
             )
             print(f"Gerados {len(narration_text_clips)} clipes de texto.")
         else:
@@ -242,11 +323,13 @@ def main(script_path: Path):
         main_success = assemble_video(
             intro_clip=intro_clip_obj,
             intro_duration=actual_intro_duration, # <<< Passa a duração real da intro
-            background_video_path=Path(background_path_str),
+            background_video_path=Path(background_path_str) if background_path_str else None,
             narration_path=Path(narration_path_str),
             narration_text_clips=narration_text_clips,
             output_path=final_video_output_path,
-            final_duration=final_video_duration # Passa a duração TOTAL final
+            final_duration=final_video_duration, # Passa a duração TOTAL final
+            background_clip=background_clip_obj,
+            intro_segment_path=intro_segment_path
         )
 
     except Exception as e:
@@ -264,6 +347,10 @@ def main(script_path: Path):
                 print("Fechando clipe da intro...")
                 intro_clip_obj.close()
             except Exception as e: print(f"Erro ao fechar intro_clip: {e}")
+        # Remove o arquivo de sprites dos textos (os clipes já foram fechados em assemble_video)
+        if sprite_store is not None:
+            try: sprite_store.close()
+            except Exception as e: print(f"Erro ao remover arquivo de sprites: {e}")
         # Outros clipes intermediários devem ser fechados dentro de suas funções
         # (como em assemble_video e create_intro)
 
@@ -272,7 +359,7 @@ def main(script_path: Path):
 
         print("-" * 40)
         if main_success:
-            mode_indicator = "[DEV MODE]" if config.DEV_MODE else ""
+            mode_indicator = "[PROXY]" if config.PROXY_MODE else ("[DEV MODE]" if config.DEV_MODE else "")
             print(f"✅ Geração para {scp_number} CONCLUÍDA! {mode_indicator}")
             print(f"Tempo total: {total_time_taken:.2f}s")
             print(f"Vídeo final salvo em: {final_video_output_path}")
@@ -285,7 +372,11 @@ def main(script_path: Path):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Gera vídeos SCP com narração, texto sincronizado e fundo.")
     parser.add_argument("script_file", help="Caminho para o arquivo de texto do script SCP.")
+    parser.add_argument("--proxy", action="store_true",
+                        help="Prévia rápida do vídeo completo em resolução/FPS reduzidos (final_proxy.mp4).")
+    parser.add_argument("--proxy-scale", type=float, default=None,
+                        help=f"Escala do proxy em relação a VIDEO_SIZE (padrão: {config.PROXY_SCALE}).")
     args = parser.parse_args()
     script_file_path = Path(args.script_file).resolve()
-    main(script_file_path)
+    main(script_file_path, proxy=args.proxy, proxy_scale=args.proxy_scale)
     print("\n--- Script principal finalizado ---")
\ No newline at end of file
@@ -0,0 +1,150 @@
+# video_pipeline/glitch_engine.py
+import numpy as np
+import cv2
+
+# Limites do efeito (mesmos valores do loop original de criar_video_glitch)
+MAX_GLITCHES_PER_FRAME = 8 # int(5 + 3 * sin(2t)) nunca passa de 8
+SHIFT_HEIGHT_RANGE = (5, 30)
+SHIFT_DX_RANGE = (-50, 50)
+COLOR_PROBABILITY = 0.2
+COLOR_HEIGHT_RANGE = (10, 40)
+COLOR_BOOST = 1.5
+NOISE_PROBABILITY = 0.1
+NOISE_MAX_VALUE = 50
+
+DEFAULT_BLOCK_FRAMES = 64
+DEFAULT_NOISE_BANK_SIZE = 6
+DEFAULT_INTENSITY_FREQ = 2.0 # rad/s da variação de intensidade (sin(t * 2) no original)
+ENGINE_VERSION = 1 # Incrementar quando o visual do efeito mudar (invalida caches)
+
+
+def effect_signature() -> dict:
+    """Parâmetros que definem o visual do efeito (usados em chaves de cache)."""
+    return {
+        'version': ENGINE_VERSION,
+        'max_glitches': MAX_GLITCHES_PER_FRAME,
+        'shift_height': SHIFT_HEIGHT_RANGE, 'shift_dx': SHIFT_DX_RANGE,
+        'color_probability': COLOR_PROBABILITY, 'color_height': COLOR_HEIGHT_RANGE,
+        'color_boost': COLOR_BOOST,
+        'noise_probability': NOISE_PROBABILITY, 'noise_max': NOISE_MAX_VALUE,
+    }
+
+
+def loop_intensity_freq(loop_seconds: float) -> float:
+    """
+    Frequência de intensidade mais próxima da original que completa um número
+    inteiro de ciclos em `loop_seconds`, para que o tile repita sem emenda visível.
+    """
+    cycles = max(1, round(loop_seconds * DEFAULT_INTENSITY_FREQ / (2 * np.pi)))
+    return 2 * np.pi * cycles / loop_seconds
+
+
+class GlitchEngine:
+    """
+    Motor de glitch em lote: calcula os planos (deslocamentos, realces de canal
+    e ruído) de um bloco inteiro de frames como arrays NumPy e aplica tudo em
+    buffers pré-alocados, sem cópias por frame.
+
+    O plano de cada bloco depende apenas de (seed, índice do bloco), então
+    qualquer frame pode ser renderizado isoladamente e sempre com o mesmo resultado.
+    """
+
+    def __init__(self, base_rgb: np.ndarray, fps: float, seed: int = 0,
+                 block_frames: int = DEFAULT_BLOCK_FRAMES,
+                 noise_bank_size: int = DEFAULT_NOISE_BANK_SIZE,
+                 intensity_freq: float = DEFAULT_INTENSITY_FREQ):
+        if base_rgb is None or base_rgb.ndim != 3 or base_rgb.shape[2] != 3:
+            raise ValueError("Imagem base do glitch deve ser um array RGB (H, W, 3).")
+        self.base = np.ascontiguousarray(base_rgb, dtype=np.uint8)
+        self.height, self.width = self.base.shape[:2]
+        self.fps = float(fps)
+        self.seed = int(seed)
+        self.block_frames = max(1, int(block_frames))
+        self.intensity_freq = float(intensity_freq)
+
+        # Banco de ruído reutilizável (substitui np.random.randint por frame)
+        noise_rng = np.random.default_rng([self.seed, 0xB0])
+        bank_size = max(1, int(noise_bank_size))
+        self.noise_bank = noise_rng.integers(0, NOISE_MAX_VALUE, size=(bank_size, *self.base.shape), dtype=np.uint8)
+
+        # LUTs de realce por canal (equivalente exato a clip(x * 1.5).astype(uint8))
+        boost = np.clip(np.arange(256) * COLOR_BOOST, 0, 255).astype(np.uint8)
+        identity = np.arange(256, dtype=np.uint8)
+        self.channel_luts = []
+        for channel in range(3):
+            lut = np.stack([identity, identity, identity], axis=-1)
+            lut[:, channel] = boost
+            self.channel_luts.append(np.ascontiguousarray(lut.reshape(1, 256, 3)))
+
+        # Buffer auxiliar para o deslocamento horizontal (faixa máxima de 29 linhas)
+        self._band = np.empty((SHIFT_HEIGHT_RANGE[1], self.width, 3), dtype=np.uint8)
+        self._cached_block_index = None
+        self._cached_plan = None
+
+    def plan_block(self, block_index: int) -> dict:
+        """Sorteia, de forma vetorizada, o plano de glitch de um bloco de frames."""
+        if block_index == self._cached_block_index:
+            return self._cached_plan
+
+        b, g, h = self.block_frames, MAX_GLITCHES_PER_FRAME, self.height
+        rng = np.random.default_rng([self.seed, int(block_index)])
+        frame_idx = block_index * b + np.arange(b)
+        t = frame_idx / self.fps
+        num_glitches = (5 + 3 * np.sin(t * self.intensity_freq)).astype(np.int64)
+        active = np.arange(g)[None, :] < num_glitches[:, None]
+
+        shift_y = rng.integers(0, h, size=(b, g))
+        shift_h = rng.integers(*SHIFT_HEIGHT_RANGE, size=(b, g))
+        shift_dx = rng.integers(*SHIFT_DX_RANGE, size=(b, g))
+        color_roll = rng.random((b, g))
+        color_channel = rng.integers(0, 3, size=(b, g))
+        color_y = rng.integers(0, h, size=(b, g))
+        color_h = rng.integers(*COLOR_HEIGHT_RANGE, size=(b, g))
+        noise_roll = rng.random(b)
+        noise_idx = rng.integers(0, len(self.noise_bank), size=b)
+
+        plan = {
+            'shift_y': shift_y, 'shift_h': shift_h,
+            # Deslocamento já normalizado para np.roll (0..W-1)
+            'shift_dx': np.mod(shift_dx, self.width),
+            'shift_on': active & (shift_y + shift_h < h),
+            'color_channel': color_channel, 'color_y': color_y, 'color_h': color_h,
+            'color_on': active & (color_roll < COLOR_PROBABILITY) & (color_y + color_h < h),
+            'noise_on': noise_roll < NOISE_PROBABILITY,
+            'noise_idx': noise_idx,
+        }
+        self._cached_block_index, self._cached_plan = block_index, plan
+        return plan
+
+    def render_frame(self, frame_index: int, out: np.ndarray | None = None) -> np.ndarray:
+        """Renderiza um frame (RGB uint8) no buffer `out`, reutilizado entre chamadas."""
+        if out is None:
+            out = np.empty_like(self.base)
+        block_index, row = divmod(int(frame_index), self.block_frames)
+        plan = self.plan_block(block_index)
+        np.copyto(out, self.base)
+
+        shift_on, color_on = plan['shift_on'][row], plan['color_on'][row]
+        for j in range(MAX_GLITCHES_PER_FRAME):
+            if shift_on[j]:
+                y, hh, dx = plan['shift_y'][row, j], plan['shift_h'][row, j], plan['shift_dx'][row, j]
+                if dx:
+                    band = self._band[:hh]
+                    np.copyto(band, out[y:y+hh])
+                    out[y:y+hh, dx:] = band[:, :self.width - dx]
+                    out[y:y+hh, :dx] = band[:, self.width - dx:]
+            if color_on[j]:
+                y2, hh2 = plan['color_y'][row, j], plan['color_h'][row, j]
+                region = out[y2:y2+hh2]
+                cv2.LUT(region, self.channel_luts[plan['color_channel'][row, j]], dst=region)
+
+        if plan['noise_on'][row]:
+            cv2.add(out, self.noise_bank[plan['noise_idx'][row]], dst=out)
+        return out
+
+    def iter_frames(self, start: int, stop: int, out: np.ndarray | None = None):
+        """Itera (índice, frame) em [start, stop); o mesmo buffer é reutilizado a cada frame."""
+        if out is None:
+            out = np.empty_like(self.base)
+        for frame_index in range(start, stop):
+            yield frame_index, self.render_frame(frame_index, out)
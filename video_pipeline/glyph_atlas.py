@@ -0,0 +1,157 @@
+# video_pipeline/glyph_atlas.py
+import math
+from typing import Dict, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import config
+
+
+def _pillow_pixel(coord: float, bias: int, base: int = 0) -> int:
+    """
+    Pixel da origem de ImageDraw.text em um eixo: parte inteira truncada e a
+    fração em float32 (somada a `base`, a ascendente da âncora em y, também em
+    float32) convertida para 1/64 de pixel, arredondada para longe do zero e
+    levada ao pixel com `bias` (32 em x; 31 em y, onde o meio pixel exato
+    arredonda para baixo).
+    """
+    whole = int(coord)
+    frac = float(np.float32(coord - whole) + np.float32(base)) - base
+    units = int(math.copysign(math.floor(abs(frac * 64) + 0.5), frac))
+    return whole + ((units + bias) >> 6)
+
+
+class GlyphAtlas:
+    """
+    Atlas de glifos de uma fonte FreeType em um tamanho fixo.
+
+    Cada caractere é rasterizado uma única vez (máscara de alfa do FreeType) e
+    guardado em uma folha uint8 compartilhada. Uma linha de texto é composta
+    copiando os glifos para um buffer de alfa (pixels sobrepostos combinados
+    com "over", como o Pillow faz), com avanço e kerning lidos da própria
+    fonte e a origem arredondada como no ImageDraw.text (inclusive para x e y
+    fracionários). O resultado é idêntico ao ImageDraw.text(..., anchor="la")
+    para fontes com avanços inteiros (caso da typewriter.ttf).
+    """
+
+    def __init__(self, font: ImageFont.FreeTypeFont):
+        self.font = font
+        self.ascent, self.descent = font.getmetrics()
+        self.sheet = np.zeros((max(1, self.ascent + self.descent), 256), dtype=np.uint8)
+        self.sheet_used = 0 # Colunas já ocupadas da folha
+        self.glyphs: Dict[str, Tuple[int, int, int, int, int, float]] = {} # char -> (x, w, h, off_x, off_y, avanço)
+        self.kerning: Dict[Tuple[str, str], float] = {}
+
+    def glyph(self, char: str) -> Tuple[int, int, int, int, int, float]:
+        """Posição do glifo na folha, deslocamento em relação à origem ('la') e avanço."""
+        entry = self.glyphs.get(char)
+        if entry is not None:
+            return entry
+        mask, (off_x, off_y) = self.font.getmask2(char, mode='L', anchor='la')
+        w, h = mask.size
+        alpha = np.frombuffer(bytes(mask), dtype=np.uint8).reshape(h, w) if w and h else None
+
+        # Cresce a folha (altura e/ou largura, dobrando) quando o glifo não cabe
+        rows = max(self.sheet.shape[0], h)
+        cols = self.sheet.shape[1]
+        while self.sheet_used + w > cols:
+            cols *= 2
+        if (rows, cols) != self.sheet.shape:
+            sheet = np.zeros((rows, cols), dtype=np.uint8)
+            sheet[:self.sheet.shape[0], :self.sheet.shape[1]] = self.sheet
+            self.sheet = sheet
+        x = self.sheet_used
+        if alpha is not None:
+            self.sheet[:h, x:x + w] = alpha
+        self.sheet_used += w
+
+        entry = (x, w, h, off_x, off_y, self.font.getlength(char))
+        self.glyphs[char] = entry
+        return entry
+
+    def kern(self, left: str, right: str) -> float:
+        """Ajuste de kerning entre dois caracteres (0 para fontes monoespaçadas)."""
+        pair = (left, right)
+        value = self.kerning.get(pair)
+        if value is None:
+            value = self.font.getlength(left + right) - self.font.getlength(left) - self.font.getlength(right)
+            self.kerning[pair] = value
+        return value
+
+    def layout(self, text: str) -> list:
+        """Posição (x, y) de cada glifo visível em relação à origem da linha ('la')."""
+        placed = []
+        pen = 0.0
+        prev = None
+        for char in text:
+            if prev is not None:
+                pen += self.kern(prev, char)
+            x, w, h, off_x, off_y, advance = self.glyph(char)
+            if w and h:
+                placed.append((int(np.floor(pen + 0.5)) + off_x, off_y, x, w, h))
+            pen += advance
+            prev = char
+        return placed
+
+    def render_mask(self, text: str) -> Tuple[np.ndarray | None, Tuple[int, int]]:
+        """
+        Máscara de alfa (uint8) da linha, recortada aos glifos, e o deslocamento
+        do seu canto superior esquerdo em relação à origem da linha.
+        """
+        placed = self.layout(text)
+        if not placed:
+            return None, (0, 0)
+        x0 = min(p[0] for p in placed)
+        y0 = min(p[1] for p in placed)
+        x1 = max(p[0] + p[3] for p in placed)
+        y1 = max(p[1] + p[4] for p in placed)
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        for gx, gy, sx, w, h in placed:
+            dst = mask[gy - y0:gy - y0 + h, gx - x0:gx - x0 + w]
+            src = self.sheet[:h, sx:sx + w]
+            if not dst.any():
+                dst[...] = src
+                continue
+            # Sobreposição com o glifo anterior: dst + src - dst*src/255 (arredondado)
+            d = dst.astype(np.uint16)
+            prod = d * src + 128
+            dst[...] = d + src - ((prod + (prod >> 8)) >> 8)
+        return mask, (x0, y0)
+
+    def draw(self, img: Image.Image, xy: Tuple[float, float], text: str, fill) -> None:
+        """Equivalente a ImageDraw.Draw(img).text(xy, text, font=..., fill=fill, anchor="la")."""
+        if xy[1] < 0 and not float(xy[1]).is_integer():
+            # y negativo fracionário: o Pillow desloca o glifo por uma fração de pixel que o atlas não reproduz
+            ImageDraw.Draw(img).text(xy, text, font=self.font, fill=fill, anchor="la")
+            return
+        mask, (off_x, off_y) = self.render_mask(text)
+        if mask is None:
+            return
+        x = _pillow_pixel(xy[0], 32) + off_x
+        y = _pillow_pixel(xy[1], 31, self.ascent) + off_y
+        h, w = mask.shape
+        img.paste(fill, (x, y, x + w, y + h), Image.fromarray(mask))
+
+
+_ATLASES: Dict[tuple, GlyphAtlas] = {}
+
+
+def get_glyph_atlas(font) -> GlyphAtlas | None:
+    """Atlas compartilhado por (arquivo, tamanho) da fonte; None se a fonte não for FreeType."""
+    if not isinstance(font, ImageFont.FreeTypeFont):
+        return None
+    key = (font.path, font.size, font.index, font.layout_engine)
+    atlas = _ATLASES.get(key)
+    if atlas is None:
+        atlas = _ATLASES[key] = GlyphAtlas(font)
+    return atlas
+
+
+def draw_text(img: Image.Image, xy: Tuple[float, float], text: str, font, fill) -> None:
+    """Desenha uma linha de texto ('la') pelo atlas de glifos, ou pelo Pillow se não houver atlas."""
+    atlas = get_glyph_atlas(font) if getattr(config, 'TEXT_GLYPH_ATLAS', True) else None
+    if atlas is None:
+        ImageDraw.Draw(img).text(xy, text, font=font, fill=fill, anchor="la")
+    else:
+        atlas.draw(img, xy, text, fill)
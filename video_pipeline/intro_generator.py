@@ -1,7 +1,7 @@
 # video_pipeline/intro_generator.py
-from moviepy.editor import (CompositeVideoClip, ImageClip, VideoClip, ColorClip,
-                            AudioFileClip, concatenate_audioclips, AudioClip, afx)
-from PIL import Image, ImageDraw, ImageFont
+from moviepy.editor import CompositeVideoClip, ImageClip, VideoClip, ColorClip
+from moviepy.audio.AudioClip import AudioArrayClip
+from PIL import Image, ImageFont
 import numpy as np
 import os
 from pathlib import Path
@@ -9,11 +9,158 @@ import random
 import math
 import time
 from typing import Tuple
+import hashlib
 import config
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+from video_pipeline.artifact_cache import ArtifactCache, shared_cache
+from video_pipeline.audio_mixer import AUDIO_FPS, decode_audio
+from video_pipeline.render_pipeline import total_frames_for
+from video_pipeline.glyph_atlas import draw_text
+
+INTRO_PAUSE_START_SECONDS = 0.8
+INTRO_PAUSE_END_SECONDS = 2.0 # Aumenta um pouco a pausa final
+INTRO_CACHE_VERSION = 2 # Incrementar quando o visual da intro mudar (invalida o cache)
+
+# Banco de sons de tecla decodificados, compartilhado por todas as intros do processo:
+# (arquivo, mtime, fps) -> amostras float32 (N, 2)
+_TYPE_SOUND_BANK = {}
 
 # !! ADICIONADO AVISO SOBRE WEBP !!
 print("AVISO: O carregamento direto de WebP no intro_generator depende da instalação da biblioteca 'libwebp' e do suporte do Pillow.")
 
+def load_type_sound_bank(sound_dir: Path, fps: int = AUDIO_FPS) -> list:
+    """Decodifica os type-*.wav uma única vez por processo e retorna as amostras de cada som."""
+    bank = []
+    for sound_file in sorted(Path(sound_dir).glob("type-*.wav")):
+        try:
+            key = (str(sound_file), sound_file.stat().st_mtime_ns, fps)
+            samples = _TYPE_SOUND_BANK.get(key)
+            if samples is None:
+                samples = decode_audio(sound_file, fps)
+                _TYPE_SOUND_BANK[key] = samples
+            if len(samples) > 0:
+                bank.append(samples)
+        except Exception as e: print(f"Aviso: Falha ao carregar som '{sound_file.name}': {e}")
+    return bank
+
+
+def synthesize_keystrokes(bank: list, press_times: np.ndarray, choices: np.ndarray,
+                          num_samples: int, fps: int = AUDIO_FPS) -> np.ndarray:
+    """
+    Soma os sons de tecla escolhidos (`choices`, índices no banco) em cada instante de
+    `press_times`, numa única passada vetorizada (bincount por canal).
+    """
+    out = np.zeros((num_samples, 2), dtype=np.float32)
+    if num_samples <= 0 or len(press_times) == 0 or not bank:
+        return out
+    starts = np.clip((np.asarray(press_times) * fps).astype(np.int64), 0, num_samples - 1)
+    sound_lengths = np.array([len(samples) for samples in bank], dtype=np.int64)
+    sound_offsets = np.concatenate([[0], np.cumsum(sound_lengths)[:-1]])
+    all_samples = np.concatenate(bank)
+
+    # Para cada tecla: posições no buffer e no banco concatenado
+    lengths = sound_lengths[choices]
+    press_of_sample = np.repeat(np.arange(len(starts)), lengths)
+    within = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    dest = starts[press_of_sample] + within
+    src = sound_offsets[choices][press_of_sample] + within
+    keep = dest < num_samples
+    dest, src = dest[keep], src[keep]
+    for channel in range(2):
+        out[:, channel] = np.bincount(dest, weights=all_samples[src, channel], minlength=num_samples)
+    return out
+
+
+def _intro_typing_speed() -> float:
+    typing_speed = config.INTRO_TYPING_EFFECT_SPEED
+    return typing_speed if typing_speed > 0 else 0.15 # Fallback
+
+
+def intro_duration_for(scp_number: str, scp_name: str) -> float:
+    """Duração da intro (pausa inicial + digitação das 2 linhas + pausa final), sem criar o clipe."""
+    total_chars = len(scp_number) + len(f"- {scp_name}")
+    return INTRO_PAUSE_START_SECONDS + total_chars * _intro_typing_speed() + INTRO_PAUSE_END_SECONDS
+
+
+def _file_digest(path: Path) -> str | None:
+    """sha256 do conteúdo de um arquivo (None se não existir)."""
+    path = Path(path)
+    if not path.is_file():
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def intro_cache_inputs(scp_number: str, scp_name: str, scp_class: str) -> dict:
+    """Entradas do segmento de intro: textos, fontes, tempos, fundo, logo e parâmetros do encode."""
+    project_root = Path(__file__).resolve().parent.parent
+    inputs = {
+        'version': INTRO_CACHE_VERSION,
+        'text': [scp_number, scp_name, scp_class],
+        'font': _file_digest(config.FONT_INTRO),
+        'font_sizes': [config.INTRO_FONT_SIZE_NUMBER, config.INTRO_FONT_SIZE_NAME, config.INTRO_FONT_SIZE_CLASS],
+        'text_color': config.INTRO_TEXT_COLOR,
+        'bg_color': list(config.INTRO_BACKGROUND_COLOR),
+        'typing_speed': _intro_typing_speed(),
+        'pauses': [INTRO_PAUSE_START_SECONDS, INTRO_PAUSE_END_SECONDS],
+        'layout_scale': getattr(config, 'LAYOUT_SCALE', 1.0),
+        'background': _file_digest(project_root / "assets" / "img" / "intro-bg.png"),
+        'logo': _file_digest(config.SCP_LOGO_FILE) if config.USE_LOGO_IN_INTRO else None,
+        'logo_layout': [config.LOGO_SIZE_FACTOR_INTRO, list(config.LOGO_POSITION_INTRO), config.LOGO_MARGIN_INTRO],
+        # O segmento é emendado sem reencodar: precisa do mesmo encode do vídeo final
+        'encode': [list(config.VIDEO_SIZE), config.VIDEO_FPS, config.VIDEO_CODEC, config.VIDEO_PRESET, str(config.VIDEO_CRF)],
+    }
+    return inputs
+
+
+def get_cached_intro_segment(scp_number: str, scp_name: str, scp_class: str, dest: Path) -> Tuple[Path, float] | None:
+    """
+    Retorna (segmento_mp4, duração) da intro já codificada (só vídeo), renderizando-a
+    uma única vez por combinação de entradas. O segmento tem um número inteiro de
+    frames e os mesmos parâmetros de encode do vídeo final, para ser emendado ao
+    conteúdo com stream copy. Fica no cache de artefatos compartilhado e é copiado
+    (hardlink) para `dest`. Retorna None se a intro não puder ser criada.
+    """
+    cache = shared_cache()
+    key = ArtifactCache.key('intro', intro_cache_inputs(scp_number, scp_name, scp_class))
+    duration = intro_duration_for(scp_number, scp_name)
+    if cache.fetch(key, dest):
+        print(f"Usando intro em cache: {dest.name} ({duration:.2f}s)")
+        return dest, duration
+
+    print(f"Intro não encontrada no cache. Renderizando segmento {dest.name}...")
+    intro_clip, intro_duration = create_intro(scp_number, scp_name, scp_class)
+    tmp_path = dest.with_name(f"{dest.stem}.tmp.mp4")
+    try:
+        if isinstance(intro_clip, ColorClip): # Fallback de erro: não vai para o cache
+            print("AVISO: Intro caiu no fallback; segmento não será salvo no cache.")
+            return None
+        fps = config.VIDEO_FPS
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        writer = FFMPEG_VideoWriter(str(tmp_path), config.VIDEO_SIZE, fps, codec=config.VIDEO_CODEC,
+                                    preset=config.VIDEO_PRESET, threads=config.VIDEO_THREADS,
+                                    ffmpeg_params=["-crf", str(config.VIDEO_CRF)])
+        try:
+            for frame_index in range(total_frames_for(intro_duration, fps)):
+                writer.write_frame(intro_clip.get_frame(frame_index / fps))
+        finally:
+            writer.close()
+        os.replace(tmp_path, dest)
+        cache.store(key, 'intro', dest)
+        print(f"Segmento da intro salvo no cache: {dest.name}")
+        return dest, intro_duration
+    except Exception as e:
+        print(f"Erro ao renderizar segmento da intro: {e}")
+        tmp_path.unlink(missing_ok=True)
+        return None
+    finally:
+        if hasattr(intro_clip, 'close'):
+            intro_clip.close()
+
+
 def create_intro(scp_number: str, scp_name: str, scp_class: str, background_video_path: Path | None = None) -> Tuple[CompositeVideoClip | ColorClip, float]:
     """
     Cria a introdução com imagem de fundo, texto digitando em duas linhas (SCP# e Nome),
@@ -50,14 +197,15 @@ def create_intro(scp_number: str, scp_name: str, scp_class: str, background_vide
     font_size2 = config.INTRO_FONT_SIZE_NAME
     text_color = config.INTRO_TEXT_COLOR
     # Posição INICIAL (X, Y) da PRIMEIRA linha (Ajuste!)
-    line1_pos = (80, 220)
-    line_spacing = 20 # Espaço vertical entre as linhas (Ajuste!)
+    layout_scale = getattr(config, 'LAYOUT_SCALE', 1.0) # < 1.0 no modo proxy
+    line1_pos = (round(80 * layout_scale), round(220 * layout_scale))
+    line_spacing = round(20 * layout_scale) # Espaço vertical entre as linhas (Ajuste!)
 
     # --- Cálculo da Duração Adaptável ---
-    pause_start_sec = 0.8
+    pause_start_sec = INTRO_PAUSE_START_SECONDS
     typing_duration_sec = total_chars * typing_speed
-    pause_end_sec = 2.0 # Aumenta um pouco a pausa final
-    total_duration = pause_start_sec + typing_duration_sec + pause_end_sec
+    pause_end_sec = INTRO_PAUSE_END_SECONDS
+    total_duration = intro_duration_for(scp_number, scp_name)
     print(f"Texto Intro: L1='{text_line1}' ({num_chars1}), L2='{text_line2}' ({num_chars2})")
     print(f"Duração Intro Calculada: {total_duration:.2f}s (Pausa Início: {pause_start_sec:.1f}s, Digitação: {typing_duration_sec:.2f}s, Pausa Fim: {pause_end_sec:.1f}s)")
 
@@ -109,16 +257,10 @@ def create_intro(scp_number: str, scp_name: str, scp_class: str, background_vide
             print(f"Clipe de fundo processado: Duração={bg_clip.duration:.2f}s")
 
 
-        # --- Carregar Sons (igual a antes) ---
+        # --- Carregar Sons (decodificados uma vez por processo) ---
         type_sounds = []
         if type_sound_dir.is_dir():
-            for sound_file in type_sound_dir.glob("type-*.wav"):
-                try:
-                    audio_clip = AudioFileClip(str(sound_file))
-                    if audio_clip and audio_clip.duration > 0:
-                        type_sounds.append(audio_clip); clips_to_close.append(audio_clip)
-                    elif audio_clip: audio_clip.close()
-                except Exception as e: print(f"Aviso: Falha ao carregar som '{sound_file.name}': {e}")
+            type_sounds = load_type_sound_bank(type_sound_dir)
             print(f"Carregados {len(type_sounds)} sons de digitação válidos.")
         else: print(f"Aviso: Diretório de sons '{type_sound_dir}' não encontrado.")
 
@@ -147,17 +289,14 @@ def create_intro(scp_number: str, scp_name: str, scp_class: str, background_vide
         except Exception: line1_height = font_size1
         line2_pos = (line1_pos[0], line1_pos[1] + line1_height + line_spacing)
 
-        def make_frame_visual(t):
-            img_txt = Image.new("RGBA", video_size, (0, 0, 0, 0))
-            draw = ImageDraw.Draw(img_txt)
+        def typing_state(t):
+            """Estado visível da digitação em t: (chars1, cursor1, chars2, cursor2)."""
             time_since_typing_start = max(0, t - typing_start_time)
             chars1_float = time_since_typing_start / typing_speed
             chars1 = min(num_chars1, math.floor(chars1_float))
             time_for_line2 = max(0, time_since_typing_start - typing_duration_line1)
             chars2_float = time_for_line2 / typing_speed
             chars2 = min(num_chars2, math.floor(chars2_float))
-            display_text1 = text_line1[:chars1]
-            display_text2 = text_line2[:chars2]
             cursor = " "
             total_chars_shown = chars1 + chars2
             if total_chars_shown < total_chars and t >= typing_start_time and t < (typing_start_time + typing_total_active_time + 0.1):
@@ -165,40 +304,72 @@ def create_intro(scp_number: str, scp_name: str, scp_class: str, background_vide
             elif t < typing_start_time:
                  cursor = "|" if math.floor(t * 2) % 2 == 0 else " "
             cursor1 = cursor if chars1 < num_chars1 else " "
-            draw.text(line1_pos, display_text1 + cursor1, font=font1, fill=text_color)
             cursor2 = cursor if chars1 == num_chars1 and chars2 < num_chars2 else " "
-            draw.text(line2_pos, display_text2 + cursor2, font=font2, fill=text_color)
-            img_rgb = img_txt.convert("RGB") # Converte para RGB para VideoClip padrão
-            return np.array(img_rgb)
+            return chars1, cursor1, chars2, cursor2
+
+        # Região que contém as duas linhas completas (com cursor): os estados são desenhados
+        # só nela e recortados ao bounding box do texto visível
+        region_boxes = []
+        for pos, text, font in ((line1_pos, text_line1, font1), (line2_pos, text_line2, font2)):
+            for cursor_char in ("|", " "):
+                x0, y0, x1, y1 = font.getbbox(text + cursor_char)
+                region_boxes.append((pos[0] + x0, pos[1] + y0, pos[0] + x1, pos[1] + y1))
+        region_x0 = max(0, min(box[0] for box in region_boxes) - 2)
+        region_y0 = max(0, min(box[1] for box in region_boxes) - 2)
+        region_x1 = min(video_size[0], max(box[2] for box in region_boxes) + 2)
+        region_y1 = min(video_size[1], max(box[3] for box in region_boxes) + 2)
+        region_size = (max(1, region_x1 - region_x0), max(1, region_y1 - region_y0))
+
+        typing_sprites = {} # estado -> (rgb, máscara, posição); no máximo ~2x(total de caracteres)
+        empty_sprite = (np.zeros((1, 1, 3), dtype=np.uint8), np.zeros((1, 1), dtype=np.float64), (0, 0))
+
+        def typing_sprite(t):
+            state = typing_state(t)
+            sprite = typing_sprites.get(state)
+            if sprite is None:
+                chars1, cursor1, chars2, cursor2 = state
+                img_txt = Image.new("RGBA", region_size, (0, 0, 0, 0))
+                draw_text(img_txt, (line1_pos[0] - region_x0, line1_pos[1] - region_y0), text_line1[:chars1] + cursor1, font1, text_color)
+                draw_text(img_txt, (line2_pos[0] - region_x0, line2_pos[1] - region_y0), text_line2[:chars2] + cursor2, font2, text_color)
+                rgba = np.array(img_txt)
+                alpha = rgba[:, :, 3]
+                rows = np.flatnonzero(alpha.any(axis=1))
+                cols = np.flatnonzero(alpha.any(axis=0))
+                if rows.size == 0:
+                    sprite = empty_sprite
+                else:
+                    y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+                    sprite = (np.ascontiguousarray(rgba[y0:y1, x0:x1, :3]),
+                              alpha[y0:y1, x0:x1] / 255.0,
+                              (region_x0 + int(x0), region_y0 + int(y0)))
+                typing_sprites[state] = sprite
+            return sprite
+
+        # Pré-calcula todos os estados dos frames da intro (cada estado é desenhado uma única vez)
+        for frame_index in range(int(math.ceil(total_duration * fps)) + 1):
+            typing_sprite(frame_index / fps)
+        print(f"Digitação: {len(typing_sprites)} estados distintos pré-renderizados como sprites recortados.")
 
         print("Criando clipe visual da digitação (2 linhas)...")
-        text_clip_visual = VideoClip(make_frame_visual, duration=total_duration).set_fps(fps)
+        text_mask = VideoClip(lambda t: typing_sprite(t)[1], ismask=True, duration=total_duration)
+        text_clip_visual = (VideoClip(lambda t: typing_sprite(t)[0], duration=total_duration)
+                            .set_mask(text_mask)
+                            .set_position(lambda t: typing_sprite(t)[2])
+                            .set_fps(fps))
         clips_to_close.append(text_clip_visual)
 
         # --- Geração de Áudio Antecipada (2 Linhas - igual a antes) ---
         if type_sounds:
             print("Gerando áudio completo da digitação (2 linhas)...")
-            audio_fps = 44100
+            audio_fps = AUDIO_FPS
             num_audio_frames = int(total_duration * audio_fps)
-            accumulated_audio = np.zeros((num_audio_frames, 2), dtype=np.float32)
             char_press_times1 = [typing_start_time + (i * typing_speed) for i in range(num_chars1)]
             start_time_line2 = typing_start_time + typing_duration_line1
             char_press_times2 = [start_time_line2 + (i * typing_speed) for i in range(num_chars2)]
-            all_press_times = sorted(char_press_times1 + char_press_times2)
-
-            for press_time in all_press_times:
-                target_sample_index = max(0, min(int(press_time * audio_fps), num_audio_frames - 1))
-                sound_clip = random.choice(type_sounds)
-                try:
-                    sound_samples = sound_clip.to_soundarray(fps=audio_fps, nbytes=4, quantize=False)
-                    if sound_samples.ndim == 1: sound_samples = np.column_stack((sound_samples, sound_samples))
-                    start_insert = target_sample_index
-                    end_insert = min(start_insert + len(sound_samples), num_audio_frames)
-                    samples_to_insert = end_insert - start_insert
-                    if samples_to_insert > 0:
-                        accumulated_audio[start_insert:end_insert] += sound_samples[:samples_to_insert]
-                except Exception as audio_err:
-                    print(f"Erro ao processar áudio de tecla: {audio_err}")
+            all_press_times = np.array(sorted(char_press_times1 + char_press_times2))
+            sound_choices = np.array([random.randrange(len(type_sounds)) for _ in all_press_times], dtype=np.int64)
+            accumulated_audio = synthesize_keystrokes(type_sounds, all_press_times, sound_choices,
+                                                      num_audio_frames, audio_fps)
 
             max_abs_val = np.max(np.abs(accumulated_audio))
             if max_abs_val > 1.0:
@@ -208,10 +379,7 @@ def create_intro(scp_number: str, scp_name: str, scp_class: str, background_vide
             print("Áudio completo da digitação gerado.")
 
             print("Criando clipe de áudio da digitação...")
-            def get_audio_frame(t_audio):
-                 idx = min(int(t_audio * audio_fps), num_audio_frames - 1)
-                 return final_audio_array[idx]
-            text_clip_audio = AudioClip(get_audio_frame, duration=total_duration, fps=audio_fps)
+            text_clip_audio = AudioArrayClip(final_audio_array, fps=audio_fps).set_duration(total_duration)
             clips_to_close.append(text_clip_audio)
 
         # --- *** NOVO: Adicionar Logo na Intro (se configurado) *** ---
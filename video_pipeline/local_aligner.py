@@ -0,0 +1,179 @@
+# video_pipeline/local_aligner.py
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import config
+from video_pipeline.audio_analysis import ANALYSIS_FRAME_SECONDS, find_silences, frame_energy_db
+from video_pipeline.audio_mixer import decode_audio
+from video_pipeline.text_alignment import tokenize_script
+
+ALIGNER_SAMPLE_RATE = 16000
+# Afinidade de cada pontuação com uma pausa logo depois da palavra
+PAUSE_AFFINITY = {'.': 1.0, '!': 1.0, '?': 1.0, ';': 0.7, ':': 0.7, ',': 0.5}
+PAUSE_FULL_SECONDS = 0.4 # Pausas a partir dessa duração contam com peso total
+MAX_WORDS_PER_SEGMENT = 48 # Maior quantidade de palavras entre duas pausas consideradas
+BEAM_WIDTH = 64 # Estados mantidos por segmento na programação dinâmica
+
+_DIGIT_SYLLABLES = {'0': 2, '7': 2} # "zero", "seven"; os demais dígitos têm uma sílaba
+
+
+def word_weight(word: str) -> float:
+    """
+    Duração relativa estimada de uma palavra falada: sílabas (grupos de vogais
+    das letras, dígitos lidos um a um) mais uma fração do número de letras.
+    """
+    letters = re.sub(r'[^a-z]', '', word.lower())
+    syllables = len(re.findall(r'[aeiouy]+', letters))
+    if letters.endswith('e') and syllables > 1 and not letters.endswith(('le', 'ee')):
+        syllables -= 1 # "e" mudo no fim
+    if letters and not syllables:
+        syllables = 1
+    syllables += sum(_DIGIT_SYLLABLES.get(ch, 1) for ch in word if ch.isdigit())
+    return max(1, syllables) + 0.1 * len(letters)
+
+
+def assign_words_to_segments(cum_weight: np.ndarray, seg_voiced: np.ndarray, pause_strength: np.ndarray,
+                             affinity: np.ndarray) -> List[int]:
+    """
+    Divide as palavras entre os segmentos falados, em ordem (cada segmento com
+    pelo menos uma palavra e até MAX_WORDS_PER_SEGMENT), e retorna a fronteira
+    (índice da primeira palavra do próximo segmento) de cada segmento.
+
+    Custo de um segmento: log² da razão entre a duração esperada das suas
+    palavras (peso * velocidade média da narração) e a duração falada medida,
+    menos a afinidade da pontuação da última palavra com a pausa que o encerra.
+    Programação dinâmica com feixe (BEAM_WIDTH estados por segmento).
+    """
+    n_words = len(cum_weight) - 1
+    n_segs = len(seg_voiced)
+    rate = seg_voiced.sum() / cum_weight[-1]
+    target_weight = np.maximum(seg_voiced, 1e-3) / rate
+    expected_rate = np.log(target_weight)
+
+    bounds = np.array([0])
+    cost = np.array([0.0])
+    backs = []
+    for p in range(n_segs):
+        if p == n_segs - 1:
+            cand_b = np.full((len(bounds), 1), n_words) # Último segmento leva o resto
+        else:
+            # Segmentos com mais de 3x o peso esperado não são considerados
+            span = np.searchsorted(cum_weight, cum_weight[bounds] + 3 * target_weight[p], side='right') - bounds
+            offsets = np.arange(1, int(np.clip(span.max(), 1, MAX_WORDS_PER_SEGMENT)) + 1)
+            cand_b = bounds[:, None] + offsets[None, :]
+        cand_a = np.broadcast_to(np.arange(len(bounds))[:, None], cand_b.shape)
+        valid = (cand_b <= n_words - (n_segs - 1 - p)) & (cand_b > bounds[cand_a])
+        cand_b, cand_a = cand_b[valid], cand_a[valid]
+        weight = cum_weight[cand_b] - cum_weight[bounds[cand_a]]
+        c = cost[cand_a] + (np.log(weight) - expected_rate[p]) ** 2
+        if p < n_segs - 1:
+            c -= affinity[cand_b] * pause_strength[p]
+        # Melhor caminho por fronteira e, depois, só os BEAM_WIDTH melhores
+        order = np.lexsort((c, cand_b))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = cand_b[order][1:] != cand_b[order][:-1]
+        keep = order[first]
+        keep = keep[np.argsort(c[keep], kind='stable')[:BEAM_WIDTH]]
+        bounds, cost = cand_b[keep], c[keep]
+        backs.append((bounds, cand_a[keep]))
+
+    boundaries = []
+    k = int(np.argmin(cost))
+    for seg_bounds, seg_back in reversed(backs):
+        boundaries.append(int(seg_bounds[k]))
+        k = int(seg_back[k])
+    return boundaries[::-1]
+
+
+def align_words(words: List[str], puncts: List[Optional[str]], mono: np.ndarray, fps: int) -> List[Dict[str, Any]]:
+    """
+    Timestamps das palavras do roteiro na narração: segmentos falados entre
+    pausas (envelope de energia), palavras distribuídas entre os segmentos
+    pela programação dinâmica e, dentro de cada segmento, proporcionalmente
+    ao peso sobre o tempo com voz (micro-silêncios não contam).
+    """
+    duration = len(mono) / fps
+    if not words or len(mono) == 0:
+        return []
+    threshold_db = getattr(config, 'LOCAL_ALIGNER_SILENCE_THRESHOLD_DB', -35.0)
+    energy = frame_energy_db(mono, fps)
+    silences = find_silences(mono, fps, threshold_db, getattr(config, 'LOCAL_ALIGNER_PAUSE_MIN_SECONDS', 0.15), energy)
+    speech_start = silences[0][1] if silences and silences[0][0] <= 0.0 else 0.0
+    speech_end = silences[-1][0] if silences and silences[-1][1] >= duration else duration
+    pauses = [(s, e) for s, e in silences if s > speech_start and e < speech_end]
+    # Mais pausas que palavras: só as mais longas viram fronteiras
+    if len(pauses) > len(words) - 1:
+        pauses = sorted(sorted(pauses, key=lambda ps: ps[1] - ps[0])[len(pauses) - (len(words) - 1):])
+
+    # Tempo com voz acumulado por bloco do envelope
+    voiced = energy >= energy.max() + threshold_db
+    cum_voiced = np.concatenate(([0], np.cumsum(voiced))) * ANALYSIS_FRAME_SECONDS
+
+    def voiced_at(t):
+        f = np.clip(np.asarray(t) / ANALYSIS_FRAME_SECONDS, 0, len(voiced))
+        i = np.minimum(f.astype(int), len(voiced) - 1)
+        return cum_voiced[i] + (f - i) * voiced[i] * ANALYSIS_FRAME_SECONDS
+
+    seg_starts = np.array([speech_start] + [e for _, e in pauses])
+    seg_ends = np.array([s for s, _ in pauses] + [speech_end])
+    seg_voiced = np.maximum(voiced_at(seg_ends) - voiced_at(seg_starts), ANALYSIS_FRAME_SECONDS)
+    pause_strength = np.minimum(1.0, np.array([e - s for s, e in pauses] + [0.0]) / PAUSE_FULL_SECONDS)
+
+    weights = np.array([word_weight(w) for w in words])
+    cum_weight = np.concatenate(([0.0], np.cumsum(weights)))
+    affinity = np.zeros(len(words) + 1)
+    for i, punct in enumerate(puncts):
+        if punct:
+            affinity[i + 1] = max(PAUSE_AFFINITY.get(ch, 0.0) for ch in punct)
+    boundaries = assign_words_to_segments(cum_weight, seg_voiced, pause_strength, affinity)
+
+    # Dentro de cada segmento: posição no tempo com voz proporcional ao peso
+    starts = np.empty(len(words))
+    ends = np.empty(len(words))
+    first = 0
+    for seg, last in enumerate(boundaries):
+        v0, v1 = voiced_at(seg_starts[seg]), voiced_at(seg_ends[seg])
+        frac = (cum_weight[first:last + 1] - cum_weight[first]) / (cum_weight[last] - cum_weight[first])
+        targets = v0 + frac * (v1 - v0)
+        # Tempo com voz -> tempo real (inversa de voiced_at, linear dentro do bloco)
+        f = np.searchsorted(cum_voiced, targets, side='left')
+        f = np.clip(f, 1, len(cum_voiced) - 1)
+        t = ((f - 1) + (targets - cum_voiced[f - 1]) / np.maximum(cum_voiced[f] - cum_voiced[f - 1], 1e-9)) * ANALYSIS_FRAME_SECONDS
+        t = np.clip(t, seg_starts[seg], seg_ends[seg])
+        t[0], t[-1] = seg_starts[seg], seg_ends[seg]
+        starts[first:last] = t[:-1]
+        ends[first:last] = t[1:]
+        first = last
+
+    return [{'word': word, 'start': round(float(s), 3), 'end': round(float(e), 3)}
+            for word, s, e in zip(words, starts, ends)]
+
+
+def get_local_word_timestamps(audio_path: Path, original_script: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Timestamps palavra por palavra sem chamada de STT: o texto já é conhecido
+    (roteiro) e só os tempos são estimados a partir do áudio da narração.
+    Mesmo formato de get_word_timestamps ([{'word', 'start', 'end'}], palavras
+    sem a pontuação final).
+    """
+    if not audio_path.exists():
+        print(f"Erro: Arquivo de áudio não encontrado em {audio_path}")
+        return None
+    try:
+        start_time = time.time()
+        tokens = tokenize_script(original_script)
+        mono = decode_audio(audio_path, ALIGNER_SAMPLE_RATE, channels=1)[:, 0]
+        decoded_time = time.time()
+        words = align_words([t['word'] for t in tokens], [t['punct'] for t in tokens], mono, ALIGNER_SAMPLE_RATE)
+        print(f"Alinhamento local: {len(words)} palavras em {time.time() - decoded_time:.3f}s "
+              f"(+{decoded_time - start_time:.2f}s de decodificação).")
+        return words or None
+    except Exception as e:
+        print(f"Erro no alinhamento local de timestamps: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
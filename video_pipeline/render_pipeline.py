@@ -0,0 +1,341 @@
+# video_pipeline/render_pipeline.py
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+import config
+from video_pipeline.audio_mixer import AUDIO_FPS, write_wav
+from video_pipeline.compositor import LayerStackClip
+from video_pipeline.ffmpeg_utils import concat_stream_copy, mux_audio
+from video_pipeline.render_profiler import STAGE_AUDIO, STAGE_ENCODE, STAGE_FRAME, RenderProfiler
+
+# Trabalho do render em chunks. Os processos filhos o herdam via fork: a descrição
+# das camadas (clipes, sprites, fonte do fundo) não precisa ser serializada.
+_CHUNK_JOB = None
+
+STAGE_STREAM_WAIT = 'stream_wait' # Tempo que o compositor esperou por um buffer livre (backpressure)
+_STREAM_END = object()
+
+
+def total_frames_for(duration: float, fps: float) -> int:
+    """Número de frames que o MoviePy escreveria para `duration` (t = 0, 1/fps, ... < duration)."""
+    return len(np.arange(0, duration, 1.0 / fps))
+
+
+def plan_chunks(total_frames: int, keyint: int, chunks: int) -> List[Tuple[int, int]]:
+    """
+    Divide [0, total_frames) em até `chunks` intervalos cujos inícios caem em
+    múltiplos de `keyint` (fronteiras de GOP), para concatenar sem reencodar.
+    """
+    keyint = max(1, int(keyint))
+    gops = max(1, -(-total_frames // keyint))
+    gops_per_chunk = max(1, -(-gops // max(1, chunks)))
+    frames_per_chunk = gops_per_chunk * keyint
+    return [(start, min(start + frames_per_chunk, total_frames))
+            for start in range(0, total_frames, frames_per_chunk)]
+
+
+def _write_frames(writer, clip, fps: float, start: int, stop: int,
+                  profiler: RenderProfiler | None = None) -> None:
+    """Loop de escrita de frames; com profiler, cronometra composição e encode de cada frame."""
+    if profiler is None:
+        for frame_index in range(start, stop):
+            writer.write_frame(clip.get_frame(frame_index / fps))
+        return
+    for frame_index in range(start, stop):
+        with profiler.stage(STAGE_FRAME):
+            frame = clip.get_frame(frame_index / fps)
+        with profiler.stage(STAGE_ENCODE):
+            writer.write_frame(frame)
+        profiler.frames += 1
+
+
+def _render_chunk(task: dict) -> tuple:
+    """Executado no processo filho: renderiza e codifica um chunk da linha do tempo."""
+    job = _CHUNK_JOB
+    clip, fps, profiler = job['clip'], job['fps'], job['profiler']
+    # O pipe do ffmpeg herdado pertence ao pai; cada filho abre o seu leitor
+    for reader in job['readers']:
+        reader.proc = None
+    if profiler is not None:
+        profiler.reset() # Cópia herdada via fork: cada filho devolve só as suas amostras
+
+    writer = FFMPEG_VideoWriter(task['path'], clip.size, fps, codec=job['codec'], preset=job['preset'],
+                                threads=job['threads'], ffmpeg_params=job['ffmpeg_params'])
+    try:
+        _write_frames(writer, clip, fps, task['start'], task['stop'], profiler)
+    finally:
+        writer.close()
+    return task['path'], (profiler.export() if profiler is not None else None)
+
+
+def render_chunked(clip, audio_clip, output_path: Path, fps: float, workers: int,
+                   readers: List | None = None, audio_path: Path | None = None,
+                   profiler: RenderProfiler | None = None) -> None:
+    """
+    Renderiza `clip` em chunks paralelos (um processo por chunk), concatena os
+    chunks com o concat demuxer do ffmpeg e muxa uma única trilha de áudio
+    mixada de forma contínua (sem cliques nas emendas).
+
+    Args:
+        clip: Clipe de vídeo final (sem áudio).
+        audio_clip: Áudio final completo (ou None para vídeo mudo).
+        output_path: Arquivo final.
+        fps: FPS do vídeo.
+        workers: Número de processos.
+        readers: Leitores FFMPEG_VideoReader usados pelo clipe (reabertos em cada filho).
+        audio_path: Trilha de áudio já mixada e codificada (substitui audio_clip; copiada no mux).
+        profiler: Se fornecido, recebe as amostras de tempo coletadas em cada processo.
+    """
+    global _CHUNK_JOB
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise RuntimeError("Render em chunks requer 'fork' (indisponível neste sistema).")
+
+    workers = max(1, int(workers))
+    keyint = max(1, round(getattr(config, 'RENDER_KEYINT_SECONDS', 2) * fps))
+    total_frames = total_frames_for(clip.duration, fps)
+    chunks = plan_chunks(total_frames, keyint, workers)
+    work_dir = output_path.with_name(f"{output_path.stem}_chunks")
+    work_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Render em chunks: {total_frames} frames em {len(chunks)} chunks (GOP de {keyint} frames), {workers} processos.")
+
+    _CHUNK_JOB = {
+        'clip': clip,
+        'fps': fps,
+        'profiler': profiler,
+        'readers': list(readers or []),
+        'codec': config.VIDEO_CODEC,
+        'preset': config.VIDEO_PRESET,
+        'threads': max(1, (config.VIDEO_THREADS or 1) // workers),
+        'ffmpeg_params': ["-crf", str(config.VIDEO_CRF), "-g", str(keyint)],
+    }
+    tasks = [{'start': start, 'stop': stop, 'path': str(work_dir / f"chunk_{i:04d}.mp4")}
+             for i, (start, stop) in enumerate(chunks)]
+    try:
+        start_time = time.time()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context) as executor:
+            for done, (_, samples) in enumerate(executor.map(_render_chunk, tasks), start=1):
+                if profiler is not None:
+                    profiler.merge(*samples)
+                print(f"Chunk {done}/{len(tasks)} pronto ({time.time() - start_time:.1f}s).")
+
+        video_only_path = work_dir / "video.mp4"
+        concat_stream_copy([Path(task['path']) for task in tasks], video_only_path)
+
+        _finish_with_audio(video_only_path, output_path, audio_clip, audio_path, work_dir, profiler)
+    finally:
+        _CHUNK_JOB = None
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def splice_segments(segment_paths: List[Path], output_path: Path, audio_clip=None,
+                    audio_path: Path | None = None, profiler: RenderProfiler | None = None) -> None:
+    """
+    Emenda segmentos de vídeo codificados com os mesmos parâmetros (ex: intro em
+    cache + conteúdo) com stream copy e muxa uma única trilha de áudio contínua.
+    """
+    work_dir = output_path.with_name(f"{output_path.stem}_splice")
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        video_only_path = work_dir / "video.mp4"
+        concat_stream_copy(segment_paths, video_only_path)
+        _finish_with_audio(video_only_path, output_path, audio_clip, audio_path, work_dir, profiler)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _finish_with_audio(video_only_path: Path, output_path: Path, audio_clip, audio_path: Path | None,
+                       work_dir: Path, profiler: RenderProfiler | None = None) -> None:
+    """Muxa a trilha final (pronta ou gerada de uma vez a partir de audio_clip) no vídeo sem áudio."""
+    audio_start_time = time.perf_counter()
+    if audio_path is not None:
+        mux_audio(video_only_path, audio_path, output_path, audio_codec='copy')
+    elif audio_clip is not None:
+        # Áudio mixado de uma vez só para a duração inteira
+        audio_path = work_dir / "audio.wav"
+        audio_clip.write_audiofile(str(audio_path), fps=AUDIO_FPS, codec='pcm_s16le', logger=None)
+        mux_audio(video_only_path, audio_path, output_path, audio_codec=config.AUDIO_CODEC)
+    else:
+        os.replace(video_only_path, output_path)
+    if profiler is not None:
+        profiler.record(STAGE_AUDIO, time.perf_counter() - audio_start_time)
+
+
+def render_streaming(clip, audio_clip, output_path: Path, fps: float, workers: int, queue_frames: int,
+                     audio_path: Path | None = None, profiler: RenderProfiler | None = None) -> None:
+    """
+    Render em pipeline com memória limitada: composição, blend e encode se sobrepõem.
+
+    - A thread principal busca o fundo e as camadas dinâmicas de cada frame, em
+      ordem (leitores de vídeo e o motor de glitch não são thread-safe).
+    - Um pool de threads mistura as camadas estáticas (NumPy libera o GIL).
+    - Uma thread escritora envia os frames, em ordem, para o ffmpeg.
+
+    Os frames circulam em um conjunto fixo de `queue_frames` buffers: quando o
+    encoder atrasa, a composição espera por um buffer livre (backpressure), e a
+    memória não cresce com a duração do vídeo. Camadas estáticas cujo intervalo
+    já terminou têm seus buffers pré-multiplicados liberados.
+
+    Args:
+        clip: Clipe de vídeo final (sem áudio); LayerStackClip aproveita o pool de blend.
+        audio_clip: Áudio final completo (ou None para vídeo mudo).
+        output_path: Arquivo final.
+        fps: FPS do vídeo.
+        workers: Threads de blend das camadas estáticas.
+        queue_frames: Número de frames em trânsito (buffers pré-alocados).
+        audio_path: Trilha de áudio já mixada e codificada (substitui audio_clip; copiada no mux).
+        profiler: Se fornecido, recebe os tempos de composição, espera e encode.
+    """
+    total_frames = total_frames_for(clip.duration, fps)
+    workers = max(1, int(workers))
+    queue_frames = max(2, int(queue_frames))
+    layered = isinstance(clip, LayerStackClip)
+    w, h = clip.size
+
+    free_buffers = queue.Queue()
+    for _ in range(queue_frames):
+        free_buffers.put(np.empty((h, w, 3), dtype=np.uint8))
+    pending = queue.Queue(maxsize=queue_frames) # (índice, future do blend, buffer), em ordem
+    scratch = threading.local()
+    errors = []
+
+    work_dir = output_path.with_name(f"{output_path.stem}_stream")
+    work_dir.mkdir(parents=True, exist_ok=True)
+    video_only_path = work_dir / "video.mp4"
+    writer = FFMPEG_VideoWriter(str(video_only_path), clip.size, fps, codec=config.VIDEO_CODEC,
+                                preset=config.VIDEO_PRESET, threads=config.VIDEO_THREADS,
+                                ffmpeg_params=["-crf", str(config.VIDEO_CRF)])
+    print(f"Render em streaming: {total_frames} frames, {workers} threads de blend, "
+          f"até {queue_frames} frames em trânsito.")
+
+    def blend(sprites, out):
+        if not hasattr(scratch, 'acc'): # Buffers auxiliares próprios de cada thread
+            scratch.acc = np.empty((h, w, 3), dtype=np.uint16)
+            scratch.tmp = np.empty((h, w, 3), dtype=np.uint16)
+        return LayerStackClip.blend_sprites(sprites, out, scratch.acc, scratch.tmp)
+
+    def write_loop():
+        while True:
+            item = pending.get()
+            if item is _STREAM_END:
+                return
+            frame_index, future, buffer = item
+            try:
+                if not errors: # Após um erro só drena a fila (libera o compositor)
+                    frame = future.result() if future is not None else buffer
+                    encode_start = time.perf_counter()
+                    writer.write_frame(frame)
+                    if profiler is not None:
+                        profiler.record(STAGE_ENCODE, time.perf_counter() - encode_start)
+                        profiler.frames += 1
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                free_buffers.put(buffer)
+
+    start_time = time.time()
+    progress_step = max(1, total_frames // 10)
+    writer_thread = threading.Thread(target=write_loop, name="render-writer", daemon=True)
+    writer_thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render-blend") as pool:
+            try:
+                for frame_index in range(total_frames):
+                    if errors:
+                        break
+                    wait_start = time.perf_counter()
+                    buffer = free_buffers.get()
+                    if profiler is not None:
+                        profiler.record(STAGE_STREAM_WAIT, time.perf_counter() - wait_start)
+
+                    t = frame_index / fps
+                    compose_start = time.perf_counter()
+                    if layered:
+                        sprites = clip.render_dynamic(t, buffer)
+                        future = pool.submit(blend, sprites, buffer) if sprites else None
+                    else:
+                        np.copyto(buffer, clip.get_frame(t), casting='unsafe')
+                        future = None
+                    if profiler is not None:
+                        profiler.record(STAGE_FRAME, time.perf_counter() - compose_start)
+                    pending.put((frame_index, future, buffer))
+
+                    if (frame_index + 1) % progress_step == 0:
+                        elapsed = time.time() - start_time
+                        print(f"  Streaming: {frame_index + 1}/{total_frames} frames "
+                              f"({(frame_index + 1) / max(elapsed, 1e-6):.1f} frames/s)")
+            finally:
+                pending.put(_STREAM_END)
+                writer_thread.join()
+    finally:
+        writer.close()
+    try:
+        if errors:
+            raise errors[0]
+        _finish_with_audio(video_only_path, output_path, audio_clip, audio_path, work_dir, profiler)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def render_profiled(clip, audio_clip, output_path: Path, fps: float, profiler: RenderProfiler,
+                    audio_path: Path | None = None) -> None:
+    """
+    Render em um processo com o mesmo encoder do write_videofile, mas com o loop
+    de escrita próprio para cronometrar cada frame: composição (fundo e camadas,
+    instrumentados no profiler), chunk de áudio e write_frame do ffmpeg.
+
+    Args:
+        clip: Clipe de vídeo final (sem áudio).
+        audio_clip: Áudio do MoviePy, avaliado em um chunk por frame (ou None).
+        output_path: Arquivo final.
+        fps: FPS do vídeo.
+        profiler: Coletor das amostras de tempo.
+        audio_path: Trilha já mixada e codificada (substitui audio_clip; copiada no mux).
+    """
+    total_frames = total_frames_for(clip.duration, fps)
+    video_only_path = output_path.with_name(f"{output_path.stem}_video.mp4")
+    writer = FFMPEG_VideoWriter(str(video_only_path), clip.size, fps, codec=config.VIDEO_CODEC,
+                                preset=config.VIDEO_PRESET, threads=config.VIDEO_THREADS,
+                                ffmpeg_params=["-crf", str(config.VIDEO_CRF)])
+    audio_chunks = []
+    total_samples = int(round(clip.duration * AUDIO_FPS))
+    try:
+        for frame_index in range(total_frames):
+            _write_frames(writer, clip, fps, frame_index, frame_index + 1, profiler)
+            if audio_clip is not None and audio_path is None:
+                # Mesmo intervalo de amostras que o frame cobre
+                first = min(total_samples, int(round(frame_index * AUDIO_FPS / fps)))
+                last = min(total_samples, int(round((frame_index + 1) * AUDIO_FPS / fps)))
+                if last <= first:
+                    continue
+                with profiler.stage(STAGE_AUDIO):
+                    chunk = audio_clip.get_frame(np.arange(first, last) / AUDIO_FPS)
+                audio_chunks.append(np.asarray(chunk, dtype=np.float32).reshape(last - first, -1))
+    finally:
+        writer.close()
+
+    try:
+        if audio_path is not None:
+            with profiler.stage(STAGE_AUDIO):
+                mux_audio(video_only_path, audio_path, output_path, audio_codec='copy')
+        elif audio_chunks:
+            wav_path = output_path.with_name(f"{output_path.stem}_audio.wav")
+            try:
+                write_wav(np.concatenate(audio_chunks), wav_path)
+                mux_audio(video_only_path, wav_path, output_path, audio_codec=config.AUDIO_CODEC)
+            finally:
+                wav_path.unlink(missing_ok=True)
+        else:
+            os.replace(video_only_path, output_path)
+    finally:
+        video_only_path.unlink(missing_ok=True)
@@ -0,0 +1,134 @@
+# video_pipeline/render_profiler.py
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from video_pipeline.compositor import LayerStackClip
+
+# Estágios medidos por frame (outros podem aparecer, ex: 'overlay/<tipo>')
+STAGE_FRAME = 'frame' # get_frame completo (fundo + camadas)
+STAGE_BACKGROUND = 'background' # busca/decodificação do fundo
+STAGE_AUDIO = 'audio' # chunk de áudio do frame (mix do MoviePy) ou mux da trilha pronta
+STAGE_ENCODE = 'encode' # write_frame no pipe do ffmpeg (libx264)
+
+
+class RenderProfiler:
+    """
+    Coleta o tempo de cada estágio do render final (por chamada) e resume em
+    p50/p95/máximo. Desligado por padrão (config.RENDER_PROFILE).
+
+    As camadas são instrumentadas trocando métodos da instância (get_frame,
+    blit_on, blend) por versões cronometradas; os nomes dos estágios agrupam as
+    camadas por tipo ('overlay/texto') e o relatório guarda também cada camada.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.layer_samples: Dict[str, List[float]] = defaultdict(list)
+        self.frames = 0
+
+    def reset(self) -> None:
+        self.samples.clear()
+        self.layer_samples.clear()
+        self.frames = 0
+
+    def record(self, stage: str, seconds: float, layer: str | None = None) -> None:
+        self.samples[stage].append(seconds)
+        if layer is not None:
+            self.layer_samples[layer].append(seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def instrument(self, obj, method_name: str, stage: str, layer: str | None = None) -> None:
+        """Substitui obj.<method_name> por uma versão que registra o tempo de cada chamada."""
+        original = getattr(obj, method_name)
+        profiler = self
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                profiler.record(stage, time.perf_counter() - start, layer)
+
+        setattr(obj, method_name, timed)
+
+    def instrument_composite(self, clip, labels: List[str]) -> None:
+        """
+        Instrumenta o fundo e cada camada do clipe final (LayerStackClip ou
+        CompositeVideoClip). `labels` segue a ordem das camadas, fundo incluído.
+        """
+        if isinstance(clip, LayerStackClip):
+            self.instrument(clip.base, 'get_frame', STAGE_BACKGROUND)
+            for idx, (layer, layer_clip) in enumerate(zip(clip.layers, clip.clips), start=1):
+                label = labels[idx] if idx < len(labels) else 'camada'
+                layer_name = f"{label}_{idx:03d}"
+                if layer is not None:
+                    self.instrument(layer, 'blend', f'overlay/{label}', layer_name)
+                else:
+                    # Camada dinâmica: copiada direto se for opaca de tela cheia, senão blit_on
+                    method = 'get_frame' if clip._opaque[idx - 1] else 'blit_on'
+                    self.instrument(layer_clip, method, f'overlay/{label}', layer_name)
+        else:
+            # CompositeVideoClip: o fundo também passa por blit_on (que chama get_frame)
+            self.instrument(clip.clips[0], 'get_frame', STAGE_BACKGROUND)
+            for idx, layer_clip in enumerate(clip.clips[1:], start=1):
+                label = labels[idx] if idx < len(labels) else 'camada'
+                self.instrument(layer_clip, 'blit_on', f'overlay/{label}', f"{label}_{idx:03d}")
+
+    def merge(self, samples: Dict[str, List[float]], layer_samples: Dict[str, List[float]], frames: int) -> None:
+        """Junta amostras coletadas em outro processo (render em chunks)."""
+        for stage, values in samples.items():
+            self.samples[stage].extend(values)
+        for layer, values in layer_samples.items():
+            self.layer_samples[layer].extend(values)
+        self.frames += frames
+
+    def export(self) -> tuple:
+        return dict(self.samples), dict(self.layer_samples), self.frames
+
+    @staticmethod
+    def _histogram(values: List[float]) -> dict:
+        arr = np.asarray(values, dtype=np.float64) * 1000.0
+        return {
+            'count': int(arr.size),
+            'total_s': round(float(arr.sum()) / 1000.0, 4),
+            'mean_ms': round(float(arr.mean()), 3),
+            'p50_ms': round(float(np.percentile(arr, 50)), 3),
+            'p95_ms': round(float(np.percentile(arr, 95)), 3),
+            'max_ms': round(float(arr.max()), 3),
+        }
+
+    def summary(self) -> dict:
+        return {stage: self._histogram(values) for stage, values in sorted(self.samples.items()) if values}
+
+    def print_summary(self) -> None:
+        summary = self.summary()
+        print(f"\n--- Perfil do render ({self.frames} frames) ---")
+        print(f"{'estágio':<24}{'chamadas':>9}{'total (s)':>11}{'p50 (ms)':>10}{'p95 (ms)':>10}{'máx (ms)':>10}")
+        for stage, h in sorted(summary.items(), key=lambda item: -item[1]['total_s']):
+            print(f"{stage:<24}{h['count']:>9}{h['total_s']:>11.2f}{h['p50_ms']:>10.2f}{h['p95_ms']:>10.2f}{h['max_ms']:>10.2f}")
+
+    def write_report(self, path: Path, metadata: dict | None = None) -> Path:
+        """Grava o relatório JSON (histogramas por estágio e por camada)."""
+        report = {
+            'metadata': metadata or {},
+            'frames': self.frames,
+            'stages': self.summary(),
+            'layers': {layer: self._histogram(values)
+                       for layer, values in sorted(self.layer_samples.items()) if values},
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return path
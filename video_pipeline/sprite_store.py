@@ -0,0 +1,84 @@
+# video_pipeline/sprite_store.py
+import mmap
+import os
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+PAGE_SIZE = mmap.PAGESIZE
+MIN_CAPACITY = 16 * 1024 * 1024 # Tamanho inicial do arquivo (cresce dobrando)
+
+
+class SpriteStore:
+    """
+    Arquivo único com as máscaras uint8 dos sprites de texto e um índice de
+    offsets (em memória).
+
+    As máscaras são gravadas com pwrite (vão para o cache de páginas do SO, não
+    para a memória do processo) e lidas por views de um mmap somente leitura:
+    o compositor só traz para a RAM as páginas dos sprites que está misturando
+    e o SO pode descartar as frias a qualquer momento. Cada sprite começa em
+    uma página nova, para que drop() devolva exatamente as suas páginas.
+
+    Quando o arquivo cresce, um novo mapeamento maior é criado; as views já
+    entregues continuam válidas (seguram o mapeamento antigo).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        self._capacity = 0
+        self._size = 0
+        self._maps: List[mmap.mmap] = []
+        self._buffer = None # np.uint8 sobre o mapeamento mais recente
+        self.index: List[Tuple[int, int, int, int]] = [] # id -> (offset, altura, largura, mapeamento)
+
+    def _ensure_capacity(self, size: int) -> None:
+        if size <= self._capacity:
+            return
+        capacity = max(size, 2 * self._capacity, MIN_CAPACITY)
+        capacity = -(-capacity // PAGE_SIZE) * PAGE_SIZE
+        os.ftruncate(self._fd, capacity) # Arquivo esparso: só as páginas escritas ocupam disco
+        mapping = mmap.mmap(self._fd, capacity, access=mmap.ACCESS_READ)
+        self._maps.append(mapping)
+        self._buffer = np.frombuffer(mapping, dtype=np.uint8)
+        self._capacity = capacity
+
+    def add(self, mask: np.ndarray) -> int:
+        """Grava a máscara (h, w) e retorna seu id no índice."""
+        mask = np.ascontiguousarray(mask, dtype=np.uint8)
+        offset = -(-self._size // PAGE_SIZE) * PAGE_SIZE
+        self._ensure_capacity(offset + mask.nbytes)
+        if mask.nbytes:
+            os.pwrite(self._fd, mask.tobytes(), offset)
+        self._size = offset + mask.nbytes
+        self.index.append((offset, mask.shape[0], mask.shape[1], len(self._maps) - 1))
+        return len(self.index) - 1
+
+    def view(self, sprite_id: int) -> np.ndarray:
+        """Máscara gravada, como view somente leitura do arquivo mapeado."""
+        offset, h, w, map_idx = self.index[sprite_id]
+        if h * w == 0:
+            return np.zeros((h, w), dtype=np.uint8) # Sprite vazio: nada foi gravado nem mapeado
+        buffer = self._buffer if map_idx == len(self._maps) - 1 else np.frombuffer(self._maps[map_idx], dtype=np.uint8)
+        return buffer[offset:offset + h * w].reshape(h, w)
+
+    def drop(self, sprite_id: int) -> None:
+        """Devolve ao SO as páginas do sprite (relidas do arquivo se ele voltar a ser usado)."""
+        offset, h, w, map_idx = self.index[sprite_id]
+        length = -(-(h * w) // PAGE_SIZE) * PAGE_SIZE
+        if length and hasattr(mmap, 'MADV_DONTNEED'):
+            self._maps[map_idx].madvise(mmap.MADV_DONTNEED, offset, length)
+
+    def nbytes(self) -> int:
+        return self._size
+
+    def close(self) -> None:
+        """Fecha e remove o arquivo (views ainda vivas mantêm seus mapeamentos até serem liberadas)."""
+        if self._fd is None:
+            return
+        os.close(self._fd)
+        self._fd = None
+        self.path.unlink(missing_ok=True)
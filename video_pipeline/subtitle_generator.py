@@ -1,16 +1,26 @@
 # video_pipeline/subtitle_generator.py
 import openai
-from PIL import Image, ImageDraw, ImageFont
-from moviepy.editor import ImageClip # Apenas ImageClip é usado aqui diretamente
+from PIL import Image, ImageColor, ImageFont
 from pathlib import Path
 from typing import List, Dict, Any, Tuple, Optional
 import config # Importa as configurações globais
+from video_pipeline.glyph_atlas import draw_text # Texto composto pelo atlas de glifos
+from video_pipeline.compositor import MaskSpriteClip, SpritePanel, crop_to_ink # Texto como máscara uint8 + cor
+from video_pipeline.sprite_store import SpriteStore # Sprites em arquivo mapeado (roteiros longos)
+from video_pipeline.text_alignment import fast_opcodes, tokenize_script # Alinhamento rápido (pontuação)
+from video_pipeline.audio_analysis import find_silences, plan_silence_chunks, to_mono # Trechos da transcrição
+from video_pipeline.audio_mixer import decode_audio, write_wav
 import os
 from dotenv import load_dotenv
 import numpy as np
 import re # Para expressões regulares (limpeza de texto)
 import difflib # Para alinhamento de texto (pontuação)
 import time # Para medir tempo de execução
+import tempfile # Diretório próprio para os trechos da transcrição
+from functools import lru_cache, partial # Cache de fontes e larguras de texto
+from concurrent.futures import ThreadPoolExecutor # Transcrição de trechos em paralelo
+
+STT_CHUNK_SAMPLE_RATE = 16000 # Taxa dos trechos enviados ao Whisper (a do próprio modelo)
 
 # --- Carregamento de Configs e API Key ---
 load_dotenv()
@@ -20,7 +30,7 @@ if not api_key or api_key == "SUA_API_KEY_AQUI":
     client = None
 else:
     try:
-        client = openai.OpenAI(api_key=api_key)
+        client = openai.OpenAI(api_key=api_key, base_url=config.OPENAI_BASE_URL)
         # Opcional: Testar conexão/chave (pode adicionar custo mínimo)
         # client.models.list()
         print("Cliente OpenAI inicializado com sucesso.")
@@ -48,27 +58,7 @@ def add_punctuation_to_whisper_data(original_script: str, word_timestamps: List[
     start_time = time.time()
 
     # 1. Tokenizar Script Original (mantendo palavras e pontuações finais separadas)
-    raw_tokens = re.findall(r"[\w'-]+|[.,!?;:\"\'()]|\S+", original_script)
-    processed_tokens = []
-    i = 0
-    trailing_punct_regex = r'^[.,!?;:]+$'
-    while i < len(raw_tokens):
-        current_token = raw_tokens[i]
-        punctuation = None
-        # Verifica se é uma palavra (contém letras ou números)
-        if re.search(r'[a-zA-Z0-9]', current_token):
-            word = current_token
-            # Verifica se o próximo token é uma pontuação final
-            if i + 1 < len(raw_tokens) and re.match(trailing_punct_regex, raw_tokens[i+1]):
-                punctuation = raw_tokens[i+1]
-                processed_tokens.append({'word': word, 'punct': punctuation})
-                i += 2 # Pula palavra e pontuação
-            else:
-                processed_tokens.append({'word': word, 'punct': None})
-                i += 1
-        else:
-            # Ignora tokens que não são palavras (pontuações isoladas, etc.)
-            i += 1
+    processed_tokens = tokenize_script(original_script)
     script_words = [token['word'] for token in processed_tokens]
 
     # 2. Extrair Palavras dos Timestamps (já devem estar limpas de espaços extras)
@@ -77,15 +67,18 @@ def add_punctuation_to_whisper_data(original_script: str, word_timestamps: List[
     output_word_timestamps = [item.copy() for item in word_timestamps]
 
     # 3. Alinhar Sequências (case-insensitive e ignorando pontuação básica no Whisper)
-    matcher = difflib.SequenceMatcher(None,
-                                      [w.lower() for w in script_words],
-                                      [w.lower().strip(" .,!?;:") for w in whisper_words],
-                                      autojunk=False)
+    script_norm = [w.lower() for w in script_words]
+    whisper_norm = [w.lower().strip(" .,!?;:") for w in whisper_words]
+    if getattr(config, 'PUNCTUATION_ALIGNMENT', 'fast') == 'fast':
+        # Mesmos opcodes do SequenceMatcher, com o maior trecho comum achado por hash (roteiros longos)
+        opcodes = fast_opcodes(script_norm, whisper_norm)
+    else:
+        opcodes = difflib.SequenceMatcher(None, script_norm, whisper_norm, autojunk=False).get_opcodes()
 
     # 4. Transferir Pontuação do Script para os Timestamps Correspondentes
     script_to_whisper_map = {}
     # Mapeia índices de palavras correspondentes (iguais ou substituições 1-para-1)
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+    for tag, i1, i2, j1, j2 in opcodes:
         if tag == 'equal' or (tag == 'replace' and (i2 - i1) == (j2 - j1)):
             for offset in range(i2 - i1):
                  script_i = i1 + offset
@@ -115,6 +108,93 @@ def add_punctuation_to_whisper_data(original_script: str, word_timestamps: List[
     print(f"Adição de pontuação concluída em {end_time - start_time:.2f}s. {punctuation_added_count} pontuações adicionadas.")
     return output_word_timestamps
 
+# --- Transcrição em Trechos (narrações longas) ---
+def _word_field(word_obj, name: str, default=None):
+    """Campo de uma palavra da resposta do Whisper (dicionário ou objeto)."""
+    if isinstance(word_obj, dict):
+        return word_obj.get(name, default)
+    return getattr(word_obj, name, default)
+
+
+def plan_transcription_chunks(audio_path: Path) -> Tuple[np.ndarray, int, List[Tuple[float, float]]]:
+    """
+    Decodifica a narração (mono, 16 kHz) e planeja os trechos da transcrição,
+    cortados no meio de silêncios (ver audio_analysis.plan_silence_chunks).
+    """
+    fps = STT_CHUNK_SAMPLE_RATE
+    mono = to_mono(decode_audio(audio_path, fps, channels=1))
+    silences = find_silences(mono, fps,
+                             getattr(config, 'STT_SILENCE_THRESHOLD_DB', -35.0),
+                             getattr(config, 'STT_SILENCE_MIN_SECONDS', 0.25))
+    chunks = plan_silence_chunks(len(mono) / fps, silences,
+                                 getattr(config, 'STT_CHUNK_TARGET_SECONDS', 120),
+                                 getattr(config, 'STT_CHUNK_MAX_SECONDS', 180))
+    return mono, fps, chunks
+
+
+def transcribe_chunk(mono: np.ndarray, fps: int, start: float, end: float,
+                     chunk_path: Path) -> List[Dict[str, Any]]:
+    """Transcreve [start, end) da narração e devolve as palavras na linha do tempo global."""
+    write_wav(mono[int(round(start * fps)):int(round(end * fps)), None], chunk_path, fps)
+    try:
+        with open(chunk_path, "rb") as audio_file:
+            transcript = client.audio.transcriptions.create(
+                model=config.STT_MODEL,
+                file=audio_file,
+                response_format="verbose_json",
+                timestamp_granularities=["word"]
+            )
+    finally:
+        chunk_path.unlink(missing_ok=True)
+    words = []
+    for word_obj in (getattr(transcript, 'words', None) or []):
+        words.append({'word': str(_word_field(word_obj, 'word', '')),
+                      'start': float(_word_field(word_obj, 'start', 0.0)) + start,
+                      'end': float(_word_field(word_obj, 'end', 0.0)) + start})
+    return words
+
+
+def transcribe_chunks(audio_path: Path, mono: np.ndarray, fps: int,
+                      chunks: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
+    """
+    Transcreve os trechos em paralelo (até STT_MAX_CONCURRENCY chamadas), cada
+    um com STT_CHUNK_OVERLAP_SECONDS de áudio a mais de cada lado, e junta as
+    palavras: cada trecho fica só com as palavras cujo meio cai no seu
+    intervalo, e uma palavra repetida na emenda (mesmo texto, tempos
+    sobrepostos) é mantida uma única vez.
+    """
+    overlap = getattr(config, 'STT_CHUNK_OVERLAP_SECONDS', 1.0)
+    duration = len(mono) / fps
+    config.TEMP_DIR.mkdir(parents=True, exist_ok=True)
+
+    print(f"Transcrevendo {len(chunks)} trechos cortados em silêncios...")
+    # Diretório próprio da chamada: episódios transcritos ao mesmo tempo (todos com narration.mp3)
+    # não compartilham nomes de arquivo
+    with tempfile.TemporaryDirectory(dir=config.TEMP_DIR, prefix=f"{audio_path.stem}_stt_") as work_dir:
+        def run(index):
+            start, end = chunks[index]
+            chunk_path = Path(work_dir) / f"{index:03d}.wav"
+            return transcribe_chunk(mono, fps, max(0.0, start - overlap), min(duration, end + overlap), chunk_path)
+
+        with ThreadPoolExecutor(max_workers=max(1, getattr(config, 'STT_MAX_CONCURRENCY', 4))) as executor:
+            results = list(executor.map(run, range(len(chunks))))
+
+    merged = []
+    for (start, end), words in zip(chunks, results):
+        for word in words:
+            middle = (word['start'] + word['end']) / 2
+            if not (start <= middle < end or (end >= duration and middle >= start)):
+                continue # Pertence ao trecho vizinho (áudio de sobreposição)
+            if merged:
+                prev = merged[-1]
+                same = prev['word'].lower().strip(" .,!?;:") == word['word'].lower().strip(" .,!?;:")
+                if same and word['start'] < prev['end']:
+                    continue # Mesma palavra transcrita pelos dois trechos da emenda
+            merged.append(word)
+    merged.sort(key=lambda w: w['start'])
+    return merged
+
+
 # --- Função para Obter Timestamps ---
 def get_word_timestamps(audio_path: Path) -> Optional[List[Dict[str, Any]]]:
     """ Obtém timestamps palavra por palavra do Whisper via API OpenAI. """
@@ -129,26 +209,37 @@ def get_word_timestamps(audio_path: Path) -> Optional[List[Dict[str, Any]]]:
     try:
         print(f"Obtendo timestamps para: {audio_path.name} (Usando modelo {config.STT_MODEL})...")
         start_api_time = time.time()
-        with open(audio_path, "rb") as audio_file:
-            # Faz a chamada para a API de transcrição
-            transcript = client.audio.transcriptions.create(
-                model=config.STT_MODEL,
-                file=audio_file,
-                response_format="verbose_json", # Necessário para timestamps
-                timestamp_granularities=["word"] # Pede timestamps por palavra
-            )
-        end_api_time = time.time()
-        print(f"Chamada à API Whisper concluída em {end_api_time - start_api_time:.2f}s.")
-
-        # Verifica se a resposta contém os dados esperados
-        if not transcript or not hasattr(transcript, 'words') or not transcript.words:
-            print("Aviso: Resposta da API Whisper não contém timestamps de palavras ('words').")
-            print(f"Resposta completa (para debug): {transcript}")
+        chunks = None
+        if getattr(config, 'STT_CHUNKED', True):
+            mono, fps, chunks = plan_transcription_chunks(audio_path)
+        if chunks and len(chunks) > 1:
+            # Narração longa: trechos cortados em silêncios, transcritos em paralelo
+            raw_words = transcribe_chunks(audio_path, mono, fps, chunks)
+            print(f"Transcrição de {len(chunks)} trechos concluída em {time.time() - start_api_time:.2f}s.")
+        else:
+            with open(audio_path, "rb") as audio_file:
+                # Faz a chamada para a API de transcrição
+                transcript = client.audio.transcriptions.create(
+                    model=config.STT_MODEL,
+                    file=audio_file,
+                    response_format="verbose_json", # Necessário para timestamps
+                    timestamp_granularities=["word"] # Pede timestamps por palavra
+                )
+            end_api_time = time.time()
+            print(f"Chamada à API Whisper concluída em {end_api_time - start_api_time:.2f}s.")
+
+            # Verifica se a resposta contém os dados esperados
+            if not transcript or not hasattr(transcript, 'words') or not transcript.words:
+                print("Aviso: Resposta da API Whisper não contém timestamps de palavras ('words').")
+                print(f"Resposta completa (para debug): {transcript}")
+                return None
+            raw_words = transcript.words # A resposta deve ser uma lista de objetos/dicionários
+
+        if not raw_words:
+            print("Aviso: Transcrição não retornou timestamps de palavras.")
             return None
-
-        print(f"Timestamps brutos obtidos ({len(transcript.words)} palavras). Processando e limpando...")
+        print(f"Timestamps brutos obtidos ({len(raw_words)} palavras). Processando e limpando...")
         corrected_words = []
-        raw_words = transcript.words # A resposta deve ser uma lista de objetos/dicionários
 
         # Itera sobre as palavras retornadas pela API
         for i, word_obj in enumerate(raw_words):
@@ -202,72 +293,96 @@ def get_word_timestamps(audio_path: Path) -> Optional[List[Dict[str, Any]]]:
         traceback.print_exc() # Imprime stack trace para debug
         return None
 
-# --- Função Auxiliar para Criar Imagem de Texto (Pillow) ---
-def create_text_image(text: str, font_path: str, font_size: int, text_color: str,
-                       bg_enabled: bool, bg_color: tuple, bg_opacity: float, padding: int,
-                       max_width: int, video_width: int, h_align: str = 'center') -> Tuple[Optional[np.ndarray], int, int]:
+# --- Cache de Fontes e Métricas (compartilhado por todo o processo) ---
+@lru_cache(maxsize=32)
+def get_font(font_path: str, font_size: int):
+    """Carrega a fonte uma única vez por (arquivo, tamanho), com fallback para a padrão do Pillow."""
+    try:
+        return ImageFont.truetype(font_path, font_size)
+    except IOError:
+        print(f"Aviso: Não foi possível carregar a fonte '{font_path}'. Usando fonte padrão do Pillow.")
+        return ImageFont.load_default() # Pillow tenta encontrar uma fonte padrão
+
+@lru_cache(maxsize=65536)
+def text_width(font_path: str, font_size: int, text: str) -> float:
+    """Largura de uma palavra/linha, medida uma única vez por (fonte, tamanho, texto)."""
+    font = get_font(font_path, font_size)
+    # Fallback para getsize se getlength não existir
+    return font.getlength(text) if hasattr(font, 'getlength') else font.getsize(text)[0]
+
+# --- Quebra de Linha (compartilhada pelos modos de revelação do texto) ---
+def wrap_text_lines(text: str, font_path: str, font_size: int, max_width: int) -> List[str]:
+    """
+    Quebra gulosa do texto em linhas de até `max_width` pixels (palavras maiores
+    que a largura ficam sozinhas na linha, sem hifenização). A quebra de um
+    prefixo de palavras é sempre prefixo da quebra do texto inteiro.
+    """
+    lines = []
+    # Obtém largura do espaço
+    space_width = text_width(font_path, font_size, " ")
+
+    words = text.split(' ')
+    current_line = ""
+    current_line_width = 0
+    for word in words:
+        # Obtém largura da palavra
+        word_width = text_width(font_path, font_size, word)
+
+        if not current_line: # Primeira palavra da linha
+            if word_width > max_width: # Palavra sozinha é maior que a largura?
+                lines.append(word) # Adiciona como linha única (sem hifenização)
+                current_line = ""
+                current_line_width = 0
+            else:
+                current_line = word
+                current_line_width = word_width
+        # Verifica se adicionar a palavra (com espaço) cabe na linha
+        elif current_line_width + space_width + word_width <= max_width:
+            current_line += f" {word}"
+            current_line_width += space_width + word_width
+        else: # Não cabe, finaliza linha atual e começa nova
+            lines.append(current_line)
+            # Trata caso onde a nova palavra sozinha é maior que a largura
+            if word_width > max_width:
+                lines.append(word)
+                current_line = ""
+                current_line_width = 0
+            else:
+                current_line = word
+                current_line_width = word_width
+    if current_line: # Adiciona a última linha formada
+        lines.append(current_line)
+    return lines
+
+# --- Função Auxiliar para Criar a Máscara do Texto (Pillow/atlas de glifos) ---
+def create_text_sprite(text: str, font_path: str, font_size: int, bg_enabled: bool,
+                       bg_color: tuple, bg_opacity: float, padding: int, max_width: int,
+                       h_align: str = 'center') -> Tuple[Optional[np.ndarray], int, int, Optional[SpritePanel]]:
     """
-    Cria uma imagem RGBA do texto usando Pillow, com quebra de linha automática,
-    fundo opcional e alinhamento horizontal configurável.
-    Retorna o array numpy da imagem, largura e altura.
+    Rasteriza o texto como máscara de cobertura uint8 (uma cor só), com quebra
+    de linha automática e alinhamento horizontal configurável. O fundo opcional
+    não é desenhado: volta como descritor (SpritePanel) para o blend.
+    Retorna a máscara (tamanho da imagem inteira), largura, altura e painel.
     """
     try:
-        # Tenta carregar a fonte especificada, com fallback para a padrão
-        try:
-            font = ImageFont.truetype(font_path, font_size)
-        except IOError:
-            print(f"Aviso: Não foi possível carregar a fonte '{font_path}'. Usando fonte padrão do Pillow.")
-            font = ImageFont.load_default() # Pillow tenta encontrar uma fonte padrão
+        # Fonte e larguras vêm do cache do processo (a frase acumulada repete as mesmas palavras)
+        font = get_font(font_path, font_size)
 
-        lines = []
-        if not text: return None, 0, 0 # Lida com texto vazio
+        if not text: return None, 0, 0, None # Lida com texto vazio
 
         # Obtém métricas da fonte para calcular altura da linha
         ascent, descent = font.getmetrics()
         line_height = ascent + descent
-        # Obtém largura do espaço (com fallback para getsize se getlength não existir)
-        space_width = font.getlength(" ") if hasattr(font, 'getlength') else font.getsize(" ")[0]
 
         # Quebra o texto em linhas baseado na largura máxima
-        words = text.split(' ')
-        current_line = ""
-        current_line_width = 0
-        for word in words:
-            # Obtém largura da palavra (com fallback)
-            word_width = font.getlength(word) if hasattr(font, 'getlength') else font.getsize(word)[0]
-
-            if not current_line: # Primeira palavra da linha
-                if word_width > max_width: # Palavra sozinha é maior que a largura?
-                    lines.append(word) # Adiciona como linha única (sem hifenização)
-                    current_line = ""
-                    current_line_width = 0
-                else:
-                    current_line = word
-                    current_line_width = word_width
-            # Verifica se adicionar a palavra (com espaço) cabe na linha
-            elif current_line_width + space_width + word_width <= max_width:
-                current_line += f" {word}"
-                current_line_width += space_width + word_width
-            else: # Não cabe, finaliza linha atual e começa nova
-                lines.append(current_line)
-                # Trata caso onde a nova palavra sozinha é maior que a largura
-                if word_width > max_width:
-                    lines.append(word)
-                    current_line = ""
-                    current_line_width = 0
-                else:
-                    current_line = word
-                    current_line_width = word_width
-        if current_line: # Adiciona a última linha formada
-            lines.append(current_line)
-
-        if not lines: return None, 0, 0 # Retorna se nenhuma linha foi gerada
+        lines = wrap_text_lines(text, font_path, font_size, max_width)
+        if not lines: return None, 0, 0, None # Retorna se nenhuma linha foi gerada
 
         # Calcula dimensões da imagem final
         total_text_height = len(lines) * line_height
         actual_max_text_width = 0
         for line in lines:
-             line_len = font.getlength(line) if hasattr(font, 'getlength') else font.getsize(line)[0]
+             line_len = text_width(font_path, font_size, line)
              actual_max_text_width = max(actual_max_text_width, int(line_len))
         # Garante que a largura do texto não exceda o máximo permitido
         actual_max_text_width = min(actual_max_text_width, max_width)
@@ -282,23 +397,22 @@ def create_text_image(text: str, font_path: str, font_size: int, text_color: str
         img_w = max(1, img_w + 2) # Largura mínima de 1px
         img_h = max(1, img_h + 2) # Altura mínima de 1px
 
-        # Cria a imagem RGBA (transparente por padrão)
-        img = Image.new('RGBA', (img_w, img_h), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
+        # Máscara de cobertura do texto (transparente por padrão)
+        img = Image.new('L', (img_w, img_h), 0)
 
-        # Desenha o fundo retangular (arredondado) se habilitado
+        # Fundo retangular (arredondado) se habilitado: só o descritor, misturado no blend
+        panel = None
         if bg_enabled:
-            panel_fill = (*bg_color[:3], int(255 * bg_opacity)) # Cor com opacidade
-            radius = 10 # Raio dos cantos
+            radius = max(1, round(10 * getattr(config, 'LAYOUT_SCALE', 1.0))) # Raio dos cantos
             # Coordenadas do retângulo (com pequena margem interna)
             bg_x0, bg_y0 = 1, 1
             bg_x1, bg_y1 = img_w - 2, img_h - 2 # Ajustado para margem
-            draw.rounded_rectangle([(bg_x0, bg_y0), (bg_x1 , bg_y1)], radius=radius, fill=panel_fill)
+            panel = SpritePanel([(bg_x0, bg_y0), (bg_x1, bg_y1)], radius, bg_color, int(255 * bg_opacity))
 
         # Desenha cada linha de texto
         current_y = (padding + 1) if bg_enabled else 1 # Posição Y inicial (com margem)
         for line in lines:
-             line_len = font.getlength(line) if hasattr(font, 'getlength') else font.getsize(line)[0]
+             line_len = text_width(font_path, font_size, line)
              # Calcula posição X baseado no alinhamento horizontal
              if h_align == 'center':
                  pos_x = (img_w - line_len) / 2
@@ -309,29 +423,226 @@ def create_text_image(text: str, font_path: str, font_size: int, text_color: str
 
              pos_x = max(1, pos_x) # Garante pos_x >= 1
 
-             # Desenha texto usando 'anchor="la"' (left, ascent) para alinhamento vertical consistente
-             draw.text((pos_x, current_y), line, font=font, fill=text_color, anchor="la")
+             # Desenha texto com âncora "la" (left, ascent) para alinhamento vertical consistente
+             draw_text(img, (pos_x, current_y), line, font, 255)
              current_y += line_height # Move para a próxima linha
 
-        # Converte imagem Pillow para array NumPy
-        img_array = np.array(img)
-        return img_array, img_w, img_h
+        # Converte a máscara para array NumPy
+        return np.array(img), img_w, img_h, panel
 
     except Exception as e:
         print(f"ERRO CRÍTICO ao criar imagem de texto com Pillow para '{text[:30]}...': {e}")
         import traceback
         traceback.print_exc()
+        return None, 0, 0, None
+
+# --- Função Auxiliar para Criar Imagem de Texto (Pillow) ---
+def create_text_image(text: str, font_path: str, font_size: int, text_color: str,
+                       bg_enabled: bool, bg_color: tuple, bg_opacity: float, padding: int,
+                       max_width: int, video_width: int, h_align: str = 'center') -> Tuple[Optional[np.ndarray], int, int]:
+    """
+    Cria uma imagem RGBA do texto (máscara de create_text_sprite colorida, com
+    o fundo opcional desenhado). Retorna o array numpy da imagem, largura e altura.
+    """
+    coverage, img_w, img_h, panel = create_text_sprite(text, font_path, font_size, bg_enabled, bg_color,
+                                                       bg_opacity, padding, max_width, h_align)
+    if coverage is None:
         return None, 0, 0
+    return MaskSpriteClip(coverage, ImageColor.getrgb(text_color), panel).render_rgba(), img_w, img_h
+
+# --- Clipes de Texto Acumulado (uma imagem por palavra) ---
+def create_accumulated_text_clip(accumulated_text: str, display_start_time: float,
+                                 word_display_duration: float, font_path: str,
+                                 sprite_store: Optional[SpriteStore] = None) -> Optional[MaskSpriteClip]:
+    """
+    Rasteriza o texto acumulado inteiro em um MaskSpriteClip (modo de revelação 'word').
+    Com `sprite_store`, a máscara fica no arquivo mapeado em vez da memória.
+    """
+    # Cria a máscara do texto acumulado atual (cor e fundo ficam para o blend)
+    coverage, img_w, img_h, panel = create_text_sprite(
+        text=accumulated_text,
+        font_path=font_path,
+        font_size=config.NARRATION_TEXT_FONT_SIZE,
+        bg_enabled=config.NARRATION_TEXT_BG_ENABLED,
+        bg_color=config.NARRATION_TEXT_BG_COLOR,
+        bg_opacity=config.NARRATION_TEXT_BG_OPACITY,
+        padding=config.NARRATION_TEXT_PADDING,
+        max_width=int(config.VIDEO_WIDTH * config.NARRATION_TEXT_MAX_WIDTH_FACTOR),
+        h_align=config.NARRATION_TEXT_H_ALIGN # Passa alinhamento horizontal
+    )
+
+    # Verifica se a criação da imagem falhou
+    if coverage is None or img_w <= 0 or img_h <= 0:
+        print(f"AVISO: Falha ao criar imagem para texto: '{accumulated_text[:50]}...' Pulando clipe.")
+        return None
+
+    # Cria o clipe com a máscara gerada (uint8, recortada à tinta)
+    try:
+        color = ImageColor.getrgb(config.NARRATION_TEXT_COLOR)
+        if sprite_store is not None:
+            ink, ink_offset = crop_to_ink(coverage)
+            sprite_id = sprite_store.add(ink)
+            word_clip = MaskSpriteClip(sprite_store.view(sprite_id), color, panel,
+                                       size=(img_w, img_h), ink_offset=ink_offset)
+            word_clip.on_release = partial(sprite_store.drop, sprite_id)
+        else:
+            word_clip = MaskSpriteClip(coverage, color, panel)
+        word_clip = word_clip.set_start(display_start_time)
+        word_clip = word_clip.set_duration(word_display_duration)
+
+        # --- Calcula a Posição Vertical FIXA (Alinhada pelo Topo) ---
+        target_v_align_percent = config.NARRATION_TEXT_V_ALIGN_PERCENT
+        # Calcula a coordenada Y do TOPO do clipe
+        fixed_top_y_coordinate = config.VIDEO_HEIGHT * target_v_align_percent
+        # Garante que o clipe não saia da tela (importante para textos altos)
+        fixed_top_y_coordinate = max(0, min(fixed_top_y_coordinate, config.VIDEO_HEIGHT - img_h))
+
+        # --- Define a Posição (Horizontal e Vertical Fixa) ---
+        word_clip = word_clip.set_position((config.NARRATION_TEXT_H_ALIGN, fixed_top_y_coordinate))
+
+        # Define FPS para consistência na composição final
+        return word_clip.set_fps(config.VIDEO_FPS)
+
+    except Exception as e:
+        print(f"ERRO ao criar ou configurar clipe para texto '{accumulated_text[-30:]}': {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+# --- Clipes de Texto Acumulado (uma rasterização por frase) ---
+REVEAL_RASTER_PAD = 2 # Margem (px) das linhas rasterizadas para glifos que passam do avanço
+
+def narration_line_origins(lines: List[str], font_path: str) -> List[Tuple[float, int]]:
+    """
+    Origem (x, y) no frame de cada linha, exatamente onde create_text_image as
+    desenharia (sem fundo) com o clipe posicionado como no modo por palavra.
+    """
+    font_size = config.NARRATION_TEXT_FONT_SIZE
+    max_width = int(config.VIDEO_WIDTH * config.NARRATION_TEXT_MAX_WIDTH_FACTOR)
+    ascent, descent = get_font(font_path, font_size).getmetrics()
+    line_height = ascent + descent
+    widths = [text_width(font_path, font_size, line) for line in lines]
+
+    img_w = min(max(int(w) for w in widths), max_width) + 2
+    img_h = len(lines) * line_height + 2
+    top = config.VIDEO_HEIGHT * config.NARRATION_TEXT_V_ALIGN_PERCENT
+    top = int(max(0, min(top, config.VIDEO_HEIGHT - img_h)))
+
+    h_align = config.NARRATION_TEXT_H_ALIGN
+    origins = []
+    for idx, width in enumerate(widths):
+        if h_align == 'center':
+            clip_x, pos_x = int((config.VIDEO_WIDTH - img_w) / 2), (img_w - width) / 2
+        elif h_align == 'right':
+            clip_x, pos_x = config.VIDEO_WIDTH - img_w, img_w - width - 1
+        else: # 'left'
+            clip_x, pos_x = 0, 1
+        origins.append((clip_x + max(1, pos_x), top + 1 + idx * line_height))
+    return origins
+
+def create_sentence_reveal_clips(sentence_states: List[Tuple[str, float, float]], font_path: str,
+                                 sprite_store: Optional[SpriteStore] = None) -> List[MaskSpriteClip]:
+    """
+    Revela uma frase palavra por palavra a partir de uma única rasterização.
+
+    Cada estado acumulado é quebrado em linhas como no modo por palavra (a
+    quebra gulosa de um prefixo é prefixo da quebra da frase inteira), então
+    cada linha da frase completa é rasterizada uma vez e os estados viram
+    recortes dessas linhas (views, sem cópia), posicionados onde a imagem
+    acumulada as desenharia. Um mesmo recorte em estados seguidos vira um
+    único clipe. Estados cuja quebra diverge da frase completa caem na imagem
+    acumulada do modo por palavra. Com `sprite_store`, as linhas ficam no
+    arquivo mapeado e os recortes são views dele.
+    """
+    font_size = config.NARRATION_TEXT_FONT_SIZE
+    max_width = int(config.VIDEO_WIDTH * config.NARRATION_TEXT_MAX_WIDTH_FACTOR)
+    font = get_font(font_path, font_size)
+    ascent, descent = font.getmetrics()
+    line_height = ascent + descent
+    space_width = text_width(font_path, font_size, " ")
+    pad = REVEAL_RASTER_PAD
+
+    final_lines = wrap_text_lines(sentence_states[-1][0], font_path, font_size, max_width)
+    if not final_lines:
+        return []
+
+    # Rasteriza cada linha da frase completa uma única vez (máscara de cobertura uint8)
+    color = ImageColor.getrgb(config.NARRATION_TEXT_COLOR)
+    rasters = [] # (máscara recortada à tinta, canto, largura, altura, id no SpriteStore)
+    for line in final_lines:
+        width = int(np.ceil(text_width(font_path, font_size, line))) + 2 * pad
+        img = Image.new('L', (max(1, width), line_height + 2), 0)
+        draw_text(img, (pad, 1), line, font, 255)
+        ink, ink_offset = crop_to_ink(np.array(img))
+        sprite_id = None
+        if sprite_store is not None:
+            sprite_id = sprite_store.add(ink)
+            ink = sprite_store.view(sprite_id)
+        rasters.append((ink, ink_offset, img.width, img.height, sprite_id))
+
+    def make_clip(key, start, end):
+        line_idx, crop, x, y = key
+        ink, (ink_x, ink_y), _, height, sprite_id = rasters[line_idx]
+        clip = MaskSpriteClip(ink[:, :max(0, crop - ink_x)], color, size=(crop, height), ink_offset=(ink_x, ink_y))
+        if sprite_id is not None:
+            clip.on_release = partial(sprite_store.drop, sprite_id)
+        return (clip.set_start(start).set_duration(end - start)
+                    .set_position((x, y)).set_fps(config.VIDEO_FPS))
+
+    clips = []
+    open_pieces = {} # recorte -> [início, fim] do clipe ainda aberto
+    for text, display_start, duration in sentence_states:
+        display_end = display_start + duration
+        lines = wrap_text_lines(text, font_path, font_size, max_width)
+        compatible = 0 < len(lines) <= len(final_lines) and lines[:-1] == final_lines[:len(lines) - 1]
+        if compatible:
+            full_line = final_lines[len(lines) - 1]
+            tail = full_line[len(lines[-1]):]
+            compatible = full_line.startswith(lines[-1]) and (not tail or tail[0] in ' .,!?;:')
+
+        pieces = []
+        if compatible:
+            for line_idx, (line, (origin_x, origin_y)) in enumerate(zip(lines, narration_line_origins(lines, font_path))):
+                crop = rasters[line_idx][2]
+                if line != final_lines[line_idx]:
+                    # Corta no meio do espaço seguinte (ou logo antes da pontuação)
+                    reveal = text_width(font_path, font_size, line)
+                    if final_lines[line_idx][len(line)] == ' ':
+                        reveal += space_width / 2
+                    crop = min(crop, int(np.ceil(pad + reveal)))
+                # O Pillow desenha na coordenada arredondada (meio pixel para cima)
+                x = int(np.floor(origin_x + 0.5)) - pad
+                pieces.append((line_idx, crop, x, origin_y - 1))
+
+        # Fecha os recortes que não continuam neste estado
+        for key in list(open_pieces):
+            piece_start, piece_end = open_pieces[key]
+            if key not in pieces or display_start > piece_end + 1e-6:
+                clips.append(make_clip(key, piece_start, piece_end))
+                del open_pieces[key]
+        for key in pieces:
+            if key in open_pieces:
+                open_pieces[key][1] = max(open_pieces[key][1], display_end)
+            else:
+                open_pieces[key] = [display_start, display_end]
+
+        if not compatible:
+            clips.append(create_accumulated_text_clip(text, display_start, duration, font_path, sprite_store))
+
+    clips.extend(make_clip(key, start, end) for key, (start, end) in open_pieces.items())
+    return clips
 
 # --- Função Principal: Cria Clipes de Texto Acumulado ---
 def create_narration_text_clips(
     punctuated_word_timestamps: List[Dict[str, Any]],
     video_duration: float,
-    original_script: str # Argumento necessário para a chamada, mesmo que não usado diretamente aqui
-    ) -> List[ImageClip]:
+    original_script: str, # Argumento necessário para a chamada, mesmo que não usado diretamente aqui
+    sprite_store: Optional[SpriteStore] = None
+    ) -> List[MaskSpriteClip]:
     """
-    Cria clipes de texto (ImageClip) que aparecem acumulando palavra por palavra,
+    Cria clipes de texto (MaskSpriteClip) que aparecem acumulando palavra por palavra,
     sincronizados com a narração, mantendo o topo do bloco de texto fixo verticalmente.
+    Com `sprite_store`, as máscaras rasterizadas vão para o arquivo mapeado em memória.
     """
     all_clips = []
     if not punctuated_word_timestamps:
@@ -368,6 +679,9 @@ def create_narration_text_clips(
     print(f"Texto agrupado em {len(sentences)} sentenças/blocos visuais.")
 
     # 2. Processa cada bloco para criar clipes de palavra acumulada
+    reveal_mode = getattr(config, 'NARRATION_TEXT_REVEAL_MODE', 'sentence')
+    if reveal_mode == 'sentence' and config.NARRATION_TEXT_BG_ENABLED:
+        print("Aviso: Revelação por frase não suporta fundo no texto. Usando uma imagem por palavra.")
     clip_creation_start_time = time.time()
     total_clips_generated = 0
     for sentence_index, sentence_info in enumerate(sentences):
@@ -377,6 +691,7 @@ def create_narration_text_clips(
         phrase_start_time = sentence_words[0]['start'] # Início do bloco
         last_word_end_time = phrase_start_time # Rastreia o fim da palavra anterior
         current_phrase_text_list = [] # Acumula palavras do bloco atual
+        sentence_states = [] # (texto acumulado, início, duração) de cada palavra
 
         # Itera sobre as palavras do bloco atual
         for word_index, word_info in enumerate(sentence_words):
@@ -412,63 +727,29 @@ def create_narration_text_clips(
             accumulated_text = " ".join(current_phrase_text_list)
             # Limpa espaços antes de pontuações comuns
             accumulated_text = re.sub(r'\s+([.,!?;:])', r'\1', accumulated_text)
-
-            # Cria a imagem para o texto acumulado atual
-            text_image_array, img_w, img_h = create_text_image(
-                text=accumulated_text,
-                font_path=font_path,
-                font_size=config.NARRATION_TEXT_FONT_SIZE,
-                text_color=config.NARRATION_TEXT_COLOR,
-                bg_enabled=config.NARRATION_TEXT_BG_ENABLED,
-                bg_color=config.NARRATION_TEXT_BG_COLOR,
-                bg_opacity=config.NARRATION_TEXT_BG_OPACITY,
-                padding=config.NARRATION_TEXT_PADDING,
-                max_width=int(config.VIDEO_WIDTH * config.NARRATION_TEXT_MAX_WIDTH_FACTOR),
-                video_width=config.VIDEO_WIDTH,
-                h_align=config.NARRATION_TEXT_H_ALIGN # Passa alinhamento horizontal
-            )
-
-            # Verifica se a criação da imagem falhou
-            if text_image_array is None or img_w <= 0 or img_h <= 0:
-                print(f"AVISO: Falha ao criar imagem para texto: '{accumulated_text[:50]}...' Pulando clipe.")
-                last_word_end_time = end # Atualiza tempo
-                continue
-
-            # Cria o ImageClip com a imagem gerada
-            try:
-                word_clip = ImageClip(text_image_array, ismask=False) # ismask=False para RGBA
-                word_clip = word_clip.set_start(display_start_time)
-                word_clip = word_clip.set_duration(word_display_duration)
-
-                # --- Calcula a Posição Vertical FIXA (Alinhada pelo Topo) ---
-                target_v_align_percent = config.NARRATION_TEXT_V_ALIGN_PERCENT
-                # Calcula a coordenada Y do TOPO do clipe
-                fixed_top_y_coordinate = config.VIDEO_HEIGHT * target_v_align_percent
-                # Garante que o clipe não saia da tela (importante para textos altos)
-                fixed_top_y_coordinate = max(0, min(fixed_top_y_coordinate, config.VIDEO_HEIGHT - img_h))
-
-                # --- Define a Posição (Horizontal e Vertical Fixa) ---
-                word_clip = word_clip.set_position((config.NARRATION_TEXT_H_ALIGN, fixed_top_y_coordinate))
-
-                # Define FPS para consistência na composição final
-                word_clip = word_clip.set_fps(config.VIDEO_FPS)
-
-                all_clips.append(word_clip) # Adiciona o clipe pronto à lista
-                total_clips_generated += 1
-
-            except Exception as e:
-                 print(f"ERRO ao criar ou configurar ImageClip para palavra '{word}': {e}")
-                 import traceback
-                 traceback.print_exc()
-                 # Tentar fechar clipe parcialmente criado? Geralmente não necessário para ImageClip
+            sentence_states.append((accumulated_text, display_start_time, word_display_duration))
 
             # Atualiza o tempo final da última palavra processada para a próxima iteração
             last_word_end_time = end
 
+        if not sentence_states: continue
+
+        # Uma rasterização por frase (recortes por palavra) ou uma imagem por palavra acumulada
+        if reveal_mode == 'sentence' and not config.NARRATION_TEXT_BG_ENABLED:
+            sentence_clips = create_sentence_reveal_clips(sentence_states, font_path, sprite_store)
+        else:
+            sentence_clips = [create_accumulated_text_clip(text, display_start, duration, font_path, sprite_store)
+                              for text, display_start, duration in sentence_states]
+        sentence_clips = [clip for clip in sentence_clips if clip is not None]
+        all_clips.extend(sentence_clips)
+        total_clips_generated += len(sentence_clips)
+
     # Logs finais do processo de criação de clipes
     clip_creation_end_time = time.time()
     print(f"Criação dos clipes de texto ({total_clips_generated} clipes) concluída em {clip_creation_end_time - clip_creation_start_time:.2f}s.")
+    if sprite_store is not None:
+        print(f"Sprites de texto em '{sprite_store.path.name}': {len(sprite_store.index)} máscaras, {sprite_store.nbytes() / 1e6:.1f} MB.")
     overall_end_time = time.time()
     print(f"Processo total de geração de clipes de narração levou {overall_end_time - overall_start_time:.2f}s.")
 
-    return all_clips # Retorna a lista de ImageClips prontos para composição
\ No newline at end of file
+    return all_clips # Retorna a lista de clipes prontos para composição
\ No newline at end of file
@@ -0,0 +1,220 @@
+# video_pipeline/text_alignment.py
+import difflib
+import re
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+HASHED_MATCH_MIN = 512 # Trechos menores (soma das duas sequências) vão direto para o SequenceMatcher
+_HASH_BASE = np.uint64(0x9E3779B97F4A7C15) # Base do hash polinomial das janelas (módulo 2**64)
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+def tokenize_script(original_script: str) -> List[dict]:
+    """
+    Palavras do roteiro, cada uma com a pontuação final que a segue
+    ({'word': ..., 'punct': '.' | None}). Tokens sem letras/números
+    (pontuações isoladas, aspas etc.) são ignorados.
+    """
+    raw_tokens = re.findall(r"[\w'-]+|[.,!?;:\"\'()]|\S+", original_script)
+    processed_tokens = []
+    i = 0
+    trailing_punct_regex = r'^[.,!?;:]+$'
+    while i < len(raw_tokens):
+        current_token = raw_tokens[i]
+        # Verifica se é uma palavra (contém letras ou números)
+        if re.search(r'[a-zA-Z0-9]', current_token):
+            # Verifica se o próximo token é uma pontuação final
+            if i + 1 < len(raw_tokens) and re.match(trailing_punct_regex, raw_tokens[i+1]):
+                processed_tokens.append({'word': current_token, 'punct': raw_tokens[i+1]})
+                i += 2 # Pula palavra e pontuação
+            else:
+                processed_tokens.append({'word': current_token, 'punct': None})
+                i += 1
+        else:
+            # Ignora tokens que não são palavras (pontuações isoladas, etc.)
+            i += 1
+    return processed_tokens
+
+
+def _prefix_hashes(ids: List[int]) -> np.ndarray:
+    """Hashes polinomiais dos prefixos (módulo 2**64): janela [i, i+L) = H[i+L] - H[i] * base**L."""
+    prefix = [0]
+    h, base = 0, int(_HASH_BASE)
+    for value in ids:
+        h = (h * base + value) & 0xFFFFFFFFFFFFFFFF
+        prefix.append(h)
+    return np.array(prefix, dtype=np.uint64)
+
+
+class _WindowMatcher:
+    """
+    find_longest_match do difflib.SequenceMatcher (sem lixo, autojunk=False)
+    calculado por hash de janelas: busca binária no tamanho L do maior trecho
+    comum (existe janela de tamanho L em comum?) e desempate igual ao do
+    difflib (menor i e, entre esses, menor j). Cada teste é O(n log n) em
+    numpy, em vez de percorrer todos os pares de palavras iguais do trecho.
+    Colisões de hash são descartadas comparando as palavras; se nenhum
+    candidato conferir, usa o próprio SequenceMatcher no trecho.
+    """
+
+    def __init__(self, a: Sequence[str], b: Sequence[str]):
+        self.a, self.b = a, b
+        vocab = {}
+        ids_a = [vocab.setdefault(w, len(vocab) + 1) for w in a]
+        ids_b = [vocab.setdefault(w, len(vocab) + 1) for w in b]
+        self.hash_a, self.hash_b = _prefix_hashes(ids_a), _prefix_hashes(ids_b)
+        # base**L = diferença entre os prefixos de uma sequência 0, 0, ..., 1
+        self.powers = _prefix_hashes([1] + [0] * max(len(a), len(b)))[1:]
+
+    def _windows(self, prefix: np.ndarray, lo: int, hi: int, size: int) -> np.ndarray:
+        return prefix[lo + size:hi + 1] - prefix[lo:hi - size + 1] * self.powers[size]
+
+    def longest(self, alo: int, ahi: int, blo: int, bhi: int, bound: int) -> Tuple[int, int, int]:
+        """Mesmo resultado de SequenceMatcher.find_longest_match(alo, ahi, blo, bhi); `bound` limita o tamanho."""
+        def common(size):
+            windows_a = np.sort(self._windows(self.hash_a, alo, ahi, size))
+            windows_b = np.sort(self._windows(self.hash_b, blo, bhi, size))
+            idx = np.minimum(np.searchsorted(windows_b, windows_a), len(windows_b) - 1)
+            return bool((windows_b[idx] == windows_a).any())
+
+        limit = min(ahi - alo, bhi - blo, bound)
+        if limit <= 0 or not common(1):
+            return alo, blo, 0
+        # Busca exponencial e depois binária: lo sempre tem janela em comum, hi nunca
+        lo, hi = 1, 2
+        while hi <= limit and common(hi):
+            lo, hi = hi, hi * 2
+        hi = min(hi, limit + 1)
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if common(mid):
+                lo = mid
+            else:
+                hi = mid
+
+        windows_a = self._windows(self.hash_a, alo, ahi, lo)
+        windows_b = self._windows(self.hash_b, blo, bhi, lo)
+        for i in np.flatnonzero(np.isin(windows_a, windows_b)):
+            i = alo + int(i)
+            for j in np.flatnonzero(windows_b == windows_a[i - alo]):
+                j = blo + int(j)
+                if self.a[i:i + lo] == self.b[j:j + lo]:
+                    return i, j, lo
+        # Só colisões de hash: resultado do próprio difflib
+        match = difflib.SequenceMatcher(None, self.a, self.b, autojunk=False).find_longest_match(alo, ahi, blo, bhi)
+        return match.a, match.b, match.size
+
+
+def fast_opcodes(a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+    """
+    Exatamente os opcodes de difflib.SequenceMatcher(None, a, b,
+    autojunk=False).get_opcodes(), com a mesma recursão do
+    get_matching_blocks (maior trecho comum, depois os dois lados), mas com o
+    maior trecho comum dos trechos grandes achado por _WindowMatcher. Trechos
+    pequenos (até HASHED_MATCH_MIN palavras somando as duas sequências) usam o
+    SequenceMatcher direto no recorte, que dá os mesmos blocos.
+    """
+    matcher = _WindowMatcher(a, b)
+    blocks = []
+    queue = [(0, len(a), 0, len(b), min(len(a), len(b)))]
+    while queue:
+        alo, ahi, blo, bhi, bound = queue.pop()
+        if (ahi - alo) + (bhi - blo) <= HASHED_MATCH_MIN:
+            small = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            blocks.extend((alo + x, blo + y, size) for x, y, size in small.get_matching_blocks() if size)
+            continue
+        i, j, size = matcher.longest(alo, ahi, blo, bhi, bound)
+        if size:
+            blocks.append((i, j, size))
+            # O maior trecho comum dos lados não passa do atual
+            if alo < i and blo < j:
+                queue.append((alo, i, blo, j, size))
+            if i + size < ahi and j + size < bhi:
+                queue.append((i + size, ahi, j + size, bhi, size))
+    blocks.sort()
+
+    # Blocos adjacentes viram um só e os opcodes saem dos intervalos entre blocos (como no difflib)
+    merged = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        else:
+            merged.append((i, j, size))
+    merged.append((len(a), len(b), 0))
+    opcodes: List[Opcode] = []
+    pos_a = pos_b = 0
+    for i, j, size in merged:
+        tag = ''
+        if pos_a < i and pos_b < j:
+            tag = 'replace'
+        elif pos_a < i:
+            tag = 'delete'
+        elif pos_b < j:
+            tag = 'insert'
+        if tag:
+            opcodes.append((tag, pos_a, i, pos_b, j))
+        pos_a, pos_b = i + size, j + size
+        if size:
+            opcodes.append(('equal', i, pos_a, j, pos_b))
+    return opcodes
+
+
+def _synthetic_pair(script_text: str, n_words: int, seed: int) -> Tuple[List[str], List[str]]:
+    """
+    Roteiro sintético com n_words palavras (frases do roteiro real embaralhadas e
+    repetidas, como numa compilação) e uma "transcrição" com erros típicos do
+    Whisper: trocas de palavra, omissões, inserções e palavras quebradas em duas.
+    """
+    import random
+    rng = random.Random(seed)
+    sentences = [re.findall(r"[\w'-]+", s.lower()) for s in re.split(r'(?<=[.!?])\s+', script_text)]
+    sentences = [s for s in sentences if s]
+    vocab = sorted({w for s in sentences for w in s})
+    script: List[str] = []
+    while len(script) < n_words:
+        script.extend(rng.choice(sentences))
+    script = script[:n_words]
+
+    whisper: List[str] = []
+    for word in script:
+        r = rng.random()
+        if r < 0.02:
+            continue # Palavra não transcrita
+        if r < 0.05:
+            whisper.append(rng.choice(vocab)) # Palavra ouvida errada
+        elif r < 0.06 and '-' in word:
+            whisper.extend(word.split('-', 1)) # "scp-096" -> "scp", "096"
+        else:
+            whisper.append(word)
+        if rng.random() < 0.01:
+            whisper.append(rng.choice(vocab)) # Palavra a mais
+    return script, whisper
+
+
+if __name__ == "__main__":
+    # Benchmark: python -m video_pipeline.text_alignment [n_palavras ...]
+    import sys
+    import time
+    from pathlib import Path
+
+    script_path = Path(__file__).resolve().parent.parent / "data" / "scripts" / "SCP-096-The-Shy-Guy-Class-Euclid.txt"
+    script_text = script_path.read_text(encoding="utf-8")
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 5000, 10000, 20000]
+
+    # opcodes: resultado idêntico ao do difflib
+    print(f"{'palavras':>8} {'difflib':>10} {'rápido':>10} {'speedup':>8} {'opcodes':>8}")
+    for n_words in sizes:
+        script, whisper = _synthetic_pair(script_text, n_words, seed=n_words)
+
+        start = time.perf_counter()
+        reference = difflib.SequenceMatcher(None, script, whisper, autojunk=False).get_opcodes()
+        t_difflib = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast = fast_opcodes(script, whisper)
+        t_fast = time.perf_counter() - start
+
+        print(f"{n_words:>8} {t_difflib:>9.3f}s {t_fast:>9.3f}s {t_difflib / t_fast:>7.1f}x "
+              f"{'igual' if fast == reference else 'difere':>8}")
@@ -3,38 +3,167 @@ import openai
 from pathlib import Path
 import config
 import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 from dotenv import load_dotenv
+from video_pipeline.artifact_cache import ArtifactCache, shared_cache
+from video_pipeline.ffmpeg_utils import run_ffmpeg
 
 # Carrega variáveis de ambiente do arquivo .env
 load_dotenv()
 
 # Usa a API key do arquivo .env ou do config.py como fallback
 api_key = os.getenv("OPENAI_API_KEY") or config.OPENAI_API_KEY
-client = openai.OpenAI(api_key=api_key)
+# OPENAI_BASE_URL permite apontar para outro servidor compatível (ex.: stub local de TTS)
+client = openai.OpenAI(api_key=api_key, base_url=config.OPENAI_BASE_URL)
 
-def generate_narration(script_text: str, output_path: Path, 
+# Formato "pcm" da API de TTS: 16 bits little-endian, mono, 24 kHz, sem cabeçalho
+TTS_PCM_SAMPLE_RATE = 24000
+TTS_PCM_SAMPLE_WIDTH = 2
+
+
+def split_tts_chunks(script_text: str, max_chars: int) -> List[str]:
+    """
+    Divide o roteiro em trechos para o TTS: um por parágrafo (linhas em branco
+    separam parágrafos). Parágrafos maiores que `max_chars` são quebrados em
+    frases agrupadas até o limite (e frases enormes, em palavras). Um trecho
+    nunca junta dois parágrafos, para que editar um parágrafo só mude os
+    trechos dele.
+    """
+    chunks = []
+    for paragraph in re.split(r'\n\s*\n', script_text):
+        paragraph = ' '.join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            chunks.append(paragraph)
+            continue
+        pieces = []
+        for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(' ', 0, max_chars + 1)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].lstrip()
+            if sentence:
+                pieces.append(sentence)
+        current = ''
+        for piece in pieces:
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def tts_chunk_cache_inputs(text: str, model: str, voice: str) -> dict:
+    """Entradas que definem o PCM de um trecho (chave no cache de artefatos)."""
+    return {'text': text, 'model': model, 'voice': voice, 'format': 'pcm', 'base_url': config.OPENAI_BASE_URL}
+
+
+def synthesize_chunk(text: str, model: str, voice: str, cache: ArtifactCache, dest: Path) -> bool:
+    """
+    Grava o PCM do trecho em `dest`, chamando a API só se ele não estiver no
+    cache de artefatos. Retorna True se veio do cache.
+    """
+    key = ArtifactCache.key('tts_chunk', tts_chunk_cache_inputs(text, model, voice))
+    if cache.fetch(key, dest):
+        return True
+    response = client.audio.speech.create(
+        model=model,
+        voice=voice,
+        input=text,
+        response_format="pcm"
+    )
+    pcm = response.content
+    if len(pcm) % TTS_PCM_SAMPLE_WIDTH:
+        pcm = pcm[:-1] # Amostra incompleta no fim da resposta
+    dest.write_bytes(pcm)
+    cache.store(key, 'tts_chunk', dest)
+    return False
+
+
+def narration_cache_inputs(script_text: str, voice_style: str = config.TTS_VOICE) -> dict:
+    """Entradas que definem o narration.mp3 (chave do cache de artefatos)."""
+    inputs = {
+        'script': script_text,
+        'model': config.TTS_MODEL,
+        'voice': voice_style,
+        'base_url': config.OPENAI_BASE_URL,
+        'chunked': getattr(config, 'TTS_CHUNKED', True),
+    }
+    if inputs['chunked']:
+        inputs['chunk_max_chars'] = getattr(config, 'TTS_CHUNK_MAX_CHARS', 4000)
+        inputs['bitrate'] = getattr(config, 'TTS_MP3_BITRATE', '192k')
+    return inputs
+
+
+def generate_narration_chunked(script_text: str, output_path: Path, voice_style: str) -> str:
+    """
+    Sintetiza o roteiro por parágrafos (até TTS_MAX_CONCURRENCY chamadas em
+    paralelo), com cache de PCM por trecho, e junta os trechos sem intervalos
+    (concatenação do PCM) antes de codificar o mp3. O PCM dos trechos fica no
+    cache de artefatos compartilhado, sob o mesmo limite de tamanho.
+    """
+    chunks = split_tts_chunks(script_text, getattr(config, 'TTS_CHUNK_MAX_CHARS', 4000))
+    if not chunks:
+        raise ValueError("Roteiro vazio, nada para narrar.")
+    cache = shared_cache()
+    model = config.TTS_MODEL
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    # Trechos copiados (hardlink) do cache para um diretório da execução: despejos do cache
+    # durante a narração não afetam a montagem
+    with tempfile.TemporaryDirectory(dir=config.TEMP_DIR, prefix="tts_") as work_dir:
+        pcm_paths = [Path(work_dir) / f"{index:04d}.pcm" for index in range(len(chunks))]
+        workers = max(1, getattr(config, 'TTS_MAX_CONCURRENCY', 4))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            from_cache = list(executor.map(lambda item: synthesize_chunk(item[0], model, voice_style, cache, item[1]),
+                                           zip(chunks, pcm_paths)))
+        print(f"Narração em {len(chunks)} trechos ({sum(from_cache)} do cache, "
+              f"{len(chunks) - sum(from_cache)} sintetizados).")
+
+        pcm_path = Path(work_dir) / f"{output_path.stem}.pcm"
+        with open(pcm_path, 'wb') as stitched:
+            for path in pcm_paths:
+                stitched.write(path.read_bytes())
+        run_ffmpeg(["-f", "s16le", "-ar", TTS_PCM_SAMPLE_RATE, "-ac", 1, "-i", pcm_path,
+                    "-c:a", "libmp3lame", "-b:a", getattr(config, 'TTS_MP3_BITRATE', '192k'), output_path],
+                   description="codificação da narração")
+    return str(output_path)
+
+
+def generate_narration(script_text: str, output_path: Path,
                        voice_style: str = config.TTS_VOICE) -> str | None:
     """
     Gera narração de áudio a partir do texto do script usando a API OpenAI TTS.
-    
+
     Args:
         script_text: Texto do script para narrar.
         output_path: Caminho onde o arquivo de áudio será salvo.
         voice_style: Estilo de voz a ser usado (default: config.TTS_VOICE).
-        
+
     Returns:
         Caminho do arquivo de áudio gerado ou None em caso de erro.
     """
     try:
         print(f"Gerando narração para: {output_path.name}...")
-        response = client.audio.speech.create(
-            model=config.TTS_MODEL,
-            voice=voice_style,
-            input=script_text,
-            response_format="mp3" 
-        )
-        output_path.parent.mkdir(parents=True, exist_ok=True) 
-        response.stream_to_file(str(output_path)) 
+        if getattr(config, 'TTS_CHUNKED', True):
+            generate_narration_chunked(script_text, output_path, voice_style)
+        else:
+            response = client.audio.speech.create(
+                model=config.TTS_MODEL,
+                voice=voice_style,
+                input=script_text,
+                response_format="mp3"
+            )
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            response.stream_to_file(str(output_path))
         print(f"Narração salva com sucesso em: {output_path}")
         return str(output_path)
     except openai.AuthenticationError as e:
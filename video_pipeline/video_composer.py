@@ -1,12 +1,17 @@
 # video_pipeline/video_composer.py
 import os
 from moviepy.editor import (VideoFileClip, AudioFileClip, concatenate_videoclips,
-                            CompositeVideoClip, ImageClip, ColorClip,
+                            CompositeVideoClip, ImageClip, ColorClip, VideoClip,
                             CompositeAudioClip, afx) # Adicionado afx para volumex
 from typing import List, Union
 from pathlib import Path
 import numpy as np
 import config
+from video_pipeline.compositor import IndexedCompositeVideoClip, LayerStackClip
+from video_pipeline.render_pipeline import (render_chunked, render_profiled, render_streaming,
+                                            splice_segments, total_frames_for)
+from video_pipeline.render_profiler import RenderProfiler
+from video_pipeline.audio_mixer import mix_final_audio, write_audio_track
 import time
 import math
 
@@ -15,11 +20,13 @@ print("AVISO: O carregamento direto de WebP no video_composer depende da instala
 
 def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorClip do fallback
                    intro_duration: float, # <<< DURAÇÃO REAL DA INTRO ADICIONADA
-                   background_video_path: Path,
+                   background_video_path: Path | None,
                    narration_path: Path,
                    narration_text_clips: List[Union[ImageClip, CompositeVideoClip]],
                    output_path: Path,
-                   final_duration: float) -> bool:
+                   final_duration: float,
+                   background_clip: VideoClip | None = None,
+                   intro_segment_path: Path | None = None) -> bool:
     """
     Monta o vídeo final usando durações precisas e posicionando clipes corretamente.
     Tenta usar logo .webp como marca d'água se configurado.
@@ -32,6 +39,11 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
         narration_text_clips: Lista de clipes de texto (ImageClip) sincronizados.
         output_path: Caminho para salvar o vídeo final.
         final_duration: A duração exata desejada para o vídeo final (intro + conteúdo).
+        background_clip: Fonte de fundo em memória (ex: glitch procedural). Se fornecida,
+                         substitui background_video_path (que pode ser None).
+        intro_segment_path: Intro já codificada (cache). Se fornecida, só o conteúdo é
+                            renderizado e a intro é emendada sem reencodar (intro_clip
+                            é ignorado e pode ser None).
 
     Returns:
         True se a montagem for bem-sucedida, False caso contrário.
@@ -52,6 +64,8 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
     bg_music_base = None # Referência ao clipe original da música
     bg_music_final = None # Áudio final da música processada
     bg_music_final_for_compose = None
+    audio_track_path = None # Trilha mixada em NumPy (AUDIO_MIXER == 'numpy')
+    content_segment_path = None # Conteúdo renderizado à parte quando a intro vem do cache
 
     try:
         # 1. Calcular Duração do Conteúdo
@@ -61,6 +75,15 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
                              f"(Duração Final: {final_duration:.2f}s, Duração Intro: {intro_duration:.2f}s)")
         print(f"Montagem - Duração Final: {final_duration:.2f}s, Intro: {intro_duration:.2f}s, Conteúdo: {content_duration:.2f}s")
 
+        # Com a intro já codificada, a composição cobre só o conteúdo: a linha do tempo
+        # começa no primeiro frame após a intro (que tem um número inteiro de frames)
+        timeline_offset = 0.0
+        if intro_segment_path is not None:
+            if not intro_segment_path.exists(): raise FileNotFoundError(f"Segmento da intro não encontrado: {intro_segment_path}")
+            timeline_offset = total_frames_for(intro_duration, config.VIDEO_FPS) / config.VIDEO_FPS
+            print(f"Intro pré-renderizada: {intro_segment_path.name} (conteúdo renderizado a partir de t={timeline_offset:.3f}s)")
+        timeline_duration = final_duration - timeline_offset
+
         # 2. Carregar e Ajustar Narração para DURAÇÃO DO CONTEÚDO
         print("Carregando e ajustando narração...")
         if not narration_path.exists(): raise FileNotFoundError(f"Narração não encontrada: {narration_path}")
@@ -78,11 +101,16 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
 
         # 3. Carregar e Preparar VÍDEO de Background para DURAÇÃO TOTAL
         print("Carregando e preparando vídeo de background...")
-        if not background_video_path.exists(): raise FileNotFoundError(f"Vídeo de fundo não encontrado: {background_video_path}")
-        if os.path.getsize(background_video_path) == 0: raise ValueError("Vídeo de fundo vazio.")
+        if background_clip is None:
+            if background_video_path is None or not background_video_path.exists(): raise FileNotFoundError(f"Vídeo de fundo não encontrado: {background_video_path}")
+            if os.path.getsize(background_video_path) == 0: raise ValueError("Vídeo de fundo vazio.")
 
         try:
-            bg_clip_full = VideoFileClip(str(background_video_path), audio=False)
+            if background_clip is not None:
+                print("Usando fonte de fundo em memória (sem decodificar arquivo).")
+                bg_clip_full = background_clip
+            else:
+                bg_clip_full = VideoFileClip(str(background_video_path), audio=False)
             clips_to_close.append(bg_clip_full)
             if bg_clip_full.duration < final_duration - 0.1:
                  print(f"AVISO: Vídeo de fundo ({bg_clip_full.duration:.2f}s) é mais curto que a duração final ({final_duration:.2f}s).")
@@ -110,6 +138,8 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
 
             # Define FPS e DURAÇÃO FINAL para o clipe de fundo que será usado
             bg_clip_prepared = bg_clip_prepared.set_duration(final_duration).set_fps(config.VIDEO_FPS)
+            if timeline_offset > 0:
+                bg_clip_prepared = bg_clip_prepared.subclip(timeline_offset)
             print(f"Background preparado (Duração: {bg_clip_prepared.duration:.2f}s)")
 
         except Exception as e:
@@ -117,6 +147,7 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
 
         # --- *** ATUALIZADO: Cria Logo Marca d'água (WebP) *** ---
         video_elements_content = [] # Elementos que vão *sobre* o fundo na parte do conteúdo
+        content_labels = [] # Tipo de cada elemento (nomes dos estágios no perfil do render)
         if config.USE_LOGO_WATERMARK:
             logo_path = config.SCP_LOGO_FILE # Caminho do WebP
             if logo_path.exists():
@@ -136,10 +167,11 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
                                                  top=config.LOGO_MARGIN_WATERMARK, bottom=config.LOGO_MARGIN_WATERMARK, opacity=0) # Margem transparente
                                          .set_opacity(config.LOGO_OPACITY_WATERMARK)
                                          .set_fps(config.VIDEO_FPS)
-                                         .set_start(intro_duration)) # <<< DEFINE O INÍCIO APÓS A INTRO
+                                         .set_start(max(0.0, intro_duration - timeline_offset))) # <<< DEFINE O INÍCIO APÓS A INTRO
 
                     # Não adiciona o clipe transformado à lista de fechar, só o base.
                     video_elements_content.append(logo_watermark_clip)
+                    content_labels.append('logo')
                     print("Marca d'água (WebP) adicionada.")
                 except Exception as e:
                     print(f"AVISO: Falha ao carregar ou processar logo WebP para marca d'água: {e}")
@@ -167,8 +199,8 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
             original_start = text_clip.start
             original_duration = text_clip.duration
 
-            new_start = original_start + intro_duration
-            max_end_time = final_duration
+            new_start = max(0.0, original_start + intro_duration - timeline_offset)
+            max_end_time = timeline_duration
 
             if new_start >= max_end_time: continue
 
@@ -183,6 +215,7 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
                                      .set_duration(new_duration)
                                      .set_fps(config.VIDEO_FPS))
                     video_elements_content.append(adjusted_clip)
+                    content_labels.append('texto')
                     text_clips_added_count += 1
                 except Exception as clip_e:
                     print(f"Erro ao ajustar clipe de texto {i} (start={original_start:.2f}): {clip_e}")
@@ -192,104 +225,141 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
 
         # 6. Compõe Vídeo Final (Background + Intro + Elementos de Conteúdo)
         print("Compondo vídeo final...")
-        if not intro_clip or not hasattr(intro_clip, 'duration') or intro_clip.duration <= 0: raise ValueError("Clipe de introdução inválido para composição.")
+        if intro_segment_path is None and (not intro_clip or not hasattr(intro_clip, 'duration') or intro_clip.duration <= 0): raise ValueError("Clipe de introdução inválido para composição.")
         if not bg_clip_prepared or not hasattr(bg_clip_prepared, 'duration') or bg_clip_prepared.duration <= 0: raise ValueError("Clipe de fundo preparado inválido para composição.")
 
+        intro_elements = [] if intro_segment_path is not None else [intro_clip.set_start(0).set_duration(intro_duration)] # Intro no início
+        layer_labels = ['fundo', *(['intro'] if intro_elements else []), *content_labels]
         final_composite_elements = [
             bg_clip_prepared, # Fundo cobre toda a duração
-            intro_clip.set_start(0).set_duration(intro_duration), # Intro no início
+            *intro_elements,
             *video_elements_content # Texto e Logo já têm start e duration definidos
         ]
 
-        final_clip_no_audio = CompositeVideoClip(final_composite_elements, size=config.VIDEO_SIZE)
-        final_clip_no_audio = final_clip_no_audio.set_duration(final_duration).set_fps(config.VIDEO_FPS)
+        compositor_mode = getattr(config, 'COMPOSITOR_MODE', 'moviepy')
+        if compositor_mode == 'numpy':
+            final_clip_no_audio = LayerStackClip(final_composite_elements, size=config.VIDEO_SIZE, fps=config.VIDEO_FPS)
+            print(f"Compositor NumPy (dirty rectangles): {final_clip_no_audio.static_sprites()} camadas estáticas, "
+                  f"no máximo {final_clip_no_audio.layer_index.max_active()} visíveis por frame.")
+        elif compositor_mode == 'indexed':
+            final_clip_no_audio = IndexedCompositeVideoClip(final_composite_elements, size=config.VIDEO_SIZE)
+            print(f"Compositor com índice de camadas ativas: {len(final_composite_elements)} camadas, "
+                  f"no máximo {final_clip_no_audio.layer_index.max_active()} visíveis por frame.")
+        else:
+            final_clip_no_audio = CompositeVideoClip(final_composite_elements, size=config.VIDEO_SIZE)
+        final_clip_no_audio = final_clip_no_audio.set_duration(timeline_duration).set_fps(config.VIDEO_FPS)
         # Não adiciona final_clip_no_audio para fechar ainda, será usado para criar final_clip
         print(f"Vídeo base composto (Duração: {final_clip_no_audio.duration:.2f}s)")
 
 
-        # 7. Prepara Áudio Final (Música + Narração - Lógica original mantida)
-        print("Preparando áudio final...")
-        audio_clips_to_compose = []
-        bg_music_final_for_compose = None
-
-        if config.USE_BG_MUSIC and config.BG_MUSIC_FILE.exists():
-            bg_music_processed = None
+        # 7. Prepara Áudio Final (Música + Narração)
+        audio_track_path = None
+        if getattr(config, 'AUDIO_MIXER', 'moviepy') == 'numpy':
+            # Decodifica narração e música uma vez, mixa em NumPy e grava a trilha já codificada
+            print("Mixando áudio final em NumPy (decodificação única)...")
             try:
-                print(f"Processando música de fundo: {config.BG_MUSIC_FILE.name}")
-                bg_music_base = AudioFileClip(str(config.BG_MUSIC_FILE))
-                clips_to_close.append(bg_music_base)
-
-                # Aplica volume ANTES de loop/corte
-                bg_music_volumed = bg_music_base.fx(afx.volumex, config.BG_MUSIC_VOLUME)
-                # O resultado de fx não é adicionado para fechar automaticamente
-
-                if bg_music_base.duration < final_duration - 0.1:
-                    num_loops = math.ceil(final_duration / bg_music_base.duration)
-                    print(f"Looping música de fundo {num_loops}x (com volume aplicado)...")
-                    looped_clips = [bg_music_volumed.copy().set_start(i * bg_music_base.duration) for i in range(num_loops)]
-                    # Adiciona as cópias para fechar
-                    clips_to_close.extend(looped_clips)
-                    bg_music_processed = CompositeAudioClip(looped_clips).set_duration(final_duration)
-                    # CompositeAudioClip não precisa ser adicionado para fechar explicitamente aqui
-                elif bg_music_base.duration > final_duration:
-                    print(f"Cortando música de fundo (com volume aplicado) para {final_duration:.2f}s.")
-                    bg_music_processed = bg_music_volumed.subclip(0, final_duration)
-                    # Resultado de subclip não precisa add para fechar
-                else:
-                    bg_music_processed = bg_music_volumed # Usa o clipe com volume
-
-                bg_music_final_for_compose = bg_music_processed
-                print(f"Música de fundo processada (Volume: {config.BG_MUSIC_VOLUME * 100:.0f}%)")
-
-            except Exception as e:
-                print(f"Erro CRÍTICO ao processar música de fundo: {e}")
-                bg_music_final_for_compose = None
-                # Tenta fechar base se foi aberto
-                if bg_music_base and bg_music_base in clips_to_close:
-                    clips_to_close.remove(bg_music_base)
-                    if hasattr(bg_music_base, 'close'): bg_music_base.close()
-
-        elif config.USE_BG_MUSIC:
-            print("Aviso: Música de fundo habilitada mas arquivo não encontrado.")
-
-        if bg_music_final_for_compose:
-            audio_clips_to_compose.append(bg_music_final_for_compose)
-
-        if narration_audio and hasattr(narration_audio, 'duration') and narration_audio.duration > 0:
-            print(f"Posicionando narração (Duração: {narration_audio.duration:.2f}s) em t={intro_duration:.2f}s...")
-            narration_positioned = narration_audio.set_start(intro_duration)
-            audio_clips_to_compose.append(narration_positioned)
-        else:
-             print("Aviso: Áudio de narração inválido ou com duração zero. Não será adicionado.")
+                mix_start_time = time.time()
+                music_path = config.BG_MUSIC_FILE if (config.USE_BG_MUSIC and config.BG_MUSIC_FILE.exists()) else None
+                if config.USE_BG_MUSIC and music_path is None:
+                    print("Aviso: Música de fundo habilitada mas arquivo não encontrado.")
+                mixed_samples = mix_final_audio(
+                    narration_path, narration_start=intro_duration, narration_duration=content_duration,
+                    final_duration=final_duration, music_path=music_path, music_volume=config.BG_MUSIC_VOLUME,
+                    ducking=config.BG_MUSIC_DUCKING, ducking_depth=config.BG_MUSIC_DUCKING_DEPTH,
+                    ducking_threshold=config.BG_MUSIC_DUCKING_THRESHOLD, ducking_smooth=config.BG_MUSIC_DUCKING_SMOOTH)
+                audio_track_path = write_audio_track(mixed_samples, output_path.with_name(f"{output_path.stem}_mix.m4a"),
+                                                     audio_codec=config.AUDIO_CODEC)
+                print(f"Áudio final mixado em {time.time() - mix_start_time:.2f}s ({len(mixed_samples)} amostras): {audio_track_path.name}")
+            except Exception as mix_err:
+                print(f"Erro ao mixar áudio em NumPy: {mix_err}. Usando composição do MoviePy.")
+                audio_track_path = None
+
+        if audio_track_path is None:
+            print("Preparando áudio final...")
+            audio_clips_to_compose = []
+            bg_music_final_for_compose = None
+
+            if config.USE_BG_MUSIC and config.BG_MUSIC_FILE.exists():
+                bg_music_processed = None
+                try:
+                    print(f"Processando música de fundo: {config.BG_MUSIC_FILE.name}")
+                    bg_music_base = AudioFileClip(str(config.BG_MUSIC_FILE))
+                    clips_to_close.append(bg_music_base)
+
+                    # Aplica volume ANTES de loop/corte
+                    bg_music_volumed = bg_music_base.fx(afx.volumex, config.BG_MUSIC_VOLUME)
+                    # O resultado de fx não é adicionado para fechar automaticamente
+
+                    if bg_music_base.duration < final_duration - 0.1:
+                        num_loops = math.ceil(final_duration / bg_music_base.duration)
+                        print(f"Looping música de fundo {num_loops}x (com volume aplicado)...")
+                        looped_clips = [bg_music_volumed.copy().set_start(i * bg_music_base.duration) for i in range(num_loops)]
+                        # Adiciona as cópias para fechar
+                        clips_to_close.extend(looped_clips)
+                        bg_music_processed = CompositeAudioClip(looped_clips).set_duration(final_duration)
+                        # CompositeAudioClip não precisa ser adicionado para fechar explicitamente aqui
+                    elif bg_music_base.duration > final_duration:
+                        print(f"Cortando música de fundo (com volume aplicado) para {final_duration:.2f}s.")
+                        bg_music_processed = bg_music_volumed.subclip(0, final_duration)
+                        # Resultado de subclip não precisa add para fechar
+                    else:
+                        bg_music_processed = bg_music_volumed # Usa o clipe com volume
 
-        if not audio_clips_to_compose:
-            print("Aviso: Nenhum clipe de áudio para compor. Vídeo final ficará mudo.")
-            final_audio = None
-        else:
-            print(f"Compondo áudio final a partir de {len(audio_clips_to_compose)} clipes...")
-            try:
-                valid_audio_clips = []
-                for idx, clip in enumerate(audio_clips_to_compose):
-                    # Verifica se é um clipe de áudio válido
-                    if clip and hasattr(clip, 'duration') and clip.duration > 0 and hasattr(clip, 'get_frame'): # get_frame é um check básico
-                        valid_audio_clips.append(clip)
+                    bg_music_final_for_compose = bg_music_processed
+                    print(f"Música de fundo processada (Volume: {config.BG_MUSIC_VOLUME * 100:.0f}%)")
+
+                except Exception as e:
+                    print(f"Erro CRÍTICO ao processar música de fundo: {e}")
+                    bg_music_final_for_compose = None
+                    # Tenta fechar base se foi aberto
+                    if bg_music_base and bg_music_base in clips_to_close:
+                        clips_to_close.remove(bg_music_base)
+                        if hasattr(bg_music_base, 'close'): bg_music_base.close()
+
+            elif config.USE_BG_MUSIC:
+                print("Aviso: Música de fundo habilitada mas arquivo não encontrado.")
+
+            if bg_music_final_for_compose:
+                audio_clips_to_compose.append(bg_music_final_for_compose)
+
+            if narration_audio and hasattr(narration_audio, 'duration') and narration_audio.duration > 0:
+                print(f"Posicionando narração (Duração: {narration_audio.duration:.2f}s) em t={intro_duration:.2f}s...")
+                narration_positioned = narration_audio.set_start(intro_duration)
+                audio_clips_to_compose.append(narration_positioned)
+            else:
+                 print("Aviso: Áudio de narração inválido ou com duração zero. Não será adicionado.")
+
+            if not audio_clips_to_compose:
+                print("Aviso: Nenhum clipe de áudio para compor. Vídeo final ficará mudo.")
+                final_audio = None
+            else:
+                print(f"Compondo áudio final a partir de {len(audio_clips_to_compose)} clipes...")
+                try:
+                    valid_audio_clips = []
+                    for idx, clip in enumerate(audio_clips_to_compose):
+                        # Verifica se é um clipe de áudio válido
+                        if clip and hasattr(clip, 'duration') and clip.duration > 0 and hasattr(clip, 'get_frame'): # get_frame é um check básico
+                            valid_audio_clips.append(clip)
+                        else:
+                            print(f"Aviso: Removendo clipe de áudio inválido na posição {idx} antes da composição.")
+                    if not valid_audio_clips:
+                         print("Erro: Nenhum clipe de áudio válido restante para composição.")
+                         final_audio = None
                     else:
-                        print(f"Aviso: Removendo clipe de áudio inválido na posição {idx} antes da composição.")
-                if not valid_audio_clips:
-                     print("Erro: Nenhum clipe de áudio válido restante para composição.")
+                        final_audio = CompositeAudioClip(valid_audio_clips).set_duration(final_duration)
+                        print(f"Áudio final composto (Duração: {final_audio.duration:.2f}s)")
+                except Exception as audio_comp_err:
+                     print(f"Erro CRÍTICO ao compor áudio final: {audio_comp_err}")
+                     import traceback
+                     traceback.print_exc()
                      final_audio = None
-                else:
-                    final_audio = CompositeAudioClip(valid_audio_clips).set_duration(final_duration)
-                    print(f"Áudio final composto (Duração: {final_audio.duration:.2f}s)")
-            except Exception as audio_comp_err:
-                 print(f"Erro CRÍTICO ao compor áudio final: {audio_comp_err}")
-                 import traceback
-                 traceback.print_exc()
-                 final_audio = None
 
         # 8. Define Áudio e Duração Final do Clipe de Vídeo
         print("Finalizando clipe de vídeo (definindo áudio e duração)...")
-        if final_audio and hasattr(final_audio, 'duration') and final_audio.duration > 0:
+        if audio_track_path is not None or intro_segment_path is not None:
+            # A trilha (mixada ou final_audio) é muxada depois do encode, já com a duração inteira
+            final_clip = final_clip_no_audio.without_audio()
+        elif final_audio and hasattr(final_audio, 'duration') and final_audio.duration > 0:
             final_clip = final_clip_no_audio.set_audio(final_audio)
         else:
             final_clip = final_clip_no_audio.without_audio()
@@ -299,27 +369,75 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
         clips_to_close.append(final_clip_no_audio)
         clips_to_close.append(final_clip)
 
-        final_clip = final_clip.set_duration(final_duration)
+        final_clip = final_clip.set_duration(timeline_duration)
 
         if not hasattr(final_clip, 'duration') or final_clip.duration <= 0 or not hasattr(final_clip, 'get_frame'):
              raise ValueError("Clipe final inválido antes da renderização.")
 
         # 9. Escreve Arquivo Final
         print(f"Renderizando vídeo final em {output_path}...")
+        profiler = None
+        if getattr(config, 'RENDER_PROFILE', False):
+            profiler = RenderProfiler()
+            profiler.instrument_composite(final_clip_no_audio, layer_labels)
+            print("Perfil do render ativado (tempo por frame de cada estágio).")
+        render_mode = getattr(config, 'RENDER_MODE', 'single')
+        # Com a intro em cache, renderiza só o conteúdo (sem áudio) e emenda no fim
+        render_output_path, render_audio_path = output_path, audio_track_path
+        if intro_segment_path is not None:
+            content_segment_path = output_path.with_name(f"{output_path.stem}_content.mp4")
+            render_output_path, render_audio_path = content_segment_path, None
         render_start_time = time.time()
-        final_clip.write_videofile(
-            str(output_path),
-            codec=config.VIDEO_CODEC,
-            audio_codec=config.AUDIO_CODEC,
-            fps=config.VIDEO_FPS,
-            threads=config.VIDEO_THREADS,
-            preset=config.VIDEO_PRESET,
-            logger='bar',
-            ffmpeg_params=["-crf", str(config.VIDEO_CRF)] # Parâmetros CRF mantidos
-        )
+        if render_mode == 'chunked':
+            # Leitores de arquivo abertos aqui; cada processo filho reabre o seu
+            video_readers = [bg_clip_full.reader] if isinstance(bg_clip_full, VideoFileClip) else []
+            render_chunked(final_clip.without_audio(), final_clip.audio, render_output_path,
+                           config.VIDEO_FPS, getattr(config, 'RENDER_CHUNK_WORKERS', 1),
+                           readers=video_readers, audio_path=render_audio_path, profiler=profiler)
+        elif render_mode == 'streaming':
+            render_streaming(final_clip.without_audio(), final_clip.audio, render_output_path, config.VIDEO_FPS,
+                             getattr(config, 'RENDER_STREAM_WORKERS', 2), getattr(config, 'RENDER_STREAM_QUEUE_FRAMES', 8),
+                             audio_path=render_audio_path, profiler=profiler)
+        elif profiler is not None:
+            # Loop de escrita próprio (mesmo encoder) para medir cada frame
+            render_profiled(final_clip.without_audio(), final_clip.audio, render_output_path,
+                            config.VIDEO_FPS, profiler, audio_path=render_audio_path)
+        else:
+            final_clip.write_videofile(
+                str(render_output_path),
+                codec=config.VIDEO_CODEC,
+                audio_codec=config.AUDIO_CODEC,
+                fps=config.VIDEO_FPS,
+                threads=config.VIDEO_THREADS,
+                preset=config.VIDEO_PRESET,
+                logger='bar',
+                ffmpeg_params=["-crf", str(config.VIDEO_CRF)], # Parâmetros CRF mantidos
+                audio=str(render_audio_path) if render_audio_path is not None else True
+            )
+        if content_segment_path is not None:
+            print("Emendando intro em cache e conteúdo (stream copy)...")
+            splice_segments([intro_segment_path, content_segment_path], output_path,
+                            audio_clip=final_audio if audio_track_path is None else None,
+                            audio_path=audio_track_path, profiler=profiler)
         render_end_time = time.time()
         print(f"Renderização levou {render_end_time - render_start_time:.2f}s")
 
+        if profiler is not None:
+            profiler.print_summary()
+            report_path = profiler.write_report(
+                output_path.with_name(f"{output_path.stem}_render_profile.json"),
+                metadata={
+                    'output': output_path.name,
+                    'render_mode': render_mode,
+                    'compositor_mode': compositor_mode,
+                    'audio_mixer': 'numpy' if audio_track_path is not None else 'moviepy',
+                    'codec': config.VIDEO_CODEC, 'preset': config.VIDEO_PRESET, 'crf': str(config.VIDEO_CRF),
+                    'size': list(config.VIDEO_SIZE), 'fps': config.VIDEO_FPS,
+                    'duration_s': final_duration,
+                    'render_wall_s': round(render_end_time - render_start_time, 3),
+                })
+            print(f"Relatório do perfil salvo em: {report_path}")
+
         end_time = time.time()
         print(f"\n✅ Vídeo final montado com sucesso!")
         print(f"Tempo total de montagem: {end_time - start_time:.2f} segundos.")
@@ -352,6 +470,13 @@ def assemble_video(intro_clip: CompositeVideoClip | ColorClip, # Pode ser ColorC
                  try: clip.close(); closed_clips_count += 1
                  except Exception: pass
 
+        if content_segment_path is not None and content_segment_path.exists():
+            try: content_segment_path.unlink()
+            except Exception as unlink_err: print(f"Erro menor ao remover segmento de conteúdo temporário: {unlink_err}")
+        if audio_track_path is not None and audio_track_path.exists():
+            try: audio_track_path.unlink()
+            except Exception as unlink_err: print(f"Erro menor ao remover trilha de áudio temporária: {unlink_err}")
+
         import gc
         collected = gc.collect()
         print(f"Fechamento concluído. Tentativa de fechar {closed_clips_count} clipes. Coletados {collected} objetos.")
\ No newline at end of file